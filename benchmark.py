@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the fuel dashboard.
+
+For each sheet size a seeded synthetic sheet (see synthetic_sheet.py) is
+pushed through the pipeline and every stage is timed:
+
+    load              clean_and_filter_stream over the raw CSV bytes (the refresh path)
+    clean_and_filter  pandas.read_csv + clean_and_filter (the whole-frame path)
+    stats             calculate_stats with a cold cache
+    reports           generate_reports into a temporary directory (all files written)
+    endpoint:<path>   Flask test client: first (uncached) request, then warm
+                      latency percentiles and requests/second
+
+Results are written as JSON (benchmark_results.json by default) and
+summarized on stdout. ``--compare`` checks them against a baseline
+file and exits non-zero when a metric regressed past its threshold;
+``--update-baseline`` rewrites the baseline from this run.
+
+    python benchmark.py --sizes 1000,100000
+    python benchmark.py --compare benchmark_baseline.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import main
+from ingest_plan import PlanStore
+from refresher import Refresher
+from reports import ReportWriter
+from synthetic_sheet import generate_sheet
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Calendar day the synthetic fueling dates are spread around; the app's
+# "today" is pinned to it for the run so the urgency buckets (stats, status
+# filters, forecast, dispatch) see a realistic mix rather than all overdue
+SHEET_TODAY = "2025-01-20"
+
+# Requests timed per endpoint after the first one
+ENDPOINT_REQUESTS = 200
+
+ENDPOINTS = (
+    "/api/fuel/sites",
+    "/api/fuel/stats",
+    "/api/fuel/dashboard",
+    "/api/fuel/sites?status=overdue,today&sort=city&limit=100",
+    "/api/fuel/map?zoom=5",
+    "/api/fuel/map?zoom=12&bbox=46.5,24.5,47.0,25.0",
+    "/api/fuel/forecast?days=90",
+    "/api/fuel/dispatch?depot=24.7,46.7;21.5,39.2;26.4,50.1&k=20",
+)
+
+# Allowed slowdown (fraction over baseline) before a metric counts as a regression
+DEFAULT_THRESHOLD = 0.5
+
+
+def timed(func, repeat):
+    """Run ``func`` ``repeat`` times; return (median ms, last result)."""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def repeats_for(rows):
+    return 5 if rows <= 10000 else 3 if rows <= 100000 else 1
+
+
+def bench_pipeline(sheet, rows):
+    """Time ingest, stats and reports for one sheet; return (results, table)."""
+    import pandas as pd
+    repeat = repeats_for(rows)
+    results = {}
+    results["load"], table = timed(lambda: main.clean_and_filter_stream(io.BytesIO(sheet)), repeat)
+    results["clean_and_filter"], _ = timed(
+        lambda: main.clean_and_filter(pd.read_csv(io.BytesIO(sheet))), repeat)
+
+    def stats():
+        main._stats_cache = (None, None, None)
+        return main.calculate_stats(table)
+    results["stats"], _ = timed(stats, repeat)
+
+    with tempfile.TemporaryDirectory() as directory:
+        results["reports"], _ = timed(
+            lambda: ReportWriter(directory).write(table, main.today_day_number()), repeat)
+    return {name: {"ms": round(ms, 3)} for name, ms in results.items()}, table
+
+
+def bench_endpoints(table, requests=ENDPOINT_REQUESTS):
+    """Time each endpoint through the Flask test client against ``table``."""
+    saved = main.refresher
+    main.refresher = Refresher(lambda: table, table)
+    main.response_cache.invalidate('')
+    main.dispatch_cache.invalidate('')
+    client = main.app.test_client()
+    results = {}
+    try:
+        for path in ENDPOINTS:
+            start = time.perf_counter()
+            status = client.get(path).status_code
+            first = (time.perf_counter() - start) * 1000
+            samples = []
+            begin = time.perf_counter()
+            for _ in range(requests):
+                start = time.perf_counter()
+                client.get(path)
+                samples.append((time.perf_counter() - start) * 1000)
+            elapsed = time.perf_counter() - begin
+            samples.sort()
+            results[f"endpoint:{path}"] = {
+                "status": status,
+                "firstMs": round(first, 3),
+                "ms": round(samples[len(samples) // 2], 3),
+                "p95Ms": round(samples[int(len(samples) * 0.95)], 3),
+                "requestsPerSecond": round(requests / elapsed, 1),
+            }
+    finally:
+        main.refresher = saved
+        main.response_cache.invalidate('')
+        main.dispatch_cache.invalidate('')
+    return results
+
+
+def run(sizes, seed=0, requests=ENDPOINT_REQUESTS):
+    """Run the whole suite and return the JSON-friendly report."""
+    report = {
+        "meta": {
+            "seed": seed,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "today": SHEET_TODAY,
+        },
+        "results": {},
+    }
+    saved_today, saved_plans = main.today_day_number, main.ingest_plans
+    today = int(np.datetime64(SHEET_TODAY, "D").astype(np.int32))
+    main.today_day_number = lambda: today
+    with tempfile.TemporaryDirectory() as directory:
+        # The synthetic sheets' ingest plans stay out of the app's plan store
+        main.ingest_plans = PlanStore(os.path.join(directory, "ingest_plans.json"))
+        try:
+            for rows in sizes:
+                start = time.perf_counter()
+                sheet = generate_sheet(rows, seed=seed, today=SHEET_TODAY)
+                print(f"[INFO] {rows} rows: sheet generated in {time.perf_counter() - start:.1f}s")
+                results, table = bench_pipeline(sheet, rows)
+                results.update(bench_endpoints(table, requests))
+                results["sites"] = {"count": len(table)}
+                report["results"][str(rows)] = results
+        finally:
+            main.today_day_number = saved_today
+            main.ingest_plans = saved_plans
+    return report
+
+
+def compare(report, baseline):
+    """Return the metrics that regressed against ``baseline`` as readable lines."""
+    thresholds = baseline.get("thresholds", {})
+    regressions = []
+    for size, metrics in baseline["results"].items():
+        for name, expected in metrics.items():
+            actual = report["results"].get(size, {}).get(name)
+            if actual is None or "ms" not in expected:
+                continue
+            kind = name.split(":", 1)[0]
+            limit = thresholds.get(name, thresholds.get(kind, thresholds.get("default", DEFAULT_THRESHOLD)))
+            if actual["ms"] > expected["ms"] * (1 + limit):
+                regressions.append(f"{size} rows {name}: {actual['ms']:.2f} ms vs baseline "
+                                   f"{expected['ms']:.2f} ms (+{limit:.0%} allowed)")
+    return regressions
+
+
+def parse_sizes(value):
+    return [int(float(v)) for v in value.split(",") if v.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the fuel dashboard")
+    parser.add_argument("--sizes", type=parse_sizes, default=list(DEFAULT_SIZES),
+                        help="comma-separated sheet sizes in rows (e.g. 1000,1e6)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--requests", type=int, default=ENDPOINT_REQUESTS,
+                        help="timed requests per endpoint")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="write the results JSON here (default: %(default)s)")
+    parser.add_argument("--compare", metavar="BASELINE", help="fail on regressions against this file")
+    parser.add_argument("--update-baseline", metavar="BASELINE",
+                        help="write this run as the new baseline (keeping its thresholds)")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.seed, args.requests)
+    with open(args.output, "w") as f:
+        f.write(json.dumps(report, indent=2) + "\n")
+    for size, metrics in report["results"].items():
+        print(f"\n{size} rows ({metrics['sites']['count']} sites)")
+        for name, values in metrics.items():
+            if "ms" in values:
+                print(f"   {name:<60} {values['ms']:>10.3f} ms")
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        try:
+            with open(args.update_baseline) as f:
+                thresholds = json.load(f).get("thresholds")
+        except FileNotFoundError:
+            thresholds = None
+        report["thresholds"] = thresholds or {"default": DEFAULT_THRESHOLD}
+        with open(args.update_baseline, "w") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f))
+        for line in regressions:
+            print(f"[WARN] Regression: {line}")
+        if regressions:
+            sys.exit(1)
+        print("[OK] No regressions against the baseline")
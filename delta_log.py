@@ -0,0 +1,58 @@
+"""
+Bounded history of per-refresh site diffs, keyed by snapshot version.
+
+Each refresh records which SiteNames were upserted or removed going from
+one version to the next. ``changes_since`` folds the recorded diffs into a
+single delta so a client can catch up from any version still in the log.
+"""
+import threading
+from collections import deque
+
+
+class DeltaLog:
+    """Ring buffer of (from_version, to_version, upserted, removed) diffs."""
+
+    def __init__(self, size=20):
+        self._lock = threading.Lock()
+        self._diffs = deque(maxlen=size)
+
+    def record(self, from_version, to_version, upserted, removed):
+        """Remember the SiteNames upserted and removed between two versions."""
+        with self._lock:
+            if self._diffs and self._diffs[-1][1] != from_version:
+                # A gap in the chain makes older diffs unusable
+                self._diffs.clear()
+            self._diffs.append((from_version, to_version, tuple(upserted), tuple(removed)))
+
+    def oldest_version(self):
+        """Return the oldest version a delta can start from, or None."""
+        with self._lock:
+            return self._diffs[0][0] if self._diffs else None
+
+    def changes_since(self, version, current_version):
+        """Return (upserted, removed) SiteNames from ``version`` to ``current_version``.
+
+        Returns None when ``version`` is unknown or already evicted, in which
+        case the client needs the full site list. Versions can be skipped
+        (serve.py workers adopt the loader's numbers), so a delta can only
+        start from a version that begins one of the recorded diffs.
+        """
+        if version == current_version:
+            return [], []
+        with self._lock:
+            diffs = list(self._diffs)
+        if (not diffs or diffs[-1][1] != current_version
+                or all(from_version != version for from_version, *_ in diffs)):
+            return None
+
+        status = {}
+        for from_version, _, upserted, removed in diffs:
+            if from_version < version:
+                continue
+            for name in removed:
+                status[name] = False
+            for name in upserted:
+                status[name] = True
+        upserted = [name for name, present in status.items() if present]
+        removed = [name for name, present in status.items() if not present]
+        return upserted, removed
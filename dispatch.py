@@ -0,0 +1,115 @@
+"""
+Dispatch planning: which urgent sites each fuel truck depot should serve.
+
+``DispatchPlan`` ranks every (depot, urgent site) pair by great-circle
+distance in one (depots x sites) array operation, then reads off the nearest
+depot of each site and the closest ``MAX_NEAREST`` sites of each depot.
+"""
+import numpy as np
+
+# Mean Earth radius (km)
+EARTH_RADIUS_KM = 6371.0088
+
+# Depots accepted per request and nearest sites kept per depot
+MAX_DEPOTS = 100
+MAX_NEAREST = 200
+DEFAULT_NEAREST = 10
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km between broadcastable arrays of coordinates."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64))
+                              for v in (lat1, lng1, lat2, lng2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def parse_depots(values):
+    """Parse "lat,lng" strings into a tuple of (lat, lng) float pairs."""
+    depots = []
+    for value in values:
+        try:
+            lat, lng = (float(v) for v in value.split(','))
+        except ValueError:
+            raise ValueError(f"Invalid depot {value!r}, expected lat,lng")
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError(f"Depot {value!r} is outside -90..90 / -180..180")
+        depots.append((lat, lng))
+    if not depots:
+        raise ValueError("At least one 'depot' (lat,lng) is required")
+    if len(depots) > MAX_DEPOTS:
+        raise ValueError(f"At most {MAX_DEPOTS} depots are allowed")
+    return tuple(depots)
+
+
+def unit_vectors(lat, lng):
+    """Points on the unit sphere (n x 3) for coordinates in degrees."""
+    lat, lng = np.radians(lat), np.radians(lng)
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)))
+
+
+class DispatchPlan:
+    """Nearest-depot assignment and per-depot nearest sites for a set of rows.
+
+    ``rows`` are the candidate (urgent) row positions of ``table``; sites
+    without finite coordinates are left out. Sites are ranked by the dot
+    product of unit vectors, which orders pairs exactly like the haversine
+    distance but is a matrix product over all (depot, site) pairs;
+    haversine_km then gives the distances of the pairs that are returned.
+    """
+
+    def __init__(self, table, rows, depots, nearest=MAX_NEAREST):
+        rows = np.asarray(rows, dtype=np.int32)
+        self.rows = rows[np.isfinite(table.lat[rows]) & np.isfinite(table.lng[rows])]
+        self.depots = depots
+        self.depot_lat, self.depot_lng = np.array(depots, dtype=np.float64).reshape(-1, 2).T
+        self.lat = table.lat[self.rows]
+        self.lng = table.lng[self.rows]
+        n_sites = len(self.rows)
+        depot_vectors = unit_vectors(self.depot_lat, self.depot_lng)
+        site_vectors = unit_vectors(self.lat, self.lng)
+
+        # (n_sites, n_depots) closeness, larger is nearer
+        self.depot = (site_vectors @ depot_vectors.T).argmax(axis=1).astype(np.int32) if n_sites \
+            else np.empty(0, dtype=np.int32)
+        self.distance = haversine_km(self.depot_lat[self.depot], self.depot_lng[self.depot],
+                                     self.lat, self.lng)
+
+        # Closest sites of each depot, nearest first, from the (n_depots, n_sites) transpose
+        closeness = depot_vectors @ site_vectors.T
+        keep = min(nearest, n_sites)
+        if keep < n_sites:
+            closest = np.argpartition(closeness, n_sites - keep, axis=1)[:, n_sites - keep:]
+        else:
+            closest = np.broadcast_to(np.arange(n_sites), (len(depots), n_sites))
+        order = (-np.take_along_axis(closeness, closest, axis=1)).argsort(axis=1, kind="stable")
+        self.nearest = np.take_along_axis(closest, order, axis=1)
+        self.nearest_distance = haversine_km(self.depot_lat[:, None], self.depot_lng[:, None],
+                                             self.lat[self.nearest], self.lng[self.nearest])
+
+        # Sites grouped by assigned depot, nearest first within each group
+        self.assigned = np.lexsort((self.distance, self.depot)).astype(np.int32)
+        self.bounds = np.searchsorted(self.depot[self.assigned], np.arange(len(depots) + 1))
+
+    def body(self, table, k):
+        """JSON-ready result: per depot, its ``k`` nearest sites and the sites assigned to it."""
+        depots = []
+        for i, (lat, lng) in enumerate(self.depots):
+            nearest = self.nearest[i, :k]
+            assigned = self.assigned[self.bounds[i]:self.bounds[i + 1]]
+            depots.append({
+                "depot": i,
+                "lat": lat,
+                "lng": lng,
+                "nearest": self._records(table, nearest, self.nearest_distance[i, :k]),
+                "assigned": self._records(table, assigned, self.distance[assigned]),
+            })
+        return {"sites": len(self.rows), "depots": depots}
+
+    def _records(self, table, positions, distances):
+        records = table.take(self.rows[positions]).to_records()
+        for record, km in zip(records, np.round(distances, 3).tolist()):
+            record["distanceKm"] = km
+        return records
@@ -0,0 +1,208 @@
+"""
+Server-Sent Events fan-out for snapshot changes.
+
+``EventHub`` keeps a short history of published events so reconnecting
+clients can resume from ``Last-Event-ID``. Events can be streamed two ways:
+
+* ``EventHub.stream`` - a blocking generator for the Flask route (one
+  worker thread per connected client under a threaded WSGI server);
+* ``start_event_server`` - a standalone asyncio SSE listener that serves
+  any number of idle clients from a single thread;
+* ``StreamLoop`` - the same asyncio streaming for connections accepted by
+  another server (serve.py hands its workers' event requests to one).
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+
+# Seconds between keep-alive comments on idle streams
+HEARTBEAT_INTERVAL = 15
+
+EVENTS_PATH = "/api/fuel/events"
+
+
+class EventHub:
+    """Thread-safe publisher with a bounded replay history."""
+
+    def __init__(self, history=50):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=history)
+        self._seq = 0
+        self._async_waiters = set()
+
+    @property
+    def last_id(self):
+        return self._seq
+
+    def publish(self, name, payload):
+        """Publish an event to every subscriber and return its id."""
+        data = json.dumps(payload, separators=(",", ":"), default=str)
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, name, data))
+            self._cond.notify_all()
+            waiters = list(self._async_waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+        return self._seq
+
+    def since(self, last_id):
+        """Return the events after ``last_id``, or None if some were already dropped.
+
+        An id above the current one was issued by another hub (a restarted
+        process, or another serve.py worker), so its history is unknown too.
+        """
+        with self._cond:
+            if last_id == self._seq:
+                return []
+            if last_id > self._seq:
+                return None
+            if not self._events or self._events[0][0] > last_id + 1:
+                return None
+            return [e for e in self._events if e[0] > last_id]
+
+    def stream(self, last_id=None, heartbeat=HEARTBEAT_INTERVAL):
+        """Yield SSE-formatted chunks forever, starting after ``last_id``."""
+        last_id = self._seq if last_id is None else last_id
+        yield format_comment("connected")
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._seq != last_id, timeout=heartbeat)
+            chunks, last_id = self._pending(last_id)
+            yield from (chunks or [format_comment("keep-alive")])
+
+    def _pending(self, last_id):
+        events = self.since(last_id)
+        if events is None:
+            return [format_event(self._seq, "reset", "{}")], self._seq
+        return [format_event(*e) for e in events], (events[-1][0] if events else last_id)
+
+    async def astream(self, last_id=None, heartbeat=HEARTBEAT_INTERVAL):
+        """Async variant of ``stream`` for the asyncio event server."""
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        waiter = (loop, wakeup)
+        with self._cond:
+            self._async_waiters.add(waiter)
+        try:
+            last_id = self._seq if last_id is None else last_id
+            yield format_comment("connected")
+            while True:
+                if self._seq == last_id:
+                    try:
+                        await asyncio.wait_for(wakeup.wait(), heartbeat)
+                    except asyncio.TimeoutError:
+                        pass
+                wakeup.clear()
+                chunks, last_id = self._pending(last_id)
+                for chunk in chunks or [format_comment("keep-alive")]:
+                    yield chunk
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+
+
+def format_event(event_id, name, data):
+    """Format one SSE event."""
+    return f"id: {event_id}\nevent: {name}\ndata: {data}\n\n"
+
+
+def format_comment(text):
+    """Format an SSE comment line (ignored by EventSource, keeps proxies open)."""
+    return f": {text}\n\n"
+
+
+def parse_last_event_id(value):
+    """Return an int Last-Event-ID, or None when absent or malformed."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+async def _handle_client(hub, reader, writer):
+    try:
+        request_line = await reader.readline()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        parts = request_line.decode("latin-1").split()
+        path = parts[1].split("?", 1)[0] if len(parts) >= 2 else ""
+        if len(parts) < 2 or parts[0] != "GET" or path != EVENTS_PATH:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            return
+        await _send_stream(hub, writer, parse_last_event_id(headers.get("last-event-id")))
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _send_stream(hub, writer, last_id):
+    writer.write(
+        b"HTTP/1.1 200 OK\r\n"
+        b"Content-Type: text/event-stream\r\n"
+        b"Cache-Control: no-cache\r\n"
+        b"Access-Control-Allow-Origin: *\r\n"
+        b"Connection: keep-alive\r\n\r\n"
+    )
+    async for chunk in hub.astream(last_id):
+        writer.write(chunk.encode("utf-8"))
+        await writer.drain()
+
+
+class StreamLoop:
+    """One asyncio loop on a daemon thread streaming ``hub`` to adopted connections.
+
+    The connections were accepted, and their request read, by another
+    server; from then on they hold no thread of their own.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="sse-streams",
+                                       daemon=True)
+        self.thread.start()
+
+    def adopt(self, sock, last_id=None):
+        """Take ownership of the connected ``sock`` and stream events to it."""
+        asyncio.run_coroutine_threadsafe(self._serve(sock, last_id), self.loop)
+
+    async def _serve(self, sock, last_id):
+        sock.setblocking(False)
+        _, writer = await asyncio.open_connection(sock=sock)
+        try:
+            await _send_stream(self.hub, writer, last_id)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def start_event_server(hub, host="0.0.0.0", port=8081):
+    """Serve ``hub`` over SSE on a daemon thread running one asyncio loop.
+
+    Returns the thread; ``thread.server`` is set once the socket is bound.
+    """
+    ready = threading.Event()
+    thread = threading.Thread(name="sse-server", daemon=True,
+                              target=lambda: asyncio.run(_serve(hub, host, port, thread, ready)))
+    thread.server = None
+    thread.start()
+    ready.wait(5)
+    return thread
+
+
+async def _serve(hub, host, port, thread, ready):
+    server = await asyncio.start_server(lambda r, w: _handle_client(hub, r, w), host, port)
+    thread.server = server
+    ready.set()
+    async with server:
+        await server.serve_forever()
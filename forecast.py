@@ -0,0 +1,61 @@
+"""
+Per-day, per-city fueling workload for the days ahead.
+
+``Forecast`` counts the sites due on each of the next ``horizon`` days for
+every city with a single bincount over (city code, day offset): overdue
+sites land in the first column and sites due after the horizon in the last.
+Any shorter window is then a slice of that matrix, so it is built once per
+snapshot and calendar day and every ``days`` value is served from it.
+"""
+import numpy as np
+
+from site_table import day_strings
+
+# Longest window a forecast can cover, and the default one
+MAX_FORECAST_DAYS = 366
+DEFAULT_FORECAST_DAYS = 14
+
+
+class Forecast:
+    """Site counts per city for overdue, each day of the horizon, and later."""
+
+    def __init__(self, table, today, horizon=MAX_FORECAST_DAYS):
+        self.today = today
+        self.horizon = horizon
+        self.city_names = table.city_names
+        width = horizon + 2
+        offsets = np.clip(table.day.astype(np.int64) - today, -1, horizon) + 1
+        keys = table.city_codes.astype(np.int64) * width + offsets
+        # (n_cities, horizon + 2): overdue, day 0 .. horizon - 1, later
+        self.counts = np.bincount(keys, minlength=len(self.city_names) * width).reshape(
+            len(self.city_names), width)
+
+    def window(self, days, cities=None):
+        """Return the forecast for the next ``days`` days as a JSON-ready dict.
+
+        ``cities`` restricts the per-city rows and the totals to those names
+        (None = every city); unknown names are ignored.
+        """
+        if not 1 <= days <= self.horizon:
+            raise ValueError(f"'days' must be between 1 and {self.horizon}")
+        codes = [code for code, name in sorted(enumerate(self.city_names),
+                                               key=lambda item: "" if item[1] is None else str(item[1]))
+                 if cities is None or name in cities]
+        counts = self.counts[codes]
+        daily = counts[:, 1:days + 1]
+        overdue = counts[:, 0]
+        later = counts[:, days + 1:].sum(axis=1)
+        return {
+            "today": day_strings([self.today])[0],
+            "days": days,
+            "dates": day_strings(np.arange(self.today, self.today + days)),
+            "total": {
+                "overdue": int(overdue.sum()),
+                "daily": daily.sum(axis=0).tolist(),
+                "later": int(later.sum()),
+            },
+            "cities": [
+                {"city": self.city_names[code], "overdue": int(o), "daily": d, "later": int(l)}
+                for code, o, d, l in zip(codes, overdue.tolist(), daily.tolist(), later.tolist())
+            ],
+        }
@@ -0,0 +1,138 @@
+"""
+Spatial index and marker-cluster pyramid over a SiteTable.
+
+Sites are bucketed into a fixed lat/lng grid (rows sorted by cell key) so a
+bounding-box query touches only the grid rows it overlaps. For the map's
+low zoom levels, sites are grouped into Web Mercator cells once per
+snapshot; per-cluster urgency counts are a single bincount per day.
+"""
+import numpy as np
+
+# Grid cell size (degrees) of the bounding-box index
+GRID_DEG = 0.25
+GRID_COLS = int(360 / GRID_DEG)
+GRID_ROWS = int(180 / GRID_DEG)
+
+# Zoom levels that are served as clusters, and cluster cells per 256px tile
+CLUSTER_MAX_ZOOM = 9
+CLUSTER_CELLS_PER_TILE = 4
+
+# Urgency bucket names, in the order used by the day-offset buckets
+URGENCY_NAMES = ("overdue", "today", "tomorrow", "afterTomorrow", "later")
+
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def mercator(lat, lng):
+    """Project coordinates to Web Mercator, normalized to [0, 1)."""
+    lat = np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT)
+    x = (lng + 180.0) / 360.0
+    s = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + s) / (1 - s)) / (4 * np.pi)
+    return np.clip(x, 0, np.nextafter(1, 0)), np.clip(y, 0, np.nextafter(1, 0))
+
+
+def urgency_buckets(day, today):
+    """Bucket each day number: 0 overdue, 1 today, 2 tomorrow, 3 after tomorrow, 4 later."""
+    return (np.clip(day - today, -1, 3) + 1).astype(np.int64)
+
+
+class ClusterLevel:
+    """Sites grouped into Mercator cells for one zoom level."""
+
+    def __init__(self, table, x, y, zoom):
+        cells = (1 << zoom) * CLUSTER_CELLS_PER_TILE
+        keys = (y * cells).astype(np.int64) * cells + (x * cells).astype(np.int64)
+        _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True,
+                                              return_counts=True)
+        self.zoom = zoom
+        self.inverse = inverse.astype(np.int32)
+        self.first = first.astype(np.int32)
+        self.counts = counts
+        self.lat = np.bincount(inverse, weights=table.lat) / counts
+        self.lng = np.bincount(inverse, weights=table.lng) / counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    def urgency(self, buckets):
+        """Return an (n_clusters, 5) array of site counts per urgency bucket."""
+        n = len(self)
+        return np.bincount(self.inverse.astype(np.int64) * 5 + buckets,
+                           minlength=5 * n).reshape(n, 5)
+
+
+class GeoIndex:
+    """Grid index for bounding-box queries plus a precomputed cluster pyramid."""
+
+    def __init__(self, table, max_zoom=CLUSTER_MAX_ZOOM):
+        self.table = table
+        col = np.clip(((table.lng + 180.0) // GRID_DEG).astype(np.int64), 0, GRID_COLS - 1)
+        row = np.clip(((table.lat + 90.0) // GRID_DEG).astype(np.int64), 0, GRID_ROWS)
+        keys = row * GRID_COLS + col
+        self.order = np.argsort(keys, kind="stable").astype(np.int32)
+        self.keys = keys[self.order]
+
+        x, y = mercator(table.lat, table.lng)
+        self.levels = [ClusterLevel(table, x, y, zoom) for zoom in range(max_zoom + 1)]
+        self._urgency = (None, None, {})
+
+    @property
+    def max_zoom(self):
+        return len(self.levels) - 1
+
+    def within(self, west, south, east, north):
+        """Return the (ascending) row positions of sites inside the bounding box."""
+        if not len(self.keys) or west > east or south > north:
+            return np.empty(0, dtype=np.int32)
+        col0 = max(0, int((west + 180.0) // GRID_DEG))
+        col1 = min(GRID_COLS - 1, int((east + 180.0) // GRID_DEG))
+        row0 = max(0, int((south + 90.0) // GRID_DEG))
+        row1 = min(GRID_ROWS, int((north + 90.0) // GRID_DEG))
+        parts = []
+        for row in range(row0, row1 + 1):
+            a = np.searchsorted(self.keys, row * GRID_COLS + col0, side="left")
+            b = np.searchsorted(self.keys, row * GRID_COLS + col1, side="right")
+            if a < b:
+                parts.append(self.order[a:b])
+        if not parts:
+            return np.empty(0, dtype=np.int32)
+        rows = np.concatenate(parts)
+        lat, lng = self.table.lat[rows], self.table.lng[rows]
+        inside = (lat >= south) & (lat <= north) & (lng >= west) & (lng <= east)
+        return np.sort(rows[inside])
+
+    def clusters(self, zoom, today, west=-180.0, south=-90.0, east=180.0, north=90.0):
+        """Return the clusters at ``zoom`` whose centroid lies in the bounding box.
+
+        Each cluster is a dict with its centroid, site count, counts per
+        urgency bucket and, for single-site clusters, the row of that site.
+        """
+        level = self.levels[min(max(zoom, 0), self.max_zoom)]
+        urgency = self.urgency(level, today)
+        inside = np.flatnonzero((level.lat >= south) & (level.lat <= north)
+                                & (level.lng >= west) & (level.lng <= east))
+        clusters = []
+        for lat, lng, count, first, buckets in zip(
+                level.lat[inside].tolist(), level.lng[inside].tolist(),
+                level.counts[inside].tolist(), level.first[inside].tolist(),
+                urgency[inside].tolist()):
+            cluster = {"lat": lat, "lng": lng, "count": count}
+            cluster.update(zip(URGENCY_NAMES, buckets))
+            if count == 1:
+                cluster["row"] = first
+            clusters.append(cluster)
+        return clusters
+
+    def urgency(self, level, today):
+        """Per-cluster urgency counts for ``level``, cached for the current day."""
+        cached_day, buckets, by_zoom = self._urgency
+        if cached_day != today:
+            buckets = urgency_buckets(self.table.day, today)
+            by_zoom = {}
+            self._urgency = (today, buckets, by_zoom)
+        counts = by_zoom.get(level.zoom)
+        if counts is None:
+            counts = level.urgency(buckets)
+            by_zoom[level.zoom] = counts
+        return counts
@@ -0,0 +1,264 @@
+"""
+SQLite history of the installed snapshots.
+
+Every snapshot whose content hash differs from the last recorded one is
+stored once, as:
+
+- a ``snapshots`` row (version, time, calendar day, site count),
+- its ``plan_days`` histogram (sites per planned fueling day), from which
+  the overdue / due-today counts of any calendar day are a range sum,
+- ``site_changes`` rows for only the sites that were added, changed or
+  removed since the previous snapshot, keyed by (site, snapshot) so a
+  site's timeline is one index range.
+
+``current_sites`` mirrors the latest snapshot so the next diff does not
+have to rebuild it. ``compact`` drops snapshots older than the retention
+window, folding each site's older changes into its state at the start of
+the window.
+"""
+import sqlite3
+import threading
+from datetime import date
+
+import numpy as np
+
+from logs import get_logger
+from site_table import day_strings
+
+log = get_logger("fuel.history_store")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    recorded_at TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    sites INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_day ON snapshots (day, id);
+CREATE TABLE IF NOT EXISTS plan_days (
+    snapshot_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    sites INTEGER NOT NULL,
+    PRIMARY KEY (snapshot_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS site_changes (
+    site TEXT NOT NULL,
+    snapshot_id INTEGER NOT NULL,
+    city TEXT,
+    region TEXT,
+    plan_day INTEGER,
+    lat REAL,
+    lng REAL,
+    PRIMARY KEY (site, snapshot_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS current_sites (
+    site TEXT PRIMARY KEY,
+    city TEXT,
+    region TEXT,
+    plan_day INTEGER,
+    lat REAL,
+    lng REAL
+) WITHOUT ROWID;
+"""
+
+# Longest range a trend query may cover (days)
+MAX_TREND_DAYS = 366
+
+EPOCH = date(1970, 1, 1)
+
+
+def day_number(moment):
+    """Calendar day of a date/datetime as days since 1970-01-01."""
+    return (moment.date() if hasattr(moment, "date") else moment).toordinal() - EPOCH.toordinal()
+
+
+def _number(value):
+    """A float as stored in SQLite (NaN becomes NULL)."""
+    return None if value != value else value
+
+
+def site_state(table):
+    """{site: (city, region, plan_day, lat, lng)} for a SiteTable; later rows win."""
+    return {
+        site: (city, region, day, _number(lat), _number(lng))
+        for site, city, region, day, lat, lng in zip(
+            table.sites.tolist(), table.cities.tolist(), table.regions.tolist(),
+            table.day.tolist(), table.lat.tolist(), table.lng.tolist())
+        if site is not None
+    }
+
+
+class HistoryStore:
+    """Snapshot history in one SQLite file, safe to share between threads.
+
+    Each call opens its own connection (WAL mode, so readers in other
+    threads and processes never wait for the writer).
+    """
+
+    def __init__(self, path, retention_days=0):
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._ready = False
+        # (content hash, site_state) of the last recorded snapshot
+        self._current = None
+        self._compacted_day = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._ready = True
+        return conn
+
+    def record(self, snapshot):
+        """Store ``snapshot`` unless it has the same content as the last one.
+
+        Returns True when a new snapshot was written.
+        """
+        table = snapshot.table
+        with self._lock:
+            conn = self._connect()
+            try:
+                last = conn.execute(
+                    "SELECT content_hash FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+                if last is not None and last[0] == snapshot.content_hash:
+                    return False
+                previous = self._previous_state(conn, last and last[0])
+                state = site_state(table)
+                changed = [(site, *values) for site, values in state.items()
+                           if previous.get(site) != values]
+                removed = [site for site in previous if site not in state]
+                days, counts = np.unique(table.day, return_counts=True)
+                with conn:
+                    snapshot_id = conn.execute(
+                        "INSERT INTO snapshots (content_hash, version, recorded_at, day, sites) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (snapshot.content_hash, snapshot.version, snapshot.loaded_at.isoformat(),
+                         day_number(snapshot.loaded_at), len(table))).lastrowid
+                    conn.executemany("INSERT INTO plan_days VALUES (?, ?, ?)",
+                                     [(snapshot_id, d, c) for d, c in zip(days.tolist(), counts.tolist())])
+                    conn.executemany("INSERT INTO site_changes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                     [(site, snapshot_id, *values) for site, *values in changed]
+                                     + [(site, snapshot_id, None, None, None, None, None)
+                                        for site in removed])
+                    conn.executemany("DELETE FROM current_sites WHERE site = ?",
+                                     [(site,) for site in removed])
+                    conn.executemany("INSERT OR REPLACE INTO current_sites VALUES (?, ?, ?, ?, ?, ?)",
+                                     changed)
+                self._current = (snapshot.content_hash, state)
+                log.info("history_recorded", version=snapshot.version, snapshot_id=snapshot_id,
+                         changed=len(changed), removed=len(removed))
+                today = day_number(snapshot.loaded_at)
+                if self.retention_days and self._compacted_day != today:
+                    self._compact(conn, today - self.retention_days)
+                    self._compacted_day = today
+                return True
+            finally:
+                conn.close()
+
+    def _previous_state(self, conn, last_hash):
+        """Site state of the last recorded snapshot, from memory or current_sites."""
+        if last_hash is None:
+            return {}
+        if self._current is not None and self._current[0] == last_hash:
+            return self._current[1]
+        return {site: tuple(values) for site, *values in conn.execute("SELECT * FROM current_sites")}
+
+    def compact(self, cutoff_day):
+        """Drop snapshots recorded before ``cutoff_day`` (a day number).
+
+        The last snapshot before the cutoff is kept, since it is the one in
+        effect when the window starts. Each site keeps its latest older
+        change, re-attached to that snapshot, so timelines start from the
+        site's state at that point.
+        """
+        with self._lock:
+            conn = self._connect()
+            try:
+                self._compact(conn, cutoff_day)
+            finally:
+                conn.close()
+
+    def _compact(self, conn, cutoff_day):
+        row = conn.execute("SELECT MAX(id) FROM snapshots WHERE day < ?", (cutoff_day,)).fetchone()
+        keep = row[0]
+        if keep is None:
+            return
+        with conn:
+            conn.execute(
+                "DELETE FROM site_changes WHERE snapshot_id < :keep AND (site, snapshot_id) NOT IN "
+                "(SELECT site, MAX(snapshot_id) FROM site_changes WHERE snapshot_id <= :keep "
+                "GROUP BY site)", {"keep": keep})
+            conn.execute("DELETE FROM site_changes WHERE snapshot_id < ? AND plan_day IS NULL",
+                         (keep,))
+            conn.execute("UPDATE site_changes SET snapshot_id = ? WHERE snapshot_id < ?", (keep, keep))
+            conn.execute("DELETE FROM plan_days WHERE snapshot_id < ?", (keep,))
+            dropped = conn.execute("DELETE FROM snapshots WHERE id < ?", (keep,)).rowcount
+        if dropped:
+            log.info("history_compacted", cutoff=day_strings([cutoff_day])[0], snapshots=dropped)
+
+    def site_timeline(self, site):
+        """Every recorded change of one site, oldest first."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT s.version, s.recorded_at, c.city, c.region, c.plan_day, c.lat, c.lng "
+                "FROM site_changes c JOIN snapshots s ON s.id = c.snapshot_id "
+                "WHERE c.site = ? ORDER BY c.snapshot_id", (site,)).fetchall()
+        finally:
+            conn.close()
+        timeline = []
+        previous_day = None
+        for version, recorded_at, city, region, plan_day, lat, lng in rows:
+            entry = {"version": version, "recordedAt": recorded_at}
+            if plan_day is None:
+                entry["change"] = "removed"
+            else:
+                entry.update({
+                    "change": "added" if previous_day is None else "changed",
+                    "CityName": city,
+                    "RegionName": region,
+                    "NextFuelingPlan": day_strings([plan_day])[0],
+                    "lat": lat,
+                    "lng": lng,
+                    "slipDays": None if previous_day is None else plan_day - previous_day,
+                })
+            previous_day = plan_day
+            timeline.append(entry)
+        return timeline
+
+    def overdue_trend(self, day_from, day_to):
+        """Per calendar day in [day_from, day_to]: overdue, due-today and total sites.
+
+        Each day is counted from the last snapshot recorded on or before it;
+        days before the first recorded snapshot are left out.
+        """
+        conn = self._connect()
+        try:
+            before = conn.execute("SELECT MAX(id) FROM snapshots WHERE day < ?",
+                                  (day_from,)).fetchone()[0]
+            latest = dict(conn.execute(
+                "SELECT day, MAX(id) FROM snapshots WHERE day BETWEEN ? AND ? GROUP BY day",
+                (day_from, day_to)))
+            trend = []
+            snapshot_id = before
+            for day in range(day_from, day_to + 1):
+                snapshot_id = latest.get(day, snapshot_id)
+                if snapshot_id is None:
+                    continue
+                overdue, today = conn.execute(
+                    "SELECT COALESCE(SUM(CASE WHEN day < :day THEN sites END), 0), "
+                    "COALESCE(SUM(CASE WHEN day = :day THEN sites END), 0) "
+                    "FROM plan_days WHERE snapshot_id = :id AND day <= :day",
+                    {"id": snapshot_id, "day": day}).fetchone()
+                version, sites = conn.execute("SELECT version, sites FROM snapshots WHERE id = ?",
+                                              (snapshot_id,)).fetchone()
+                trend.append({"date": day_strings([day])[0], "overdue": overdue, "dueToday": today,
+                              "totalSites": sites, "version": version})
+            return trend
+        finally:
+            conn.close()
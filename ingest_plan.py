@@ -0,0 +1,259 @@
+"""
+Compiled ingest plans for the sheet CSV.
+
+Working out how to read a sheet (normalizing every header name, matching
+the candidate lists, inferring the date format) only has to happen when its
+header changes. An ``IngestPlan`` records the outcome: which columns to
+read, as what dtypes, and the date format to parse with. Plans are keyed by
+a fingerprint of the raw header line, and ``PlanStore`` keeps them in memory
+and in a JSON file so a restarted process goes straight to parsing.
+
+Dates are parsed once per distinct value, with the plan's explicit format
+first; values it does not match (other formats, junk) try the other known
+formats in turn.
+"""
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+
+from logs import get_logger
+from sheet_fetch import write_atomic
+
+log = get_logger("fuel.ingest_plan")
+
+# Bump when the plan layout or detection rules change, to drop stored plans
+PLAN_FORMAT = 1
+
+# Column detection priorities, best match first (the published sheet may
+# only carry the spreadsheet column letters, see sample_sheet.csv: B, D, F,
+# L, M, AJ)
+COLUMN_CANDIDATES = {
+    "site": ["sitename", "site", "cowid", "siteno", "name", "b"],
+    "region": ["regionname", "region", "d"],
+    "city": ["cityname", "city", "location", "area", "f"],
+    "date": ["nextfuelingplan", "nextfueldate", "fueldate", "fuelplan", "aj"],
+    "lat": ["lat", "latitude", "l"],
+    "lng": ["lng", "lon", "long", "longitude", "m"],
+}
+
+# How each field is read: text as strings, low-cardinality names as categories
+FIELD_DTYPES = {"site": "string", "region": "category", "city": "category", "date": "string",
+                "lat": "string", "lng": "string"}
+
+# Date formats seen in the sheet, in the order ambiguous values are tried
+# (month first for slashes, like the dashboard's JavaScript Date parsing)
+DATE_FORMATS = (
+    "%Y-%m-%d",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%m/%d/%Y",
+    "%d/%m/%Y",
+    "%Y/%m/%d",
+    "%m/%d/%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+    "%d-%m-%Y",
+)
+
+# Rows sampled to infer the date format when a plan is compiled
+SAMPLE_ROWS = 2000
+
+# Plans kept in the store (one per distinct header seen recently)
+MAX_PLANS = 16
+
+NAT = np.datetime64("NaT", "D")
+
+
+def header_fingerprint(header_line):
+    """Fingerprint of a raw CSV header line (bytes or str) and the detection rules."""
+    if isinstance(header_line, bytes):
+        header_line = header_line.decode("utf-8", errors="replace")
+    key = json.dumps([PLAN_FORMAT, COLUMN_CANDIDATES, header_line.rstrip("\r\n")])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_columns(columns):
+    """Lower-case column names and strip spaces, underscores and dashes."""
+    import pandas as pd
+    return (
+        pd.Index(columns).astype(str)
+        .str.strip()
+        .str.replace(" ", "", regex=False)
+        .str.replace("_", "", regex=False)
+        .str.replace("-", "", regex=False)
+        .str.lower()
+    )
+
+
+def detect_columns(normalized):
+    """Return {field: column position or None} for the site/region/city/date/lat/lng fields.
+
+    Candidates are tried in priority order, so a "Region" column is never
+    taken for the city when the sheet also has a "City Name" one.
+    """
+    positions = {}
+    for i, c in enumerate(normalized):
+        positions.setdefault(c, i)
+    return {
+        field: next((positions[c] for c in candidates if c in positions), None)
+        for field, candidates in COLUMN_CANDIDATES.items()
+    }
+
+
+def detect_date_format(values):
+    """Return the DATE_FORMATS entry that parses most of ``values``, or None
+    when no single format parses at least half of the non-blank ones."""
+    import pandas as pd
+    values = pd.Series(values, dtype="string").str.strip()
+    values = values[values.notna() & (values != "")]
+    if values.empty:
+        return None
+    best, best_count = None, 0
+    for fmt in DATE_FORMATS:
+        count = int(pd.to_datetime(values, format=fmt, errors="coerce").notna().sum())
+        if count > best_count:
+            best, best_count = fmt, count
+    return best if best_count * 2 >= len(values) else None
+
+
+def parse_dates(values, date_format=None):
+    """Parse date strings into a datetime64[D] array (NaT where unparseable).
+
+    Each distinct value is parsed once (a sheet has far fewer distinct
+    dates than rows): with ``date_format`` first, then the other known
+    formats for whatever it did not match.
+    """
+    import pandas as pd
+    codes, uniques = pd.factorize(pd.Series(values, dtype="string"))
+    parsed = parse_each(uniques, date_format)
+    days = np.full(len(codes), NAT)
+    found = codes >= 0
+    days[found] = parsed[codes[found]]
+    return days
+
+
+def parse_each(uniques, date_format=None):
+    """Parse distinct date strings: every known format in turn, then free-form."""
+    import pandas as pd
+    uniques = pd.Series(np.asarray(uniques, dtype=object), dtype="string").str.strip()
+    days = np.full(len(uniques), NAT)
+    formats = DATE_FORMATS if date_format is None else \
+        (date_format,) + tuple(f for f in DATE_FORMATS if f != date_format)
+    for fmt in formats:
+        todo = np.flatnonzero(np.isnat(days))
+        if not len(todo):
+            return days
+        days[todo] = pd.to_datetime(uniques.iloc[todo], format=fmt,
+                                    errors="coerce").to_numpy().astype("datetime64[D]")
+    for i in np.flatnonzero(np.isnat(days)).tolist():
+        try:
+            stamp = pd.Timestamp(uniques.iloc[i])
+        except (ValueError, TypeError, OverflowError):
+            continue
+        if stamp is not pd.NaT:
+            days[i] = np.datetime64(stamp.tz_localize(None) if stamp.tzinfo else stamp, "D")
+    return days
+
+
+@dataclass(frozen=True)
+class IngestPlan:
+    """How to read one sheet layout: the detected columns and the date format."""
+    fingerprint: str
+    columns: tuple       # column names as pandas reads the header
+    fields: dict         # field -> column position, for the detected fields
+    date_format: str     # None when the dates have no dominant format
+
+    @property
+    def used(self):
+        """(position, field) of every detected column, in sheet order."""
+        return sorted((pos, field) for field, pos in self.fields.items())
+
+    @property
+    def usecols(self):
+        return [pos for pos, _ in self.used]
+
+    @property
+    def field_names(self):
+        return [field for _, field in self.used]
+
+    @property
+    def dtypes(self):
+        """read_csv ``dtype`` mapping for the detected columns."""
+        return {self.columns[pos]: FIELD_DTYPES[field] for pos, field in self.used}
+
+    def to_json(self):
+        return {"fingerprint": self.fingerprint, "columns": list(self.columns),
+                "fields": self.fields, "dateFormat": self.date_format}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["fingerprint"], tuple(data["columns"]), dict(data["fields"]),
+                   data["dateFormat"])
+
+
+def compile_plan(fingerprint, frame):
+    """Detect the fields of ``frame``'s header and, from its first rows, the date format.
+
+    ``frame`` is the whole sheet or a sample of its leading rows, read as text.
+    """
+    columns = tuple(str(c) for c in frame.columns)
+    normalized = normalize_columns(columns)
+    detected = detect_columns(normalized)
+    fields = {field: pos for field, pos in detected.items() if pos is not None}
+    date_format = None
+    if "date" in fields:
+        date_format = detect_date_format(frame.iloc[:SAMPLE_ROWS, fields["date"]].astype("string"))
+    plan = IngestPlan(fingerprint, columns, fields, date_format)
+    log.info("ingest_plan_compiled", fingerprint=fingerprint, date_format=date_format, **{
+        field: normalized[pos] if pos is not None else None for field, pos in detected.items()
+    })
+    return plan
+
+
+class PlanStore:
+    """Ingest plans by header fingerprint, persisted to a JSON file.
+
+    The file is read on first use and rewritten (atomically) whenever a new
+    plan is compiled; a missing or unreadable file just means recompiling.
+    """
+
+    def __init__(self, path, limit=MAX_PLANS):
+        self.path = path
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._plans = None
+
+    def get(self, fingerprint):
+        with self._lock:
+            return self._load().get(fingerprint)
+
+    def put(self, plan):
+        with self._lock:
+            plans = self._load()
+            plans.pop(plan.fingerprint, None)
+            plans[plan.fingerprint] = plan
+            while len(plans) > self.limit:
+                plans.pop(next(iter(plans)))
+            body = {"format": PLAN_FORMAT, "plans": [p.to_json() for p in plans.values()]}
+            try:
+                write_atomic(self.path, (json.dumps(body, indent=1) + "\n").encode("utf-8"))
+            except OSError as e:
+                log.warning("ingest_plan_not_saved", path=self.path, error=str(e))
+
+    def _load(self):
+        if self._plans is None:
+            self._plans = {}
+            try:
+                with open(self.path, "rb") as f:
+                    body = json.load(f)
+                if body.get("format") == PLAN_FORMAT:
+                    for data in body["plans"]:
+                        plan = IngestPlan.from_json(data)
+                        self._plans[plan.fingerprint] = plan
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                log.warning("ingest_plans_unreadable", path=self.path, error=str(e))
+        return self._plans
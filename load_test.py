@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Small HTTP load generator for comparing serving modes.
+
+Each client is a separate process holding one keep-alive connection and
+issuing GET requests back to back for a fixed time:
+
+    python load_test.py http://localhost:8080/api/fuel/dashboard --clients 8 --seconds 10
+
+Prints requests/second, latency percentiles and the error count as JSON.
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import time
+from urllib.parse import urlsplit
+
+
+def run_client(url, seconds, headers):
+    """Hammer ``url`` over one connection; return (latencies, errors)."""
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+            if response.getheader("Connection", "").lower() == "close" or response.will_close:
+                conn.close()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return latencies, errors
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def load_test(url, clients=8, seconds=10.0, headers=None):
+    """Run ``clients`` concurrent clients against ``url`` and summarize the results."""
+    with multiprocessing.Pool(clients) as pool:
+        results = pool.starmap(run_client, [(url, seconds, headers or {})] * clients)
+    latencies = sorted(l for client, _ in results for l in client)
+    return {
+        "url": url,
+        "clients": clients,
+        "seconds": seconds,
+        "requests": len(latencies),
+        "errors": sum(errors for _, errors in results),
+        "requestsPerSecond": round(len(latencies) / seconds, 1),
+        "p50Ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p99Ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("url")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--gzip", action="store_true", help="send Accept-Encoding: gzip")
+    args = parser.parse_args()
+    headers = {"Accept-Encoding": "gzip"} if args.gzip else {}
+    print(json.dumps(load_test(args.url, args.clients, args.seconds, headers), indent=2))
@@ -1,13 +1,36 @@
+import hashlib
 import json
-import pandas as pd
-from datetime import datetime
-from flask import Flask, jsonify, send_from_directory, send_file
+import numpy as np
+from datetime import datetime, timezone
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
 import os
+import threading
+import time
 
-app = Flask(__name__, static_folder='.')
+from delta_log import DeltaLog
+from dispatch import DEFAULT_NEAREST, MAX_NEAREST, DispatchPlan, parse_depots
+from event_hub import EventHub, parse_last_event_id, start_event_server
+from forecast import DEFAULT_FORECAST_DAYS, MAX_FORECAST_DAYS, Forecast
+from history_store import MAX_TREND_DAYS, HistoryStore
+from ingest_plan import SAMPLE_ROWS, PlanStore, compile_plan, header_fingerprint, parse_dates
+from logs import configure_logging, get_logger
+from metrics import REGISTRY, stage_timer
+from refresher import Refresher
+from reports import ReportWriter
+from response_cache import ResponseCache
+from sheet_fetch import SheetSource, SheetSources, parse_sources
+from snapshot_store import read_snapshot, write_snapshot
+from static_assets import AssetBundle
+from site_index import SORT_KEYS, STATUS_OFFSETS, clip_ranges, status_ranges
+from site_table import SiteTable, diff_tables
+
+# Static files are served from the in-memory AssetBundle allowlist only
+app = Flask(__name__, static_folder=None)
 CORS(app)
 
+log = get_logger("fuel.main")
+
 # Live Google Sheet CSV link
 SHEET_URL = (
     "https://docs.google.com/spreadsheets/d/e/"
@@ -15,6 +38,53 @@ SHEET_URL = (
     "/pub?gid=1149576218&single=true&output=csv"
 )
 
+# Sheet tabs to load, as comma-separated Region=url entries (default: the
+# Central tab above). The region labels rows of tabs without a region column.
+SHEET_SOURCES = parse_sources(os.environ.get('SHEET_SOURCES', '')) or [SheetSource("Central", SHEET_URL)]
+
+# Regions kept by ingest, matched case-insensitively ("*" keeps every region)
+SHEET_REGIONS = os.environ.get('SHEET_REGIONS', 'Central')
+INCLUDED_REGIONS = None if SHEET_REGIONS.strip() == '*' else {
+    region.strip().casefold() for region in SHEET_REGIONS.split(',') if region.strip()
+}
+
+# Untracked directory for files written at runtime (created on first write)
+RUNTIME_DIR = os.environ.get(
+    'RUNTIME_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'var')
+)
+
+# Last good download of the sheet (with several sources, one file per
+# source next to this path), used when Google Sheets is unreachable
+SHEET_LOCAL_PATH = os.environ.get(
+    'SHEET_LOCAL_PATH',
+    os.path.join(RUNTIME_DIR, 'sheet_cache.csv')
+)
+
+# Ingest plans (column mapping, dtypes, date format) by sheet header, kept
+# across restarts
+INGEST_PLAN_PATH = os.environ.get(
+    'INGEST_PLAN_PATH',
+    os.path.join(RUNTIME_DIR, 'ingest_plans.json')
+)
+
+# Last installed snapshot: served at startup until the first load finishes,
+# and shared with the workers under serve.py
+SNAPSHOT_PATH = os.environ.get(
+    'SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot.bin')
+)
+
+# SQLite history of every distinct snapshot ("" disables it)
+HISTORY_PATH = os.environ.get(
+    'HISTORY_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.sqlite3')
+)
+
+# Default coordinates (Riyadh) for sites without a location
+DEFAULT_LAT = 24.7136
+DEFAULT_LNG = 46.6753
+
 # Mock data for development
 MOCK_DATA = [
     {
@@ -61,214 +131,1030 @@ MOCK_DATA = [
     }
 ]
 
-def load_data():
-    """Load data from Google Sheet or fallback to mock data"""
+def read_setting(name, default):
+    """Read a non-negative number (seconds, rows, ...) from the environment."""
     try:
-        print(f"Loading sheet: {SHEET_URL}")
-        df = pd.read_csv(SHEET_URL)
-        return clean_and_filter(df)
+        return max(0.0, float(os.environ.get(name, default)))
+    except ValueError:
+        log.warning("invalid_setting", name=name, default=default)
+        return float(default)
+
+# Network timeout (seconds) for each sheet request
+SHEET_TIMEOUT = read_setting('SHEET_TIMEOUT', 10)
+
+# Wall-clock limit (seconds) on one source's download before its cached copy is used
+SHEET_DEADLINE = read_setting('SHEET_DEADLINE', 30)
+
+# Sheet sources downloaded at the same time
+SHEET_FETCH_WORKERS = int(read_setting('SHEET_FETCH_WORKERS', 4)) or 1
+
+sheet_sources = SheetSources(SHEET_SOURCES, SHEET_LOCAL_PATH, timeout=SHEET_TIMEOUT,
+                             deadline=SHEET_DEADLINE, workers=SHEET_FETCH_WORKERS)
+
+# Per source: (raw sheet digest, cleaned SiteTable) of its last parse
+_parsed_sources = {}
+
+# (raw digest of every source, merged SiteTable) of the last load
+_parsed_sheet = (None, None)
+
+def fetch_data():
+    """Load every sheet source (or its local cache), raising on failure.
+
+    Sources are downloaded concurrently and merged into one table. A source
+    whose raw bytes are unchanged since the last load is not parsed again,
+    and when none changed the previous table is returned as is.
+    """
+    global _parsed_sheet
+    log.info("sheet_fetch", sources=[source.region or source.url for source in SHEET_SOURCES])
+    with stage_timer("fetch"):
+        results = sheet_sources.fetch()
+    for result in results:
+        REGISTRY.counter("fuel_sheet_fetch_total", "Sheet fetches by where the bytes came from",
+                         source=result.source)
+    digests = tuple(result.digest for result in results)
+    if digests == _parsed_sheet[0]:
+        log.info("sheet_unchanged", sources=[result.source for result in results])
+        return _parsed_sheet[1]
+    tables = []
+    with stage_timer("parse"):
+        for source, result in zip(SHEET_SOURCES, results):
+            digest, table = _parsed_sources.get(source, (None, None))
+            if result.digest != digest:
+                table = parse_sheet(result, source.region)
+                _parsed_sources[source] = (result.digest, table)
+            tables.append(table)
+    data = tables[0] if len(tables) == 1 else SiteTable.concat(tables)
+    _parsed_sheet = (digests, data)
+    return data
+
+def parse_sheet(result, region):
+    """Clean one downloaded sheet into a SiteTable and log the outcome."""
+    before = {outcome: REGISTRY.value(INGEST_ROWS, outcome=outcome) or 0 for outcome in INGEST_DROPS}
+    with result.open() as f:
+        if SHEET_CHUNK_ROWS:
+            table = clean_and_filter_stream(f, region=region)
+        else:
+            import pandas as pd
+            table = clean_and_filter(pd.read_csv(f), region=region)
+    log.info("sheet_parsed", region=region, source=result.source, bytes=result.size,
+             sites=len(table), **{
+                 outcome: (REGISTRY.value(INGEST_ROWS, outcome=outcome) or 0) - count
+                 for outcome, count in before.items()
+             })
+    return table
+
+def load_startup_data():
+    """Return the snapshot persisted by the last run, or the mock data.
+
+    Startup never waits on Google Sheets; the first fetch runs in the
+    background once the server starts.
+    """
+    try:
+        snapshot, _ = read_snapshot(SNAPSHOT_PATH)
+        log.info("startup_snapshot", source="persisted", version=snapshot.version,
+                 sites=len(snapshot.table))
+        return snapshot
+    except FileNotFoundError:
+        pass
     except Exception as e:
-        print(f"Failed to load from Google Sheets: {e}")
-        print("Using mock data for development")
-        return MOCK_DATA
-
-def clean_and_filter(df):
-    """Auto-detect SiteName, CityName, NextFuelingPlan columns safely."""
-    # Normalize column names
-    df.columns = (
-        df.columns.astype(str)
-        .str.strip()
-        .str.replace(" ", "", regex=False)
-        .str.replace("_", "", regex=False)
-        .str.replace("-", "", regex=False)
-        .str.lower()
+        log.warning("persisted_snapshot_unreadable", path=SNAPSHOT_PATH, error=str(e))
+    log.info("startup_snapshot", source="mock", sites=len(MOCK_DATA))
+    return SiteTable.from_records(MOCK_DATA)
+
+# Rows per chunk in streaming ingest (0 parses the whole sheet at once)
+SHEET_CHUNK_ROWS = int(read_setting('SHEET_CHUNK_ROWS', 50000))
+
+ingest_plans = PlanStore(INGEST_PLAN_PATH)
+
+def frame_plan(df):
+    """Return the ingest plan for an already-read sheet, compiling it on a new header."""
+    fingerprint = header_fingerprint(",".join(map(str, df.columns)))
+    plan = ingest_plans.get(fingerprint)
+    if plan is None:
+        plan = compile_plan(fingerprint, df)
+        ingest_plans.put(plan)
+    return plan
+
+def stream_plan(source):
+    """Return the ingest plan for a CSV path or binary file object.
+
+    A known header costs one line read; a new one is compiled from a sample
+    of the leading rows.
+    """
+    import pandas as pd
+    if hasattr(source, "readline"):
+        line = source.readline()
+        source.seek(0)
+    else:
+        with open(source, "rb") as f:
+            line = f.readline()
+    fingerprint = header_fingerprint(line)
+    plan = ingest_plans.get(fingerprint)
+    if plan is None:
+        sample = pd.read_csv(source, nrows=SAMPLE_ROWS, dtype=str)
+        if hasattr(source, "seek"):
+            source.seek(0)
+        plan = compile_plan(fingerprint, sample)
+        ingest_plans.put(plan)
+    return plan
+
+def clean_and_filter(df, region=None):
+    """Auto-detect SiteName, RegionName, CityName, NextFuelingPlan columns safely.
+
+    Returns a SiteTable; ``to_records()`` gives the dashboard JSON shape.
+    ``region`` labels rows the sheet gives no region (see clean_frame).
+    """
+    import pandas as pd
+    plan = frame_plan(df)
+    frame = pd.DataFrame({field: df.iloc[:, pos] for field, pos in plan.fields.items()})
+    return clean_frame(frame, region, plan.date_format)
+
+def clean_and_filter_stream(source, chunksize=None, region=None):
+    """Stream a CSV through clean_frame chunk by chunk.
+
+    The ingest plan for the sheet's header says which columns to read (as
+    strings, cities and regions as categories) and how to parse the dates.
+    Each chunk is date-parsed and filtered before the next one is read, so
+    peak memory tracks the chunk size rather than the sheet size.
+    ``source`` is a path or binary file object.
+    """
+    import pandas as pd
+    plan = stream_plan(source)
+    if "date" not in plan.fields:
+        return SiteTable.from_records([])
+
+    tables = []
+    chunks = pd.read_csv(
+        source,
+        usecols=plan.usecols,
+        dtype=plan.dtypes,
+        chunksize=chunksize or SHEET_CHUNK_ROWS or 50000,
     )
+    for chunk in chunks:
+        chunk.columns = plan.field_names
+        tables.append(clean_frame(chunk, region, plan.date_format))
+    return SiteTable.concat(tables)
 
-    # Column detection priorities
-    site_candidates = ["sitename", "site", "cowid", "siteno", "name"]
-    city_candidates = ["cityname", "city", "location", "area", "region"]
-    date_candidates = ["nextfuelingplan", "nextfueldate", "fueldate", "fuelplan"]
+# Sheet rows kept, dropped for lacking a parseable fueling date, or
+# filtered out as belonging to a region outside SHEET_REGIONS
+INGEST_ROWS = "fuel_ingest_rows_total"
+INGEST_ROWS_HELP = "Sheet rows kept, dropped (no parseable date) or filtered (other region) by ingest"
+INGEST_DROPS = ("dropped", "filtered")
 
-    def pick(candidates):
-        return next((c for c in df.columns if c in candidates), None)
+def clean_frame(frame, region=None, date_format=None):
+    """Turn a frame with site/region/city/date/lat/lng columns into a SiteTable.
 
-    site_col = pick(site_candidates)
-    city_col = pick(city_candidates)
-    date_col = pick(date_candidates)
+    Missing site or city columns become "Unknown", rows without a parseable
+    date (``date_format`` first, then any known format) are dropped, and
+    coordinates default to Riyadh only where the sheet has no usable value.
+    Rows without a region value take ``region``; when a region is known at
+    all, rows outside INCLUDED_REGIONS are filtered out.
+    """
+    if "date" not in frame:
+        REGISTRY.counter(INGEST_ROWS, INGEST_ROWS_HELP, len(frame), outcome="dropped")
+        return SiteTable.from_records([])
+    with stage_timer("dates"):
+        days = parse_dates(frame["date"], date_format)
+    with stage_timer("clean"):
+        return filter_frame(frame, days, region)
 
-    # Fallbacks for missing columns
-    if site_col is None:
-        df["sitename"] = "Unknown"
-        site_col = "sitename"
+def filter_frame(frame, days, region):
+    """Drop undated and out-of-region rows of ``frame`` and build the SiteTable."""
+    keep = ~np.isnat(days)
+    dated = int(keep.sum())
+    regions = region_column(frame, region)
+    if regions is not None and INCLUDED_REGIONS is not None:
+        keep &= regions.str.casefold().isin(INCLUDED_REGIONS).to_numpy(dtype=bool, na_value=False)
+    kept = int(keep.sum())
+    REGISTRY.counter(INGEST_ROWS, INGEST_ROWS_HELP, kept, outcome="kept")
+    REGISTRY.counter(INGEST_ROWS, INGEST_ROWS_HELP, len(frame) - dated, outcome="dropped")
+    REGISTRY.counter(INGEST_ROWS, INGEST_ROWS_HELP, dated - kept, outcome="filtered")
+    if kept < len(frame):
+        frame = frame[keep]
+        days = days[keep]
+        regions = None if regions is None else regions[keep]
 
-    if city_col is None:
-        df["cityname"] = "Unknown"
-        city_col = "cityname"
+    return SiteTable.from_columns(
+        text_column(frame, "site"),
+        text_column(frame, "city"),
+        days.astype(np.int32),
+        coordinate_column(frame, "lat", DEFAULT_LAT).to_numpy(),
+        coordinate_column(frame, "lng", DEFAULT_LNG).to_numpy(),
+        None if regions is None else regions.astype(object).where(regions.notna(), None).tolist(),
+    )
 
-    if date_col is None:
-        df["nextfuelingplan"] = pd.NaT
-        date_col = "nextfuelingplan"
+def region_column(frame, default):
+    """Return the trimmed region of every row, ``default`` where the sheet has none.
 
-    # Parse date column
-    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.dropna(subset=[date_col])
+    None when neither the sheet nor ``default`` says which region a row is in.
+    """
+    import pandas as pd
+    if "region" not in frame:
+        if default is None:
+            return None
+        return pd.Series(default, index=frame.index, dtype="string")
+    regions = frame["region"].astype("string").str.strip()
+    if default is not None:
+        regions = regions.mask(regions.isna() | (regions == ""), default)
+    else:
+        regions = regions.mask(regions == "")
+    return regions
 
-    print(f"[INFO] Using columns: Site={site_col} | City={city_col} | Date={date_col}")
+def text_column(frame, field):
+    """Return a text column as a Python list, "Unknown" when the sheet lacks it."""
+    if field not in frame:
+        return ["Unknown"] * len(frame)
+    return frame[field].astype(object).where(frame[field].notna(), None).tolist()
 
-    # Convert to list of dicts and add mock coordinates if missing
-    data = []
-    for _, row in df.iterrows():
-        data.append({
-            "SiteName": row[site_col],
-            "CityName": row[city_col],
-            "NextFuelingPlan": row[date_col].strftime("%Y-%m-%d"),
-            "lat": getattr(row, 'lat', 24.7136),  # Default to Riyadh
-            "lng": getattr(row, 'lng', 46.6753)   # Default to Riyadh
-        })
+def coordinate_column(frame, field, default):
+    """Return a float coordinate column, filling missing values with a default."""
+    import pandas as pd
+    if field not in frame:
+        return pd.Series(default, index=frame.index, dtype="float64")
+    return pd.to_numeric(frame[field], errors="coerce").fillna(default)
 
-    return data
+# Where the report files go, and their formats (csv, parquet, arrow)
+REPORT_DIR = os.environ.get('REPORT_DIR', os.path.dirname(os.path.abspath(__file__)))
+REPORT_FORMATS = [f.strip() for f in os.environ.get('REPORT_FORMATS', 'csv').split(',') if f.strip()]
+
+report_writer = ReportWriter(REPORT_DIR, REPORT_FORMATS)
 
-def generate_reports(data):
-    """Generate today's and pending fueling reports."""
-    today = pd.to_datetime(datetime.today().date())
+def generate_reports(table):
+    """Generate today's and pending fueling reports, plus data.json."""
+    with stage_timer("reports"):
+        results = report_writer.write(table, today_day_number())
+    for name, (count, written) in results.items():
+        log.info("report_generated", report=name, sites=count, written=written or "unchanged")
 
-    df = pd.DataFrame(data)
-    df['NextFuelingPlan'] = pd.to_datetime(df['NextFuelingPlan'])
+# Day-offset buckets used by the dashboard KPIs
+BUCKET_OVERDUE, BUCKET_TODAY, BUCKET_TOMORROW, BUCKET_AFTER_TOMORROW, BUCKET_LATER = range(5)
 
-    df_today = df[df['NextFuelingPlan'] == today]
-    df_pending = df[df['NextFuelingPlan'] < today]
+# Per-snapshot stats cache: (table, day, stats), replaced whole so readers
+# never see a half-updated entry
+_stats_cache = (None, None, None)
 
-    df_today.to_csv("fuel_today.csv", index=False)
-    df_pending.to_csv("fuel_pending.csv", index=False)
+def today_day_number():
+    """Return the local calendar day as days since the epoch."""
+    return int(np.datetime64(datetime.today().date(), 'D').astype(np.int32))
 
-    print("[OK] fuel_today.csv generated.")
-    print("[OK] fuel_pending.csv generated.")
-    print(f"   -> Due today: {len(df_today)}")
-    print(f"   -> Pending overdue: {len(df_pending)}")
+def bucket_counts(table, today=None):
+    """Count sites per urgency bucket (overdue, today, tomorrow, after tomorrow, later)."""
+    if today is None:
+        today = today_day_number()
+    offsets = table.day - today
+    buckets = np.clip(offsets, -1, 3) + 1
+    return np.bincount(buckets, minlength=5)
 
-def calculate_stats(data):
-    """Calculate dashboard statistics"""
-    today = datetime.today().date()
-    tomorrow = pd.to_datetime(today) + pd.Timedelta(days=1)
-    after_tomorrow = pd.to_datetime(today) + pd.Timedelta(days=2)
+def calculate_stats(table, last_updated=None):
+    """Calculate dashboard statistics, memoized per snapshot and calendar day"""
+    global _stats_cache
+    today = today_day_number()
+    cached_table, cached_day, stats = _stats_cache
+    if cached_table is table and cached_day == today:
+        return stats
 
-    today_count = 0
-    tomorrow_count = 0
-    after_tomorrow_count = 0
-    overdue_count = 0
+    counts = bucket_counts(table, today)
+    stats = {
+        "totalSites": len(table),
+        "needFuelToday": int(counts[BUCKET_TODAY]),
+        "tomorrow": int(counts[BUCKET_TOMORROW]),
+        "afterTomorrow": int(counts[BUCKET_AFTER_TOMORROW]),
+        "overdue": int(counts[BUCKET_OVERDUE]),
+        "lastUpdated": (last_updated or datetime.now()).isoformat()
+    }
+    _stats_cache = (table, today, stats)
+    return stats
 
-    for site in data:
-        site_date = pd.to_datetime(site['NextFuelingPlan']).date()
+# Per-snapshot forecast histogram: (table, day, Forecast), like _stats_cache
+_forecast_cache = (None, None, None)
 
-        if site_date == today:
-            today_count += 1
-        elif site_date == tomorrow.date():
-            tomorrow_count += 1
-        elif site_date == after_tomorrow.date():
-            after_tomorrow_count += 1
-        elif site_date < today:
-            overdue_count += 1
+def daily_forecast(table):
+    """Return the Forecast for ``table``, built once per snapshot and calendar day"""
+    global _forecast_cache
+    today = today_day_number()
+    cached_table, cached_day, forecast = _forecast_cache
+    if cached_table is table and cached_day == today:
+        return forecast
+    forecast = Forecast(table, today)
+    _forecast_cache = (table, today, forecast)
+    return forecast
 
+def snapshot_event(snapshot, previous, upserted, removed):
+    """Build the push event for a new snapshot: row-level delta plus stats."""
     return {
-        "totalSites": len(data),
-        "needFuelToday": today_count,
-        "tomorrow": tomorrow_count,
-        "afterTomorrow": after_tomorrow_count,
-        "overdue": overdue_count,
-        "lastUpdated": datetime.now().isoformat()
+        "version": snapshot.version,
+        "previousVersion": previous.version,
+        "upserted": snapshot.table.take(upserted).to_records(),
+        "removed": removed,
+        "stats": calculate_stats(snapshot.table, snapshot.loaded_at),
+        "lastUpdated": snapshot.loaded_at.isoformat()
     }
 
-# Load data on startup
-fuel_data = load_data()
+# None when imported; "single" once serving under app.run, "loader" or
+# "worker" under serve.py
+process_role = None
+
+def on_snapshot_installed(snapshot, previous):
+    """Warm the indexes, record the diff, notify subscribers and regenerate the CSV reports.
+
+    A serving process also persists every snapshot to SNAPSHOT_PATH (under
+    serve.py that is how workers receive it; they leave the file, the
+    history and the reports to the loader) and records it in the history.
+    """
+    if process_role in ("single", "loader"):
+        with stage_timer("persist"):
+            write_snapshot(SNAPSHOT_PATH, snapshot, refresher.refreshed_at)
+        if history is not None:
+            with stage_timer("history"):
+                history.record(snapshot)
+    with stage_timer("index"):
+        snapshot.index
+        snapshot.geo
+    if snapshot is not previous:
+        upserted, removed = diff_tables(previous.table, snapshot.table)
+        delta_log.record(previous.version, snapshot.version,
+                         snapshot.table.sites[upserted].tolist(), removed)
+        event_hub.publish("snapshot", snapshot_event(snapshot, previous, upserted, removed))
+        response_cache.invalidate('sites-since:')
+        response_cache.invalidate('dashboard-since:')
+    if process_role != "worker":
+        generate_reports(snapshot.table)
+
+# Seconds between background refreshes (0 disables the scheduler)
+REFRESH_INTERVAL = read_setting('REFRESH_INTERVAL', 300)
+
+# Port of the standalone asyncio SSE server (0 serves events from Flask only)
+EVENTS_PORT = int(read_setting('EVENTS_PORT', 0))
+
+# Snapshot change notifications for /api/fuel/events
+event_hub = EventHub()
+
+# Number of recent refreshes /api/fuel/sites?since= can catch up from
+DELTA_HISTORY = int(read_setting('DELTA_HISTORY', 20))
+
+# Per-refresh diffs keyed by version, for /api/fuel/sites?since=
+delta_log = DeltaLog(DELTA_HISTORY)
+
+# Days of snapshot history kept (0 keeps everything)
+HISTORY_RETENTION_DAYS = int(read_setting('HISTORY_RETENTION_DAYS', 90))
+
+# Distinct snapshots over time, for the /api/fuel/history endpoints
+history = HistoryStore(HISTORY_PATH, HISTORY_RETENTION_DAYS) if HISTORY_PATH else None
+
+# Serve the persisted (or mock) data right away; loads run in the background
+# and keep the last good snapshot when the sheet cannot be fetched
+refresher = Refresher(fetch_data, load_startup_data(), interval=REFRESH_INTERVAL,
+                      on_install=on_snapshot_installed)
+
+def start_background_services():
+    """Start the first load, the refresh scheduler and, if configured, the SSE event server."""
+    global process_role
+    if process_role is None:
+        process_role = "single"
+    refresher.trigger()
+    refresher.start()
+    if EVENTS_PORT:
+        start_event_server(event_hub, port=EVENTS_PORT)
+        log.info("event_server_started", port=EVENTS_PORT, path="/api/fuel/events")
+
+# (snapshot, approximate bytes) of the last size measurement
+_snapshot_size = (None, 0)
+
+def collect_app_metrics():
+    """Scrape-time metrics: the current snapshot and the response cache."""
+    global _snapshot_size
+    snapshot = refresher.current()
+    if _snapshot_size[0] is not snapshot:
+        _snapshot_size = (snapshot, snapshot.table.nbytes)
+    yield ("fuel_snapshot_version", "gauge", "Version of the snapshot being served", {},
+           snapshot.version)
+    yield ("fuel_snapshot_sites", "gauge", "Sites in the snapshot being served", {},
+           len(snapshot.table))
+    yield ("fuel_snapshot_bytes", "gauge", "Approximate memory held by the snapshot", {},
+           _snapshot_size[1])
+    yield ("fuel_snapshot_age_seconds", "gauge", "Seconds since the snapshot was loaded", {},
+           (datetime.now() - snapshot.loaded_at).total_seconds())
+    yield ("fuel_ready", "gauge", "1 once fresh data has loaded in this process", {},
+           int(refresher.refreshed_at is not None))
+    cache = response_cache.stats()
+    for result, key in (("hit", "hits"), ("miss", "misses")):
+        yield ("fuel_response_cache_requests_total", "counter", "Rendered-payload cache lookups",
+               {"result": result}, cache[key])
+    yield ("fuel_response_cache_hit_ratio", "gauge", "Share of payload lookups served from cache",
+           {}, cache["hitRatio"])
+
+REGISTRY.add_collector(collect_app_metrics)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    """Observe per-route latency (the route pattern, not the raw path, keeps labels bounded)."""
+    started = g.pop('request_started', None)
+    if started is not None:
+        REGISTRY.observe("fuel_http_request_duration_seconds", "Request latency by route",
+                         time.perf_counter() - started,
+                         route=request.url_rule.rule if request.url_rule else "unmatched",
+                         method=request.method, status=str(response.status_code))
+    return response
+
+def snapshot_last_modified(snapshot):
+    """Return the snapshot load time as a UTC datetime with HTTP (second) precision."""
+    return snapshot.loaded_at.astimezone(timezone.utc).replace(microsecond=0)
+
+def is_not_modified(snapshot, etag, use_last_modified=True):
+    """Check the request's If-None-Match / If-Modified-Since against a snapshot."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if use_last_modified and request.if_modified_since:
+        return snapshot_last_modified(snapshot) <= request.if_modified_since
+    return False
+
+def render_json(obj):
+    """Serialize ``obj`` exactly as jsonify would, as bytes."""
+    with stage_timer("render"):
+        return (app.json.dumps(obj) + "\n").encode("utf-8")
+
+def cached_json(key, token, build, cache=None):
+    """Serve the pre-rendered payload for ``key`` (from ``cache``, default
+    response_cache) in the best accepted encoding."""
+    payload = (cache or response_cache).get(key, token, lambda: render_json(build()))
+    encoding = request.accept_encodings.best_match(payload.encodings, default="identity")
+    response = app.response_class(payload.variant(encoding), mimetype=app.json.mimetype)
+    if encoding != "identity":
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+def set_entity_tag(response, etag):
+    """Set ``etag`` on a 200 or 304 response alike: weak whenever the client
+    accepts a compressed encoding, since the body it gets (or would get)
+    may then be an encoded variant."""
+    weak = request.accept_encodings.best_match(('br', 'gzip')) is not None
+    response.set_etag(etag, weak=weak)
+
+def snapshot_response(snapshot, build, etag=None, use_last_modified=True):
+    """Answer with 304 when the client's copy is current, else ``build()``.
+
+    Either way the response carries the snapshot's ETag (or ``etag`` for
+    derived views) and Last-Modified, and must be revalidated before reuse.
+    The ETag is weak for clients that accept compression. Views that change
+    with the calendar day pass ``use_last_modified=False`` and rely on the
+    ETag alone.
+    """
+    etag = etag or snapshot.content_hash
+    if is_not_modified(snapshot, etag, use_last_modified):
+        response = app.response_class(status=304)
+    else:
+        response = build()
+    set_entity_tag(response, etag)
+    if use_last_modified:
+        response.last_modified = snapshot_last_modified(snapshot)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Rendered JSON bodies, keyed by endpoint and invalidated per snapshot
+response_cache = ResponseCache()
+
+# Query parameters accepted by /api/fuel/sites
+SITE_QUERY_PARAMS = ('city', 'region', 'status', 'from', 'to', 'sort', 'limit', 'cursor')
+
+def query_values(name):
+    """Return the values of a repeated and/or comma-separated query parameter."""
+    return [v.strip() for raw in request.args.getlist(name) for v in raw.split(',') if v.strip()]
+
+def parse_day(value, name):
+    """Parse a YYYY-MM-DD query value into a day number."""
+    try:
+        return int(np.datetime64(value, 'D').astype(np.int32))
+    except ValueError:
+        raise ValueError(f"Invalid '{name}' date {value!r}, expected YYYY-MM-DD")
+
+def parse_site_query(snapshot):
+    """Validate the /api/fuel/sites filters into (cities, regions, ranges, sort, offset, limit)."""
+    cities = query_values('city') or None
+    regions = query_values('region') or None
+
+    statuses = query_values('status')
+    unknown = [s for s in statuses if s not in STATUS_OFFSETS]
+    if unknown:
+        raise ValueError(f"Unknown status {unknown[0]!r}, expected one of {', '.join(STATUS_OFFSETS)}")
+    day_from = parse_day(request.args['from'], 'from') if request.args.get('from') else None
+    day_to = parse_day(request.args['to'], 'to') if request.args.get('to') else None
+    ranges = status_ranges(statuses, today_day_number()) if statuses else None
+    if day_from is not None or day_to is not None:
+        ranges = clip_ranges(ranges, day_from, day_to)
+
+    sort = request.args.get('sort', 'date')
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort {sort!r}, expected one of {', '.join(SORT_KEYS)}")
+
+    limit = None
+    if request.args.get('limit'):
+        try:
+            limit = int(request.args['limit'])
+        except ValueError:
+            limit = 0
+        if limit <= 0:
+            raise ValueError("'limit' must be a positive integer")
+
+    offset = 0
+    if request.args.get('cursor'):
+        version, _, position = request.args['cursor'].partition('.')
+        if not (version.isdigit() and position.isdigit()):
+            raise ValueError("Invalid 'cursor'")
+        if int(version) != snapshot.version:
+            raise ValueError("'cursor' belongs to an older data version, restart from the first page")
+        offset = int(position)
+    return cities, regions, ranges, sort, offset, limit
+
+def query_etag(snapshot, params=SITE_QUERY_PARAMS, daily=False):
+    """ETag for a derived view: snapshot hash, query and, for views that
+    depend on the calendar day, today."""
+    key = [request.path, snapshot.content_hash] + sorted(
+        f"{name}={value}" for name in params for value in request.args.getlist(name)
+    )
+    if daily:
+        key.append(str(today_day_number()))
+    return hashlib.sha256("&".join(key).encode("utf-8")).hexdigest()[:32]
+
+def query_sites(snapshot, query):
+    """Build the /api/fuel/sites body for a parsed filter/sort/page query."""
+    cities, regions, ranges, sort, offset, limit = query
+    index = snapshot.index
+    rows = index.sort(index.rows(cities, ranges, regions), sort)
+    end = len(rows) if limit is None else offset + limit
+    page = rows[offset:end]
+    return {
+        "success": True,
+        "data": snapshot.table.take(page).to_records(),
+        "count": len(page),
+        "total": len(rows),
+        "version": snapshot.version,
+        "nextCursor": f"{snapshot.version}.{end}" if end < len(rows) else None,
+        "lastUpdated": snapshot.loaded_at.isoformat()
+    }
+
+# Front-end files held in memory, fingerprinted and precompressed
+static_assets = AssetBundle(os.path.dirname(os.path.abspath(__file__)))
+
+def asset_response(asset):
+    """Serve an in-memory asset in the best accepted encoding, or 304 when the client has it."""
+    payload = asset.payload
+    encoding = request.accept_encodings.best_match(payload.encodings, default="identity")
+    if request.if_none_match.contains_weak(asset.etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(payload.variant(encoding), content_type=asset.content_type)
+        if encoding != "identity":
+            response.headers['Content-Encoding'] = encoding
+    set_entity_tag(response, asset.etag)
+    response.headers['Cache-Control'] = asset.cache_control
+    response.vary.add('Accept-Encoding')
+    return response
 
 # Routes
 @app.route('/')
 def index():
-    return send_file('index.html')
+    return serve_static('')
 
 @app.route('/data.json')
 def get_data_json():
-    return jsonify(fuel_data)
+    snapshot = refresher.current()
+    return snapshot_response(snapshot, lambda: cached_json(
+        'data.json', snapshot.version, snapshot.table.to_records))
 
 @app.route('/api/ping')
 def ping():
     return jsonify({"message": "Fuel Dashboard Server is running!", "timestamp": datetime.now().isoformat()})
 
+@app.route('/api/ready')
+def readiness():
+    """Readiness: 200 once fresh data has loaded, 503 while serving startup data."""
+    status = refresher.status()
+    ready = status["refreshedAt"] is not None
+    return jsonify({
+        "success": True,
+        "ready": ready,
+        "version": status["version"],
+        "count": status["count"],
+        "refreshedAt": status["refreshedAt"],
+        "loading": status["runningJob"] is not None,
+        "lastError": status["lastError"]
+    }), 200 if ready else 503
+
 @app.route('/api/demo')
 def demo():
     return jsonify({"message": "Hello from the fuel dashboard API!", "timestamp": datetime.now().isoformat()})
 
 @app.route('/api/fuel/sites')
 def get_fuel_sites():
-    return jsonify({
+    snapshot = refresher.current()
+    if 'since' in request.args:
+        return sites_since(snapshot)
+    if any(name in request.args for name in SITE_QUERY_PARAMS):
+        try:
+            query = parse_site_query(snapshot)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        return snapshot_response(snapshot, lambda: jsonify(query_sites(snapshot, query)),
+                                 etag=query_etag(snapshot, daily='status' in request.args),
+                                 use_last_modified='status' not in request.args)
+    return snapshot_response(snapshot, lambda: full_sites_json(snapshot))
+
+def full_sites_json(snapshot):
+    """The complete /api/fuel/sites payload, rendered once per snapshot."""
+    return cached_json('sites', snapshot.version, lambda: {
         "success": True,
-        "data": fuel_data,
-        "lastUpdated": datetime.now().isoformat()
+        "data": snapshot.table.to_records(),
+        "version": snapshot.version,
+        "lastUpdated": snapshot.loaded_at.isoformat()
     })
 
+def sites_since(snapshot):
+    """Answer /api/fuel/sites?since=<version> with the delta, or the full list if evicted."""
+    since = request.args['since']
+    if not since.isdigit() or any(name in request.args for name in SITE_QUERY_PARAMS):
+        return jsonify({
+            "success": False,
+            "error": "'since' must be a version number and cannot be combined with filters"
+        }), 400
+    since = int(since)
+    changes = delta_log.changes_since(since, snapshot.version)
+    if changes is None:
+        return snapshot_response(snapshot, lambda: full_sites_json(snapshot))
+
+    def build():
+        return {
+            "success": True,
+            **delta_fields(snapshot, since, changes),
+            "version": snapshot.version,
+            "lastUpdated": snapshot.loaded_at.isoformat()
+        }
+    return snapshot_response(snapshot, lambda: cached_json(f'sites-since:{since}', snapshot.version, build),
+                             etag=query_etag(snapshot, ('since',)))
+
+def delta_fields(snapshot, since, changes):
+    """The delta part of a ?since= response: upserted site records and removed names."""
+    upserted, removed = changes
+    rows = snapshot.index.rows_for_sites(upserted)
+    return {
+        "delta": True,
+        "since": since,
+        "upserted": snapshot.table.take(rows).to_records(),
+        "removed": removed
+    }
+
+@app.route('/api/fuel/dashboard')
+def get_fuel_dashboard():
+    """Sites, stats and version from one snapshot in a single response.
+
+    With ?since=<version> the sites are sent as a delta when the log still
+    covers that version.
+    """
+    snapshot = refresher.current()
+    today = today_day_number()
+    since = request.args.get('since')
+    changes = None
+    if since is not None:
+        if not since.isdigit():
+            return jsonify({
+                "success": False,
+                "error": "'since' must be a version number"
+            }), 400
+        since = int(since)
+        changes = delta_log.changes_since(since, snapshot.version)
+
+    def build():
+        body = {
+            "success": True,
+            "version": snapshot.version,
+            "lastUpdated": snapshot.loaded_at.isoformat(),
+            "stats": calculate_stats(snapshot.table, snapshot.loaded_at)
+        }
+        if changes is None:
+            body["data"] = snapshot.table.to_records()
+        else:
+            body.update(delta_fields(snapshot, since, changes))
+        return body
+
+    key = 'dashboard' if changes is None else f'dashboard-since:{since}'
+    return snapshot_response(snapshot, lambda: cached_json(key, (snapshot.version, today), build),
+                             etag=query_etag(snapshot, ('since',) if changes is not None else (),
+                                             daily=True),
+                             use_last_modified=False)
+
+def parse_bbox(value):
+    """Parse a "west,south,east,north" query value."""
+    try:
+        west, south, east, north = (float(v) for v in value.split(','))
+    except ValueError:
+        raise ValueError("Invalid 'bbox', expected west,south,east,north")
+    if west > east or south > north:
+        raise ValueError("Invalid 'bbox', west/south must not exceed east/north")
+    return west, south, east, north
+
+def map_view(snapshot, bbox, zoom):
+    """Build the /api/fuel/map body: clusters at low zoom, sites otherwise."""
+    geo = snapshot.geo
+    body = {
+        "success": True,
+        "version": snapshot.version,
+        "zoom": zoom,
+        "clustered": zoom <= geo.max_zoom,
+        "lastUpdated": snapshot.loaded_at.isoformat()
+    }
+    if body["clustered"]:
+        clusters = geo.clusters(zoom, today_day_number(), *bbox)
+        singles = [c.pop("row") for c in clusters if "row" in c]
+        for cluster, site in zip((c for c in clusters if c["count"] == 1),
+                                 snapshot.table.take(singles).to_records()):
+            cluster["site"] = site
+        body["clusters"] = clusters
+    else:
+        body["data"] = snapshot.table.take(geo.within(*bbox)).to_records()
+    return body
+
+@app.route('/api/fuel/map')
+def get_fuel_map():
+    snapshot = refresher.current()
+    try:
+        bbox = parse_bbox(request.args.get('bbox', '-180,-90,180,90'))
+        zoom = int(request.args.get('zoom', 6))
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    return snapshot_response(snapshot, lambda: jsonify(map_view(snapshot, bbox, zoom)),
+                             etag=query_etag(snapshot, ('bbox', 'zoom'), daily=True),
+                             use_last_modified=False)
+
 @app.route('/api/fuel/stats')
 def get_fuel_stats():
-    stats = calculate_stats(fuel_data)
-    return jsonify({
+    snapshot = refresher.current()
+    return cached_json('stats', (snapshot.version, today_day_number()), lambda: {
         "success": True,
-        "stats": stats
+        "stats": calculate_stats(snapshot.table, snapshot.loaded_at)
     })
 
-@app.route('/api/fuel/refresh')
-def refresh_data():
-    global fuel_data
+@app.route('/api/fuel/forecast')
+def get_fuel_forecast():
+    """Sites due per day for the next ?days= days (default 14), in total and per city.
+
+    ?city= narrows the cities; the unfiltered body is rendered once per
+    snapshot, day and window length.
+    """
+    snapshot = refresher.current()
+    today = today_day_number()
+    cities = query_values('city') or None
     try:
-        fuel_data = load_data()
-        generate_reports(fuel_data)
+        days = int(request.args.get('days', DEFAULT_FORECAST_DAYS))
+    except ValueError:
+        days = 0
+    if not 1 <= days <= MAX_FORECAST_DAYS:
         return jsonify({
+            "success": False,
+            "error": f"'days' must be an integer between 1 and {MAX_FORECAST_DAYS}"
+        }), 400
+
+    def body():
+        return {
             "success": True,
-            "message": "Data refreshed successfully",
-            "count": len(fuel_data),
-            "lastUpdated": datetime.now().isoformat()
-        })
-    except Exception as e:
+            "version": snapshot.version,
+            "lastUpdated": snapshot.loaded_at.isoformat(),
+            **daily_forecast(snapshot.table).window(days, cities)
+        }
+    if cities is None:
+        build = lambda: cached_json(f'forecast:{days}', (snapshot.version, today), body)
+    else:
+        build = lambda: jsonify(body())
+    return snapshot_response(snapshot, build, etag=query_etag(snapshot, ('days', 'city'), daily=True),
+                             use_last_modified=False)
+
+# Rendered dispatch plans, keyed by depot set, statuses and k; one per query
+# is kept for the current snapshot and day, up to DISPATCH_CACHE_SIZE queries
+DISPATCH_CACHE_SIZE = 64
+dispatch_cache = ResponseCache(limit=DISPATCH_CACHE_SIZE)
+
+# Urgency buckets planned for when the request names none
+DISPATCH_STATUSES = ('overdue', 'today')
+
+def parse_dispatch_query():
+    """Validate the /api/fuel/dispatch parameters into (depots, statuses, k)."""
+    depots = parse_depots([v.strip() for raw in request.args.getlist('depot')
+                           for v in raw.split(';') if v.strip()])
+    statuses = tuple(dict.fromkeys(query_values('status'))) or DISPATCH_STATUSES
+    unknown = [s for s in statuses if s not in STATUS_OFFSETS]
+    if unknown:
+        raise ValueError(f"Unknown status {unknown[0]!r}, expected one of {', '.join(STATUS_OFFSETS)}")
+    try:
+        k = int(request.args.get('k', DEFAULT_NEAREST))
+    except ValueError:
+        k = 0
+    if not 1 <= k <= MAX_NEAREST:
+        raise ValueError(f"'k' must be an integer between 1 and {MAX_NEAREST}")
+    return depots, statuses, k
+
+@app.route('/api/fuel/dispatch')
+def get_fuel_dispatch():
+    """Plan fuel truck runs from ?depot=lat,lng (repeated or ;-separated).
+
+    Returns, per depot, the ?k= nearest urgent sites (default 10) and every
+    urgent site whose nearest depot it is; ?status= picks the urgency buckets
+    (default overdue,today).
+    """
+    snapshot = refresher.current()
+    try:
+        depots, statuses, k = parse_dispatch_query()
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 400
+    today = today_day_number()
+
+    def build():
+        plan = DispatchPlan(snapshot.table, snapshot.index.rows(ranges=status_ranges(statuses, today)),
+                            depots)
+        return {
+            "success": True,
+            "version": snapshot.version,
+            "statuses": list(statuses),
+            "k": k,
+            **plan.body(snapshot.table, k),
+            "lastUpdated": snapshot.loaded_at.isoformat()
+        }
+    # The content hash keeps a swapped-in table with the same version from
+    # being answered with another table's plan
+    key = f'dispatch:{depots}:{",".join(statuses)}:{k}'
+    token = (snapshot.version, snapshot.content_hash, today)
+    return snapshot_response(snapshot, lambda: cached_json(key, token, build, dispatch_cache),
+                             etag=query_etag(snapshot, ('depot', 'status', 'k'), daily=True),
+                             use_last_modified=False)
+
+def history_unavailable():
+    return jsonify({
+        "success": False,
+        "error": "Snapshot history is disabled (HISTORY_PATH is empty)"
+    }), 404
+
+@app.route('/api/fuel/history/sites/<path:site>')
+def get_site_history(site):
+    """Every recorded change of one site's plan, city or location, oldest first."""
+    if history is None:
+        return history_unavailable()
+    timeline = history.site_timeline(site)
+    if not timeline:
+        return jsonify({
+            "success": False,
+            "error": f"No history for site {site!r}"
+        }), 404
+    return jsonify({
+        "success": True,
+        "site": site,
+        "timeline": timeline
+    })
+
+@app.route('/api/fuel/history/overdue')
+def get_overdue_history():
+    """Overdue and due-today site counts per day between ?from= and ?to=
+    (YYYY-MM-DD, default the last 30 days)."""
+    if history is None:
+        return history_unavailable()
+    today = today_day_number()
+    try:
+        day_to = parse_day(request.args['to'], 'to') if request.args.get('to') else today
+        day_from = parse_day(request.args['from'], 'from') if request.args.get('from') else day_to - 29
+        if day_from > day_to:
+            raise ValueError("'from' must not be after 'to'")
+        if day_to - day_from >= MAX_TREND_DAYS:
+            raise ValueError(f"At most {MAX_TREND_DAYS} days can be requested at once")
+    except ValueError as e:
         return jsonify({
             "success": False,
             "error": str(e)
-        }), 500
+        }), 400
+    return jsonify({
+        "success": True,
+        "days": history.overdue_trend(day_from, day_to)
+    })
+
+# Event streams served through Flask at once; each holds a worker thread
+EVENTS_MAX_STREAMS = int(read_setting('EVENTS_MAX_STREAMS', 16))
+
+_open_streams = 0
+_streams_lock = threading.Lock()
+
+def release_stream():
+    """Free an EVENTS_MAX_STREAMS slot once a stream's response is closed."""
+    global _open_streams
+    with _streams_lock:
+        _open_streams -= 1
+
+@app.route('/api/fuel/events')
+def fuel_events():
+    """Snapshot events over SSE.
+
+    Each stream holds one server thread, so at most EVENTS_MAX_STREAMS are
+    served here (503 beyond that). serve.py workers hand streams to an
+    asyncio loop before they reach Flask, and EVENTS_PORT serves any number
+    from a single asyncio thread.
+    """
+    global _open_streams
+    with _streams_lock:
+        if _open_streams >= EVENTS_MAX_STREAMS:
+            REGISTRY.counter("fuel_event_streams_refused_total",
+                             "SSE streams refused at EVENTS_MAX_STREAMS")
+            response = jsonify({
+                "success": False,
+                "error": "Too many event streams, poll /api/fuel/dashboard instead"
+            })
+            response.status_code = 503
+            response.headers['Retry-After'] = '300'
+            return response
+        _open_streams += 1
+    last_id = parse_last_event_id(request.headers.get('Last-Event-ID'))
+    response = app.response_class(event_hub.stream(last_id), mimetype='text/event-stream',
+                                  headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.call_on_close(release_stream)
+    return response
+
+@app.route('/api/metrics')
+def get_metrics():
+    """Prometheus text-format metrics for this process."""
+    return app.response_class(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    return jsonify({
+        "success": True,
+        "cache": response_cache.stats(),
+        "dispatch": dispatch_cache.stats()
+    })
+
+@app.route('/api/fuel/refresh')
+def refresh_data():
+    job_id = refresher.trigger()
+    return jsonify({
+        "success": True,
+        "message": "Refresh started",
+        "jobId": job_id,
+        "version": refresher.current().version
+    }), 202
+
+@app.route('/api/fuel/refresh/status')
+def refresh_status():
+    return jsonify({
+        "success": True,
+        **refresher.status()
+    })
 
 @app.route('/<path:filename>')
 def serve_static(filename):
-    return send_from_directory('.', filename)
+    """Serve an allowlisted front-end file; anything else in the directory is a 404."""
+    asset = static_assets.get('/' + filename)
+    if asset is None:
+        return jsonify({
+            "success": False,
+            "error": "Not found"
+        }), 404
+    return asset_response(asset)
+
+def api_routes():
+    """The API route patterns, for the startup log."""
+    return sorted(rule.rule for rule in app.url_map.iter_rules() if rule.rule.startswith('/api/'))
 
 if __name__ == "__main__":
-    print("\n🚀 Starting COW Fuel Dashboard Server (Direct Mode)...")
-    print("Loading Central Fuel Plan database...")
+    configure_logging()
 
-    # Generate initial reports
-    generate_reports(fuel_data)
+    # Load fresh data (and regenerate the reports) in the background
+    start_background_services()
 
     # Get port from environment variable with better error handling
     try:
         port = int(os.environ.get('PORT', 8080))
     except ValueError:
-        print("⚠️ Invalid PORT environment variable, using default 8080")
+        log.warning("invalid_setting", name="PORT", default=8080)
         port = 8080
 
-    print(f"✅ Loaded {len(fuel_data)} fuel sites")
-    print(f"🌐 Starting web server on port {port}...")
-    print("📊 Dashboard endpoints:")
-    print("   - GET /              - Main dashboard")
-    print("   - GET /api/ping      - Health check")
-    print("   - GET /api/fuel/sites - Get fuel sites")
-    print("   - GET /api/fuel/stats - Get statistics")
-    print("   - GET /api/fuel/refresh - Refresh data")
-    print()
+    log.info("server_starting", mode="direct", port=port, sites=len(refresher.current().table),
+             routes=api_routes())
 
     try:
         app.run(host='0.0.0.0', port=port, debug=False)
     except OSError as e:
         if "Address already in use" in str(e):
-            print(f"❌ Error: Port {port} is already in use!")
-            print("Try setting a different PORT environment variable.")
+            log.error("port_in_use", port=port, hint="set a different PORT environment variable")
         else:
-            print(f"❌ Server error: {e}")
+            log.error("server_error", error=str(e))
     except KeyboardInterrupt:
-        print("\n👋 Server stopped")
+        log.info("server_stopped")
     except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+        log.error("server_error", error=str(e), exc_info=True)
@@ -0,0 +1,152 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format.
+
+Counters, gauges and histograms are keyed by name plus a label set. Values
+computed elsewhere (cache hit counts, snapshot size) are exported through
+collector callbacks that run at scrape time.
+
+    REGISTRY.counter("fuel_sheet_fetch_total", "Sheet fetches", source="cache")
+    with stage_timer("parse"):
+        ...
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets (seconds) for request and stage histograms
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                   10, 30)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+               for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def samples(self, name, labels):
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            running += count
+            yield f"{name}_bucket", {**labels, "le": format_value(float(bound))}, running
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, running
+
+
+class Registry:
+    """Thread-safe store of metric families."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> (type, description, {label tuple: value or Histogram})
+        self._families = {}
+        self._collectors = []
+
+    def _family(self, name, kind, description):
+        family = self._families.get(name)
+        if family is None:
+            family = self._families[name] = (kind, description, {})
+        return family[2]
+
+    def counter(self, name, description, amount=1, **labels):
+        """Add ``amount`` to a counter."""
+        with self._lock:
+            values = self._family(name, "counter", description)
+            key = tuple(labels.items())
+            values[key] = values.get(key, 0) + amount
+
+    def gauge(self, name, description, value, **labels):
+        """Set a gauge."""
+        with self._lock:
+            self._family(name, "gauge", description)[tuple(labels.items())] = value
+
+    def observe(self, name, description, value, buckets=DEFAULT_BUCKETS, **labels):
+        """Record ``value`` in a histogram."""
+        with self._lock:
+            values = self._family(name, "histogram", description)
+            key = tuple(labels.items())
+            histogram = values.get(key)
+            if histogram is None:
+                histogram = values[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, description, **labels):
+        """Observe the duration of the ``with`` block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, description, time.perf_counter() - start, **labels)
+
+    def value(self, name, **labels):
+        """Current value of a counter or gauge (None if never set)."""
+        with self._lock:
+            family = self._families.get(name)
+            return family and family[2].get(tuple(labels.items()))
+
+    def add_collector(self, collect):
+        """Register ``collect()``; at render time it yields
+        (name, type, description, labels, value) tuples."""
+        self._collectors.append(collect)
+
+    def render(self):
+        """Return every metric in the Prometheus text format."""
+        families = {}
+        with self._lock:
+            for name, (kind, description, values) in self._families.items():
+                samples = []
+                for key, value in values.items():
+                    labels = dict(key)
+                    if isinstance(value, Histogram):
+                        samples.extend(value.samples(name, labels))
+                    else:
+                        samples.append((name, labels, value))
+                families[name] = (kind, description, samples)
+        for collect in self._collectors:
+            for name, kind, description, labels, value in collect():
+                families.setdefault(name, (kind, description, []))[2].append((name, labels, value))
+
+        lines = []
+        for name, (kind, description, samples) in sorted(families.items()):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{sample}{format_labels(labels)} {format_value(value)}"
+                         for sample, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by the app
+REGISTRY = Registry()
+
+
+def stage_timer(stage):
+    """Time one pipeline stage: refresh (fetch, parse, dates, clean, persist, history,
+    index, reports) or response (render, compress)."""
+    return REGISTRY.timer("fuel_stage_duration_seconds", "Time spent in each pipeline stage",
+                          stage=stage)
@@ -0,0 +1,173 @@
+"""
+Background refresh of the fuel site data.
+
+The dashboard reads from an immutable Snapshot that is swapped in atomically
+whenever a refresh finishes, so request handlers never wait on Google Sheets.
+"""
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from functools import cached_property
+
+from geo_index import GeoIndex
+from logs import get_logger
+from site_index import SiteIndex
+from site_table import SiteTable
+
+log = get_logger("fuel.refresher")
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """One loaded version of the fuel site list."""
+    version: int
+    table: SiteTable
+    loaded_at: datetime
+    content_hash: str
+
+    @cached_property
+    def index(self):
+        """Lookup indexes over the table, built on first use."""
+        return SiteIndex(self.table)
+
+    @cached_property
+    def geo(self):
+        """Spatial index and cluster pyramid over the table, built on first use."""
+        return GeoIndex(self.table)
+
+
+class Refresher:
+    """Loads new snapshots in the background, one fetch at a time.
+
+    ``load`` is called on a worker thread and must return a SiteTable, a
+    list of site dicts or a ready-made Snapshot, or raise. Concurrent
+    ``trigger`` calls while a load is running are coalesced into that load.
+    If a load fails the previous snapshot is kept and the error is recorded.
+    ``on_install(snapshot, previous)`` runs after every successful load;
+    ``snapshot is previous`` when the content was unchanged.
+    """
+
+    def __init__(self, load, initial, interval=0, on_install=None):
+        self._load = load
+        self._interval = interval
+        self._on_install = on_install
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if not isinstance(initial, Snapshot):
+            initial = SiteTable.coerce(initial)
+            initial = Snapshot(1, initial, datetime.now(), initial.digest())
+        self._snapshot = initial
+        self._next_job = 1
+        self._running_job = None
+        self._done = threading.Event()
+        self._done.set()
+        self._last_job = None
+        self._last_error = None
+        self._refreshed_at = None
+        self._scheduler = None
+
+    def current(self):
+        """Return the installed snapshot (never blocks)."""
+        return self._snapshot
+
+    @property
+    def refreshed_at(self):
+        """Time of the last successful load, or None while serving the initial data."""
+        return self._refreshed_at
+
+    def install(self, data, refreshed_at=None):
+        """Swap in a new snapshot built from ``data`` and return it.
+
+        Unchanged content keeps the current snapshot, so its version, load
+        time and hash (and any HTTP caches keyed on them) stay valid. A
+        Snapshot built elsewhere (e.g. read from the shared snapshot file)
+        is adopted with its own version. ``refreshed_at`` records when the
+        data was confirmed fresh (see ``refreshed_at``).
+        """
+        if isinstance(data, Snapshot):
+            table, digest = data.table, data.content_hash
+        else:
+            table = SiteTable.coerce(data)
+            digest = table.digest()
+        with self._lock:
+            previous = snapshot = self._snapshot
+            if snapshot.content_hash != digest:
+                if isinstance(data, Snapshot):
+                    snapshot = data
+                else:
+                    snapshot = Snapshot(snapshot.version + 1, table, datetime.now(), digest)
+                self._snapshot = snapshot
+            if refreshed_at is not None:
+                self._refreshed_at = refreshed_at
+        if self._on_install:
+            try:
+                self._on_install(snapshot, previous)
+            except Exception as e:
+                log.error("install_hook_failed", version=snapshot.version, error=str(e),
+                          exc_info=True)
+        return snapshot
+
+    def trigger(self):
+        """Start a background load, or join the one in flight. Returns its job id."""
+        with self._lock:
+            if self._running_job is not None:
+                return self._running_job
+            job_id = self._next_job
+            self._next_job += 1
+            self._running_job = job_id
+            self._done.clear()
+        threading.Thread(target=self._run, args=(job_id,), name=f"refresh-{job_id}",
+                         daemon=True).start()
+        return job_id
+
+    def wait(self, timeout=None):
+        """Block until no load is in flight. Returns False on timeout."""
+        return self._done.wait(timeout)
+
+    def status(self):
+        """Return a JSON-friendly view of the refresher state."""
+        with self._lock:
+            snapshot = self._snapshot
+            return {
+                "version": snapshot.version,
+                "count": len(snapshot.table),
+                "loadedAt": snapshot.loaded_at.isoformat(),
+                "contentHash": snapshot.content_hash,
+                "runningJob": self._running_job,
+                "lastJob": self._last_job,
+                "lastError": self._last_error,
+                "refreshedAt": self._refreshed_at and self._refreshed_at.isoformat(),
+            }
+
+    def start(self):
+        """Run a refresh every ``interval`` seconds on a daemon thread."""
+        if self._interval <= 0 or self._scheduler is not None:
+            return
+        self._scheduler = threading.Thread(target=self._schedule, name="refresh-scheduler",
+                                           daemon=True)
+        self._scheduler.start()
+
+    def stop(self):
+        """Stop the periodic scheduler (an in-flight load still finishes)."""
+        self._stop.set()
+
+    def _schedule(self):
+        while not self._stop.wait(self._interval):
+            self.trigger()
+            self.wait()
+
+    def _run(self, job_id):
+        error = None
+        try:
+            snapshot = self.install(self._load(), refreshed_at=datetime.now())
+            log.info("refresh_installed", job=job_id, version=snapshot.version,
+                     sites=len(snapshot.table))
+        except Exception as e:
+            error = str(e)
+            log.warning("refresh_failed", job=job_id, error=error, action="keeping current snapshot")
+        finally:
+            with self._lock:
+                self._running_job = None
+                self._last_job = job_id
+                self._last_error = error
+                self._done.set()
@@ -0,0 +1,153 @@
+"""
+Report files generated from each snapshot.
+
+Sites are classified into all urgency buckets in one pass; every report is
+then a slice of that classification. Files are replaced atomically, and a
+report whose rows have not changed since it was last written is left alone.
+"""
+import csv
+import io
+import json
+import os
+
+import numpy as np
+
+from geo_index import urgency_buckets
+from logs import get_logger
+from sheet_fetch import digest_bytes, write_atomic
+
+log = get_logger("fuel.reports")
+
+# Report name -> urgency bucket it lists (see geo_index.URGENCY_NAMES)
+REPORTS = {
+    "fuel_today": 1,
+    "fuel_pending": 0,
+}
+
+# Formats a report can be written in; parquet and arrow need pyarrow
+FORMATS = ("csv", "parquet", "arrow")
+
+COLUMNS = ("SiteName", "CityName", "NextFuelingPlan", "lat", "lng", "RegionName")
+
+
+def split_buckets(table, today):
+    """Return the row positions of every urgency bucket, in table order."""
+    buckets = urgency_buckets(table.day, today)
+    order = np.argsort(buckets, kind="stable")
+    bounds = np.cumsum(np.bincount(buckets, minlength=5))
+    return np.split(order, bounds[:-1])
+
+
+def render_csv(records):
+    """Render site records as CSV bytes."""
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(records)
+    return out.getvalue().encode("utf-8")
+
+
+def render_json(records):
+    """Render site records as the pretty-printed data.json list."""
+    return (json.dumps(records, indent=2, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def arrow_table(table):
+    import pyarrow as pa
+    return pa.table({
+        "SiteName": pa.array(table.sites.tolist(), pa.string()),
+        "CityName": pa.array(table.cities.tolist(), pa.string()),
+        "NextFuelingPlan": pa.array(table.day.astype("datetime64[D]"), pa.date32()),
+        "lat": pa.array(table.lat),
+        "lng": pa.array(table.lng),
+        "RegionName": pa.array(table.regions.tolist(), pa.string()),
+    })
+
+
+def render_report(table, fmt):
+    """Render ``table`` as CSV, Parquet or Arrow IPC (Feather v2) bytes."""
+    if fmt == "csv":
+        return render_csv(table.to_records())
+    import pyarrow as pa
+    data = arrow_table(table)
+    sink = pa.BufferOutputStream()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(data, sink)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(data, sink)
+    return sink.getvalue().to_pybytes()
+
+
+def columnar_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ReportWriter:
+    """Writes the report files for a snapshot into ``directory``.
+
+    ``formats`` picks the files per report (CSV always works; Parquet and
+    Arrow are skipped with a warning when pyarrow is missing). ``data.json``
+    always holds every site.
+    """
+
+    def __init__(self, directory, formats=("csv",)):
+        self.directory = directory
+        unknown = [f for f in formats if f not in FORMATS]
+        if unknown:
+            raise ValueError(f"Unknown report format {unknown[0]!r}, expected one of {', '.join(FORMATS)}")
+        self.formats = tuple(formats)
+        if any(f != "csv" for f in self.formats) and not columnar_available():
+            log.warning("pyarrow_missing", requested=list(self.formats), writing=["csv"])
+            self.formats = ("csv",)
+        # path -> digest of the rows last written there
+        self._written = {}
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write(self, table, today):
+        """Write every report for ``table``; return {report: (row count, files written)}."""
+        rows_by_bucket = split_buckets(table, today)
+        results = {}
+        for name, bucket in REPORTS.items():
+            part = table.take(rows_by_bucket[bucket])
+            digest = part.digest()
+            written = [
+                f"{name}.{fmt}" for fmt in self.formats
+                if self._write_if_changed(f"{name}.{fmt}", digest, lambda: render_report(part, fmt))
+            ]
+            results[name] = (len(part), written)
+        changed = self._write_if_changed("data.json", table.digest(),
+                                         lambda: render_json(table.to_records()))
+        results["data"] = (len(table), ["data.json"] if changed else [])
+        return results
+
+    def _write_if_changed(self, filename, digest, render):
+        """Write ``render()`` to ``filename`` unless its rows (``digest``) are unchanged.
+
+        After a restart the first render is compared with the file on disk.
+        """
+        path = self.path(filename)
+        if self._written.get(path) == digest and os.path.exists(path):
+            return False
+        content = render()
+        if path not in self._written and self._on_disk(path) == digest_bytes(content):
+            self._written[path] = digest
+            return False
+        write_atomic(path, content)
+        self._written[path] = digest
+        return True
+
+    @staticmethod
+    def _on_disk(path):
+        try:
+            with open(path, "rb") as f:
+                return digest_bytes(f.read())
+        except OSError:
+            return None
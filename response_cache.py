@@ -0,0 +1,117 @@
+"""
+Pre-rendered, pre-compressed JSON payloads for the dashboard endpoints.
+
+Each payload is rendered once per data snapshot (or per whatever token the
+caller passes) and then served as cached bytes in the encoding the client
+accepts.
+"""
+import gzip
+import threading
+
+from metrics import stage_timer
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Payloads smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+
+
+class Payload:
+    """One rendered body with its compressed variants."""
+
+    def __init__(self, body):
+        self.body = body
+        self.variants = {"identity": body}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            with stage_timer("compress"):
+                self.variants["gzip"] = gzip.compress(body, compresslevel=6, mtime=0)
+                if brotli is not None:
+                    self.variants["br"] = brotli.compress(body)
+
+    @property
+    def encodings(self):
+        """Available encodings, best first."""
+        return [e for e in ("br", "gzip", "identity") if e in self.variants]
+
+    def variant(self, encoding):
+        """Return the bytes for ``encoding``, falling back to the identity body."""
+        return self.variants.get(encoding, self.body)
+
+
+class ResponseCache:
+    """Keyed payload cache that re-renders only when a key's token changes.
+
+    Rendering and compression run outside the lock, so hits on other keys
+    never wait for a miss. Concurrent misses on one key and token share a
+    single render: the first caller renders and the others wait for it.
+    With ``limit``, the oldest-rendered entries are dropped once more than
+    ``limit`` keys are cached (for caches keyed by open-ended queries).
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._entries = {}
+        # key -> (token, Event) of the render in progress
+        self._rendering = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, token, render):
+        """Return the cached Payload for ``key``, rendering it if ``token`` changed.
+
+        ``render`` returns the body bytes and is only called on a miss.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == token:
+                    self.hits += 1
+                    return entry[1]
+                pending = self._rendering.get(key)
+                if pending is None or pending[0] != token:
+                    self.misses += 1
+                    done = threading.Event()
+                    self._rendering[key] = (token, done)
+                    break
+            # Another thread is rendering this token; use its result (or, if
+            # it failed, try again)
+            pending[1].wait()
+
+        payload = None
+        try:
+            payload = Payload(render())
+            return payload
+        finally:
+            with self._lock:
+                # A render started later for a newer token supersedes this one
+                if self._rendering.get(key, (None, None))[1] is done:
+                    del self._rendering[key]
+                    if payload is not None:
+                        self._entries.pop(key, None)
+                        self._entries[key] = (token, payload)
+                        if self.limit is not None:
+                            while len(self._entries) > self.limit:
+                                del self._entries[next(iter(self._entries))]
+            done.set()
+
+    def invalidate(self, prefix):
+        """Drop every entry whose key starts with ``prefix``."""
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+
+    def stats(self):
+        """Return hit/miss counters and the cached keys."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRatio": self.hits / total if total else 0.0,
+                "entries": sorted(self._entries),
+                "brotli": brotli is not None,
+            }
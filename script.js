@@ -2,6 +2,7 @@
 let map;
 let fuelData = [];
 let lastUpdated = null;
+let dataVersion = null;
 
 // Initialize the dashboard
 document.addEventListener("DOMContentLoaded", function () {
@@ -14,36 +15,93 @@ document.addEventListener("DOMContentLoaded", function () {
   // Load initial data
   loadDashboardData();
 
-  // Auto-refresh every 5 minutes
-  setInterval(loadDashboardData, 5 * 60 * 1000);
+  // Follow snapshot changes pushed by the server; fall back to polling
+  // every 5 minutes where EventSource is unavailable
+  if (window.EventSource) {
+    subscribeToUpdates();
+  } else {
+    setInterval(loadDashboardData, 5 * 60 * 1000);
+  }
 });
 
+// Apply snapshot deltas pushed over Server-Sent Events
+function subscribeToUpdates() {
+  const events = new EventSource(window.FUEL_EVENTS_URL || "/api/fuel/events");
+
+  events.addEventListener("snapshot", (message) => {
+    const update = JSON.parse(message.data);
+    console.log(`📡 Snapshot v${update.version} received`);
+
+    // Already loaded (the fetch raced ahead of the stream)
+    if (dataVersion !== null && update.version <= dataVersion) {
+      return;
+    }
+    // The delta is relative to a version we don't hold (an event was missed
+    // between the initial fetch and the connect); catch up with ?since=
+    if (update.previousVersion !== dataVersion) {
+      loadDashboardData();
+      return;
+    }
+
+    applyDelta(update.upserted, update.removed);
+    dataVersion = update.version;
+    lastUpdated = update.lastUpdated;
+
+    updateKPICards(update.stats);
+    updateMap();
+  });
+
+  // The server no longer has the events we missed; reload everything
+  events.addEventListener("reset", loadDashboardData);
+
+  events.onopen = () => updateStatus("online");
+  events.onerror = () => {
+    updateStatus("offline");
+    // A refused stream (e.g. 503 when the server is at its stream limit) is
+    // not retried by EventSource; poll instead
+    if (events.readyState === EventSource.CLOSED) {
+      setInterval(loadDashboardData, 5 * 60 * 1000);
+    }
+  };
+}
+
+// Replace upserted sites and drop removed ones, keyed on SiteName
+function applyDelta(upsertedSites, removedNames) {
+  const removed = new Set(removedNames);
+  const upserted = new Set(upsertedSites.map((s) => s.SiteName));
+  fuelData = fuelData
+    .filter((s) => !removed.has(s.SiteName) && !upserted.has(s.SiteName))
+    .concat(upsertedSites);
+}
+
 // Load dashboard data from API
 async function loadDashboardData() {
   try {
     console.log("📊 Loading dashboard data...");
     updateStatus("loading");
 
-    // Fetch both sites and stats
-    const [sitesResponse, statsResponse] = await Promise.all([
-      fetch("/api/fuel/sites"),
-      fetch("/api/fuel/stats"),
-    ]);
+    // Sites and stats come from one snapshot; once we hold a version,
+    // only ask for what changed since
+    const url = dataVersion
+      ? `/api/fuel/dashboard?since=${dataVersion}`
+      : "/api/fuel/dashboard";
+    const response = await fetch(url);
 
-    if (!sitesResponse.ok || !statsResponse.ok) {
+    if (!response.ok) {
       throw new Error("Failed to fetch fuel data");
     }
 
-    const sitesData = await sitesResponse.json();
-    const statsData = await statsResponse.json();
-
-    if (sitesData.success) {
-      fuelData = sitesData.data;
-      lastUpdated = sitesData.lastUpdated;
-    }
-
-    if (statsData.success) {
-      updateKPICards(statsData.stats);
+    const dashboard = await response.json();
+
+    if (dashboard.success) {
+      if (dashboard.delta) {
+        applyDelta(dashboard.upserted, dashboard.removed);
+      } else {
+        fuelData = dashboard.data;
+      }
+      dataVersion = dashboard.version;
+      lastUpdated = dashboard.lastUpdated;
+      updateKPICards(dashboard.stats);
     }
 
     // Initialize map if not already done
@@ -105,16 +163,42 @@ function initializeMap() {
     attribution: "© OpenStreetMap contributors",
   }).addTo(map);
 
+  // Reload markers for the visible area whenever the view changes
+  map.on("moveend", updateMap);
+
   // Add markers
   updateMap();
 }
 
-// Update map markers
-function updateMap() {
-  if (!map || !fuelData.length) return;
+// Update map markers from the server-side spatial index: clusters with
+// urgency counts at low zoom, individual sites in the viewport otherwise
+async function updateMap() {
+  if (!map) return;
 
   console.log("📍 Updating map markers...");
 
+  const bounds = map.getBounds();
+  const bbox = [
+    bounds.getWest(),
+    bounds.getSouth(),
+    bounds.getEast(),
+    bounds.getNorth(),
+  ]
+    .map((v) => v.toFixed(4))
+    .join(",");
+
+  let view;
+  try {
+    const response = await fetch(
+      `/api/fuel/map?bbox=${bbox}&zoom=${map.getZoom()}`,
+    );
+    view = await response.json();
+  } catch (error) {
+    console.error("❌ Error loading map view:", error);
+    return;
+  }
+  if (!view.success) return;
+
   // Clear existing markers (if any)
   map.eachLayer((layer) => {
     if (layer instanceof L.CircleMarker) {
@@ -122,52 +206,98 @@ function updateMap() {
     }
   });
 
+  if (view.clustered) {
+    view.clusters.forEach((cluster) => {
+      if (cluster.site) {
+        addSiteMarker(cluster.site);
+      } else {
+        addClusterMarker(cluster);
+      }
+    });
+  } else {
+    view.data.forEach(addSiteMarker);
+  }
+}
+
+// Color and label for a site's urgency
+function siteStatus(site) {
   const today = startOfDay(new Date());
   const tomorrow = addDays(today, 1);
   const afterTomorrow = addDays(today, 2);
+  const siteDate = new Date(site.NextFuelingPlan);
+
+  if (siteDate < today) {
+    return { color: "#dc3545", status: "Overdue" }; // red
+  } else if (isSameDay(siteDate, today)) {
+    return { color: "#dc3545", status: "Due Today" }; // red
+  } else if (isSameDay(siteDate, tomorrow)) {
+    return { color: "#fd7e14", status: "Due Tomorrow" }; // orange
+  } else if (isSameDay(siteDate, afterTomorrow)) {
+    return { color: "#ffc107", status: "Due in 2 days" }; // yellow
+  }
+  return { color: "#198754", status: "Scheduled" }; // green
+}
 
-  fuelData.forEach((site) => {
-    if (!isValidCoordinate(site.lat) || !isValidCoordinate(site.lng)) {
-      return;
-    }
+function addSiteMarker(site) {
+  if (!isValidCoordinate(site.lat) || !isValidCoordinate(site.lng)) {
+    return;
+  }
 
-    const siteDate = new Date(site.NextFuelingPlan);
-    let color = "#198754"; // green - scheduled
-    let status = "Scheduled";
-
-    if (siteDate < today) {
-      color = "#dc3545"; // red - overdue
-      status = "Overdue";
-    } else if (isSameDay(siteDate, today)) {
-      color = "#dc3545"; // red - today
-      status = "Due Today";
-    } else if (isSameDay(siteDate, tomorrow)) {
-      color = "#fd7e14"; // orange - tomorrow
-      status = "Due Tomorrow";
-    } else if (isSameDay(siteDate, afterTomorrow)) {
-      color = "#ffc107"; // yellow - after tomorrow
-      status = "Due in 2 days";
-    }
+  const { color, status } = siteStatus(site);
+  const marker = L.circleMarker([site.lat, site.lng], {
+    radius: 8,
+    fillColor: color,
+    color: color,
+    weight: 2,
+    fillOpacity: 0.8,
+  });
 
-    const marker = L.circleMarker([site.lat, site.lng], {
-      radius: 8,
-      fillColor: color,
-      color: color,
-      weight: 2,
-      fillOpacity: 0.8,
-    });
+  marker.bindPopup(`
+    <div style="font-family: inherit;">
+      <h4 style="margin: 0 0 8px 0; color: #2d3748;">${site.SiteName}</h4>
+      <p style="margin: 0 0 4px 0; color: #718096;"><strong>City:</strong> ${site.CityName}</p>
+      <p style="margin: 0 0 4px 0; color: #718096;"><strong>Next Fuel:</strong> ${site.NextFuelingPlan}</p>
+      <p style="margin: 0; color: ${color}; font-weight: 600;"><strong>Status:</strong> ${status}</p>
+    </div>
+  `);
+
+  marker.addTo(map);
+}
 
-    marker.bindPopup(`
-      <div style="font-family: inherit;">
-        <h4 style="margin: 0 0 8px 0; color: #2d3748;">${site.SiteName}</h4>
-        <p style="margin: 0 0 4px 0; color: #718096;"><strong>City:</strong> ${site.CityName}</p>
-        <p style="margin: 0 0 4px 0; color: #718096;"><strong>Next Fuel:</strong> ${site.NextFuelingPlan}</p>
-        <p style="margin: 0; color: ${color}; font-weight: 600;"><strong>Status:</strong> ${status}</p>
-      </div>
-    `);
+function addClusterMarker(cluster) {
+  // Color by the most urgent bucket present in the cluster
+  let color = "#198754";
+  if (cluster.overdue || cluster.today) {
+    color = "#dc3545";
+  } else if (cluster.tomorrow) {
+    color = "#fd7e14";
+  } else if (cluster.afterTomorrow) {
+    color = "#ffc107";
+  }
+
+  const marker = L.circleMarker([cluster.lat, cluster.lng], {
+    radius: 10 + Math.min(20, Math.log2(cluster.count) * 3),
+    fillColor: color,
+    color: color,
+    weight: 2,
+    fillOpacity: 0.6,
+  });
 
-    marker.addTo(map);
+  marker.bindPopup(`
+    <div style="font-family: inherit;">
+      <h4 style="margin: 0 0 8px 0; color: #2d3748;">${cluster.count} sites</h4>
+      <p style="margin: 0 0 4px 0; color: #dc3545;"><strong>Overdue:</strong> ${cluster.overdue}</p>
+      <p style="margin: 0 0 4px 0; color: #dc3545;"><strong>Due Today:</strong> ${cluster.today}</p>
+      <p style="margin: 0 0 4px 0; color: #fd7e14;"><strong>Tomorrow:</strong> ${cluster.tomorrow}</p>
+      <p style="margin: 0 0 4px 0; color: #ffc107;"><strong>In 2 days:</strong> ${cluster.afterTomorrow}</p>
+      <p style="margin: 0; color: #198754;"><strong>Later:</strong> ${cluster.later}</p>
+    </div>
+  `);
+  marker.on("dblclick", () => {
+    map.setView([cluster.lat, cluster.lng], map.getZoom() + 2);
   });
+
+  marker.addTo(map);
 }
 
 // Refresh data manually
@@ -177,7 +307,9 @@ async function refreshData() {
   refreshIcon.classList.add("spinning");
 
   try {
-    await fetch("/api/fuel/refresh", { method: "GET" });
+    const response = await fetch("/api/fuel/refresh", { method: "GET" });
+    const job = await response.json();
+    await waitForRefresh(job.jobId);
     await loadDashboardData();
     showSuccess("Data refreshed successfully!");
   } catch (error) {
@@ -188,6 +320,22 @@ async function refreshData() {
   }
 }
 
+// Poll the refresh status until the given job has finished
+async function waitForRefresh(jobId, timeoutMs = 30000) {
+  const deadline = Date.now() + timeoutMs;
+  while (Date.now() < deadline) {
+    const response = await fetch("/api/fuel/refresh/status");
+    const status = await response.json();
+    if (status.runningJob !== jobId) {
+      if (status.lastJob === jobId && status.lastError) {
+        throw new Error(status.lastError);
+      }
+      return;
+    }
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+  }
+}
+
 // Download reports
 async function downloadReport(type) {
   console.log(`📥 Downloading ${type} report...`);
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Production server for COW Fuel Dashboard: one loader, N pre-forked workers.
+
+The parent process is the only one that talks to Google Sheets. It loads
+the data, writes every snapshot to SNAPSHOT_PATH and runs the refresh
+scheduler. Workers are forked as soon as the startup snapshot (persisted
+or mock data) is on disk and serve the Flask app from a shared listening
+socket; each one memory-maps the snapshot file and adopts new versions as
+the loader replaces it, so no worker ever restarts to see fresh data. Event streams
+(/api/fuel/events) are handed from the request thread to one asyncio loop
+per worker, so idle dashboards hold no thread.
+
+    WEB_CONCURRENCY  number of workers (default: CPU count)
+    SNAPSHOT_POLL    seconds between worker checks of the snapshot file (default 1)
+"""
+import os
+import signal
+import socket
+import sys
+from urllib.parse import urlsplit
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from logs import configure_logging, get_logger
+
+# Configure logging before main is imported so its startup events are kept
+configure_logging()
+
+import main
+from delta_log import DeltaLog
+from event_hub import EVENTS_PATH, EventHub, StreamLoop, parse_last_event_id
+from refresher import Refresher
+from response_cache import ResponseCache
+from snapshot_store import (SnapshotFollower, file_key, read_snapshot, read_snapshot_keyed,
+                            wait_for_replace, write_snapshot)
+
+log = get_logger("fuel.serve")
+
+WORKERS = max(1, int(main.read_setting('WEB_CONCURRENCY', os.cpu_count() or 1)))
+SNAPSHOT_POLL = main.read_setting('SNAPSHOT_POLL', 1) or 1
+
+# How long a worker-triggered refresh waits for the loader to publish
+LOADER_WAIT = main.SHEET_TIMEOUT + 30
+
+
+def refresh_from_loader(loader_pid):
+    """Ask the loader for a refresh and return the snapshot it publishes."""
+    key = file_key(main.SNAPSHOT_PATH)
+    os.kill(loader_pid, signal.SIGUSR1)
+    if not wait_for_replace(main.SNAPSHOT_PATH, key, LOADER_WAIT):
+        raise RuntimeError(f"Loader published no snapshot within {LOADER_WAIT:.0f}s")
+    snapshot, _ = read_snapshot(main.SNAPSHOT_PATH)
+    return snapshot
+
+
+class WorkerRequestHandler(WSGIRequestHandler):
+    """Hands event-stream requests to the worker's StreamLoop; everything else goes to Flask."""
+
+    def run_wsgi(self):
+        if self.command == "GET" and urlsplit(self.path).path == EVENTS_PATH:
+            # The loop owns the connection from here; socketserver's own
+            # shutdown of the detached socket is a no-op
+            self.close_connection = True
+            self.server.event_streams.adopt(
+                socket.socket(fileno=self.connection.detach()),
+                parse_last_event_id(self.headers.get("Last-Event-ID")))
+            return
+        super().run_wsgi()
+
+
+def run_worker(sock, loader_pid):
+    """Serve requests from ``sock`` until terminated (runs in a forked child)."""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+
+    # Fresh per-process state: nothing held by the loader's threads at fork time
+    main.process_role = "worker"
+    main.response_cache = ResponseCache()
+    main.event_hub = EventHub()
+    main.delta_log = DeltaLog(main.DELTA_HISTORY)
+    # The follower starts from the key of the file actually read, so a
+    # replace landing in between is still picked up
+    snapshot, refreshed_at, key = read_snapshot_keyed(main.SNAPSHOT_PATH)
+    main.refresher = Refresher(lambda: refresh_from_loader(loader_pid), snapshot,
+                               on_install=main.on_snapshot_installed)
+    if refreshed_at is not None:
+        main.refresher.install(snapshot, refreshed_at=refreshed_at)
+    follower = SnapshotFollower(
+        main.SNAPSHOT_PATH,
+        lambda snapshot, refreshed_at: main.refresher.install(snapshot, refreshed_at=refreshed_at),
+        interval=SNAPSHOT_POLL, key=key)
+    follower.start()
+
+    server = make_server(*sock.getsockname()[:2], main.app, threaded=True,
+                         request_handler=WorkerRequestHandler, fd=sock.fileno())
+    server.event_streams = StreamLoop(main.event_hub)
+    server.serve_forever()
+
+
+def spawn_worker(sock):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(sock, os.getppid())
+        finally:
+            os._exit(1)
+    return pid
+
+
+def serve(host, port, workers=WORKERS):
+    """Run the loader in this process and keep ``workers`` children serving."""
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.set_inheritable(True)
+
+    main.process_role = "loader"
+    snapshot = main.refresher.current()
+    write_snapshot(main.SNAPSHOT_PATH, snapshot, main.refresher.refreshed_at)
+
+    # Workers may ask for a refresh (SIGUSR1) as soon as they run, so the
+    # handler is in place before the first fork; requests arriving before
+    # the background services start are covered by their first load
+    services_started = False
+    signal.signal(signal.SIGUSR1,
+                  lambda signum, frame: services_started and main.refresher.trigger())
+
+    # Fork before any background thread starts
+    children = {spawn_worker(sock) for _ in range(workers)}
+    log.info("server_starting", mode="prefork", host=host, port=port, workers=workers,
+             sites=len(snapshot.table), routes=main.api_routes())
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    # First load, refresh scheduler and event server
+    main.start_background_services()
+    services_started = True
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            log.warning("worker_exited", pid=pid, status=status, action="replacing")
+            children.add(spawn_worker(sock))
+    log.info("server_stopped")
+
+
+def port_from_env():
+    for port_var in ['PORT', 'HTTP_PORT', 'SERVER_PORT']:
+        try:
+            return int(os.environ[port_var])
+        except (KeyError, ValueError):
+            continue
+    return 8080
+
+
+if __name__ == "__main__":
+    if not hasattr(os, "fork"):
+        sys.exit("serve.py needs a platform with fork(); use start.py instead")
+    serve('0.0.0.0', port_from_env())
@@ -1,3 +1,5 @@
+import type { FuelSite, FuelStats } from "./fuel";
+
 export interface DemoResponse {
   message: string;
   timestamp: string;
@@ -16,3 +18,22 @@ export interface ApiSuccess<T = any> {
 }
 
 export type ApiResponse<T = any> = ApiSuccess<T> | ApiError;
+
+/**
+ * GET /api/fuel/dashboard[?since=<version>]
+ *
+ * Sites and stats taken from the same snapshot. With `since`, sites are
+ * sent as `upserted`/`removed` when a delta is available; otherwise the
+ * full list is returned in `data`.
+ */
+export interface FuelDashboardResponse {
+  success: true;
+  version: number;
+  lastUpdated: string;
+  stats: FuelStats;
+  data?: FuelSite[];
+  delta?: true;
+  since?: number;
+  upserted?: FuelSite[];
+  removed?: string[];
+}
@@ -16,10 +16,73 @@ export interface FuelStats {
   lastUpdated: string;
 }
 
+export type FuelStatusBucket =
+  | "overdue"
+  | "today"
+  | "tomorrow"
+  | "afterTomorrow"
+  | "later";
+
+export interface FuelSitesQuery {
+  city?: string | string[];
+  region?: string | string[];
+  status?: FuelStatusBucket | FuelStatusBucket[];
+  from?: string;
+  to?: string;
+  sort?: "date" | "-date" | "site" | "-site" | "city" | "-city";
+  limit?: number;
+  cursor?: string;
+}
+
 export interface FuelApiResponse {
   success: boolean;
   data?: FuelSite[];
   stats?: FuelStats;
   error?: string;
   lastUpdated?: string;
+  version?: number;
+  // Present on filtered /api/fuel/sites responses
+  count?: number;
+  total?: number;
+  nextCursor?: string | null;
+  // Present on /api/fuel/sites?since=<version> when a delta was available;
+  // otherwise the full list is returned in `data`
+  delta?: boolean;
+  since?: number;
+  upserted?: FuelSite[];
+  removed?: string[];
+}
+
+export interface FuelMapCluster {
+  lat: number;
+  lng: number;
+  count: number;
+  overdue: number;
+  today: number;
+  tomorrow: number;
+  afterTomorrow: number;
+  later: number;
+  // Set when the cluster holds a single site
+  site?: FuelSite;
+}
+
+export interface FuelMapResponse {
+  success: boolean;
+  version: number;
+  zoom: number;
+  clustered: boolean;
+  clusters?: FuelMapCluster[];
+  data?: FuelSite[];
+  lastUpdated: string;
+  error?: string;
+}
+
+// Payload of the "snapshot" event on /api/fuel/events
+export interface FuelSnapshotEvent {
+  version: number;
+  previousVersion: number;
+  upserted: FuelSite[];
+  removed: string[];
+  stats: FuelStats;
+  lastUpdated: string;
 }
@@ -0,0 +1,345 @@
+"""
+HTTP fetch layer for the published Google Sheet CSV.
+
+Keeps one keep-alive connection per host, sends conditional requests using
+the validators of the last download, hashes the raw bytes so unchanged
+sheets can skip parsing, and persists every good download to a local cache
+file that is used as a fallback when the sheet cannot be reached. Bodies
+are streamed into that file and parsed from it, so a download is never
+held in memory whole.
+
+``SheetSources`` fetches several published tabs (one per region) at once on
+a bounded thread pool, each with its own fetcher, connections and cache.
+"""
+import hashlib
+import http.client
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlsplit
+
+from logs import get_logger
+
+log = get_logger("fuel.sheet_fetch")
+
+MAX_REDIRECTS = 5
+
+# Bytes read from the network or a file at a time
+READ_SIZE = 1 << 16
+
+
+@dataclass(frozen=True)
+class FetchResult:
+    """The file holding the raw sheet bytes, plus where they came from."""
+    path: str
+    digest: str
+    source: str  # "network", "not-modified" or "cache"
+    size: int
+
+    def open(self):
+        """Open the sheet bytes for reading (binary)."""
+        return open(self.path, "rb")
+
+
+@dataclass(frozen=True)
+class SheetSource:
+    """One published sheet tab and the region its rows belong to (None = unlabelled)."""
+    region: str
+    url: str
+
+
+def parse_sources(value):
+    """Parse comma-separated ``Region=url`` entries; a bare URL has no region label."""
+    sources = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        region, sep, url = entry.partition("=")
+        if not sep or "://" in region:
+            region, url = None, entry
+        sources.append(SheetSource(region and region.strip(), url.strip()))
+    return sources
+
+
+def source_cache_paths(cache_path, sources):
+    """Cache file per source: ``cache_path`` itself for a single source,
+    otherwise ``<name>-<region or position>.<ext>`` next to it."""
+    if len(sources) == 1:
+        return [cache_path]
+    root, ext = os.path.splitext(cache_path)
+    return [
+        f"{root}-{re.sub(r'[^a-z0-9]+', '-', (source.region or str(i)).lower()).strip('-')}{ext}"
+        for i, source in enumerate(sources)
+    ]
+
+
+def digest_bytes(content):
+    """Return the hex SHA-256 of raw sheet bytes."""
+    return hashlib.sha256(content).hexdigest()
+
+
+def digest_file(path):
+    """Return (hex SHA-256, size) of a file, read in READ_SIZE blocks."""
+    h = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        while block := f.read(READ_SIZE):
+            h.update(block)
+            size += len(block)
+    return h.hexdigest(), size
+
+
+def write_atomic(path, content):
+    """Write ``content`` to ``path`` via a temp file and rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SheetFetcher:
+    """Fetches the sheet CSV with keep-alive and conditional requests."""
+
+    def __init__(self, url, cache_path, timeout=10.0):
+        self.url = url
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._validators = {}
+        # (digest, size) of the last good download in cache_path
+        self._cached = None
+
+    def fetch(self):
+        """Return the current sheet as a FetchResult.
+
+        Falls back to the last good download (the cache file) when the
+        network request fails; raises only when there is no fallback.
+        """
+        with self._lock:
+            try:
+                return self._fetch_network()
+            except (OSError, http.client.HTTPException) as e:
+                log.warning("sheet_fetch_failed", error=str(e), action="using cached copy")
+                return self._fetch_cache(e)
+
+    def cached(self):
+        """Return the last good download without touching the network, or None.
+
+        Does not take the fetch lock, so it can stand in for a fetch that is
+        still hanging.
+        """
+        cached = self._cached
+        if cached is None:
+            try:
+                cached = digest_file(self.cache_path)
+            except OSError:
+                return None
+        digest, size = cached
+        return FetchResult(self.cache_path, digest, "cache", size)
+
+    def close(self):
+        """Close all pooled connections."""
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+
+    def _fetch_network(self):
+        headers = {"Accept-Encoding": "gzip"}
+        if self._cached is not None:
+            headers.update(self._validators)
+        url = self.url
+        for _ in range(MAX_REDIRECTS + 1):
+            status, response_headers, download = self._request(url, headers)
+            if status in (301, 302, 303, 307, 308):
+                url = urljoin(url, response_headers.get("location", ""))
+                continue
+            if status == 304 and self._cached is not None:
+                return self._result("not-modified")
+            if status != 200:
+                raise http.client.HTTPException(f"HTTP {status} from {url}")
+            self._remember(download, response_headers)
+            return self._result("network")
+        raise http.client.HTTPException(f"Too many redirects fetching {self.url}")
+
+    def _fetch_cache(self, error):
+        if self._cached is None:
+            try:
+                self._cached = digest_file(self.cache_path)
+            except OSError:
+                raise error
+        return self._result("cache")
+
+    def _result(self, source):
+        digest, size = self._cached
+        return FetchResult(self.cache_path, digest, source, size)
+
+    def _remember(self, download, response_headers):
+        tmp_path, digest, size = download
+        if self._cached is not None and digest == self._cached[0]:
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, self.cache_path)
+        self._cached = (digest, size)
+        self._validators = {}
+        if response_headers.get("etag"):
+            self._validators["If-None-Match"] = response_headers["etag"]
+        if response_headers.get("last-modified"):
+            self._validators["If-Modified-Since"] = response_headers["last-modified"]
+
+    def _download(self, response):
+        """Stream a 200 body (gunzipped) into a temp file next to the cache.
+
+        Returns (temp path, digest, size); the caller renames or removes it.
+        """
+        directory = os.path.dirname(os.path.abspath(self.cache_path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-",
+                                        suffix=os.path.basename(self.cache_path))
+        gunzip = (zlib.decompressobj(16 + zlib.MAX_WBITS)
+                  if response.getheader("content-encoding") == "gzip" else None)
+        h = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while block := response.read(READ_SIZE):
+                    if gunzip is not None:
+                        block = gunzip.decompress(block)
+                    h.update(block)
+                    size += len(block)
+                    f.write(block)
+                if gunzip is not None:
+                    block = gunzip.flush()
+                    h.update(block)
+                    size += len(block)
+                    f.write(block)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path, h.hexdigest(), size
+
+    def _request(self, url, headers):
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        key = (parts.scheme, parts.netloc)
+        # A pooled connection may have been closed by the server; retry once
+        # on a fresh one
+        for attempt in range(2):
+            conn = self._connection(key)
+            try:
+                conn.request("GET", path, headers=headers)
+                response = conn.getresponse()
+                body = self._download(response) if response.status == 200 else response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                conn.close()
+                self._connections.pop(key, None)
+                if attempt:
+                    raise
+                continue
+            except BaseException:
+                conn.close()
+                self._connections.pop(key, None)
+                raise
+            response_headers = {k.lower(): v for k, v in response.getheaders()}
+            if response.will_close:
+                conn.close()
+                self._connections.pop(key, None)
+            return response.status, response_headers, body
+
+    def _connection(self, key):
+        conn = self._connections.get(key)
+        if conn is None:
+            scheme, netloc = key
+            cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            conn = cls(netloc, timeout=self.timeout)
+            self._connections[key] = conn
+        return conn
+
+
+class SheetSources:
+    """Fetches several sheet tabs concurrently.
+
+    At most ``workers`` downloads run at once. A source that has not
+    answered ``deadline`` seconds after its download started (or after
+    being queued for as many rounds as the pool needs) falls back to its
+    cached copy, like a source that cannot be reached.
+    """
+
+    def __init__(self, sources, cache_path, timeout=10.0, deadline=30.0, workers=4):
+        self.sources = list(sources)
+        self.fetchers = [
+            SheetFetcher(source.url, path, timeout=timeout)
+            for source, path in zip(self.sources, source_cache_paths(cache_path, self.sources))
+        ]
+        self.deadline = deadline
+        self.workers = max(1, min(workers, len(self.sources)))
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="sheet-fetch")
+
+    def fetch(self):
+        """Return a FetchResult per source, in source order.
+
+        Raises the first failure of a source that has no cached copy to fall
+        back to.
+        """
+        started = {}
+
+        def run(i):
+            started[i] = time.monotonic()
+            return self.fetchers[i].fetch()
+
+        submitted = time.monotonic()
+        # Queued downloads wait for a free worker, so they get one deadline per round
+        queue_limit = submitted + self.deadline * -(-len(self.fetchers) // self.workers)
+        futures = {self._pool.submit(run, i): i for i in range(len(self.fetchers))}
+        results = [None] * len(self.fetchers)
+        pending = set(futures)
+        while pending:
+            limits = [started[futures[f]] + self.deadline if futures[f] in started else queue_limit
+                      for f in pending]
+            done, pending = wait(pending, timeout=max(0.0, min(limits) - time.monotonic()),
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                i = futures[future]
+                results[i] = future.exception() or future.result()
+            now = time.monotonic()
+            for future in list(pending):
+                i = futures[future]
+                if now >= (started[i] + self.deadline if i in started else queue_limit):
+                    future.cancel()
+                    pending.discard(future)
+                    results[i] = self._expired(i)
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def _expired(self, i):
+        source = self.sources[i]
+        log.warning("sheet_fetch_timeout", region=source.region, url=source.url,
+                    deadline=self.deadline, action="using cached copy")
+        return self.fetchers[i].cached() or TimeoutError(
+            f"No response from {source.url} within {self.deadline}s and no cached copy")
+
+    def close(self):
+        """Close every source's pooled connections."""
+        for fetcher in self.fetchers:
+            fetcher.close()
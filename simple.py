@@ -1,96 +1,381 @@
 #!/usr/bin/env python3
+"""
+Lightweight, standard-library-only server for the dashboard API.
+
+For sites where pandas, numpy and Flask cannot be installed. It serves the
+read-only endpoints from the snapshot file the main app persists
+(SNAPSHOT_PATH, see snapshot_store.py), decoded here without numpy, and
+picks up every new version within SNAPSHOT_POLL seconds. Until a snapshot
+file exists it serves the built-in sample data.
+
+Payloads are encoded once per snapshot (and calendar day, for the stats),
+as compact JSON plus a gzip copy, and served from a thread per connection
+with HTTP/1.1 keep-alive. Unknown paths get a 404.
+
+    SNAPSHOT_PATH=/srv/fuel/snapshot.bin PORT=8080 python simple.py
+"""
+import gzip
+import hashlib
 import json
 import os
-from datetime import datetime
+import struct
+import sys
+import threading
+from array import array
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from logs import configure_logging, get_logger
+
+log = get_logger("fuel.simple")
 
-# Simple HTTP server without Flask for testing
-try:
-    from http.server import HTTPServer, BaseHTTPRequestHandler
-    from urllib.parse import urlparse, parse_qs
-except ImportError:
-    print("Python HTTP server modules not available")
-    exit(1)
+SNAPSHOT_PATH = os.environ.get(
+    'SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot.bin')
+)
 
-# Mock data
+# Sample data served until the main app has written a snapshot
 FUEL_DATA = [
     {"SiteName": "COW552", "CityName": "Riyadh", "NextFuelingPlan": "2025-01-19", "lat": 24.7136, "lng": 46.6753},
     {"SiteName": "COW910", "CityName": "Jeddah", "NextFuelingPlan": "2025-01-20", "lat": 21.4858, "lng": 39.1925},
     {"SiteName": "COW777", "CityName": "Buraydah", "NextFuelingPlan": "2025-01-21", "lat": 26.332, "lng": 43.9736}
 ]
 
+# Snapshot file layout (see snapshot_store.py)
+MAGIC = b"FUELSNP1"
+ALIGN = 8
+TYPECODES = {"<i4": "i", "<f8": "d"}
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Bodies smaller than this are not worth a gzip copy
+GZIP_MIN_BYTES = 1024
+
+ENDPOINTS = ["/api/ping", "/api/fuel/sites", "/api/fuel/stats", "/api/fuel/dashboard", "/data.json"]
+
+
+def read_setting(name, default):
+    """Read a non-negative number from the environment."""
+    try:
+        return max(0.0, float(os.environ.get(name, default)))
+    except ValueError:
+        log.warning("invalid_setting", name=name, default=default)
+        return float(default)
+
+
+def today_day_number():
+    return date.today().toordinal() - EPOCH_ORDINAL
+
+
+def encode_json(obj):
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+class SiteData:
+    """One snapshot: its metadata, the site records and their day numbers."""
+
+    def __init__(self, version, loaded_at, content_hash, records, days):
+        self.version = version
+        self.loaded_at = loaded_at
+        self.content_hash = content_hash
+        self.records = records
+        self.days = days
+
+    @classmethod
+    def sample(cls):
+        days = [date.fromisoformat(r["NextFuelingPlan"]).toordinal() - EPOCH_ORDINAL for r in FUEL_DATA]
+        return cls(0, datetime.now().isoformat(), hashlib.sha256(encode_json(FUEL_DATA)).hexdigest()[:32],
+                   FUEL_DATA, days)
+
+    @classmethod
+    def read(cls, path):
+        """Decode a snapshot file written by snapshot_store.write_snapshot."""
+        with open(path, "rb") as f:
+            content = f.read()
+        if content[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        (header_len,) = struct.unpack_from("<I", content, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(content[start:start + header_len])
+        base = start + header_len
+        base += -base % ALIGN
+
+        def column(name):
+            offset, dtype, count = header["columns"][name]
+            values = array(TYPECODES[dtype])
+            values.frombytes(content[base + offset:base + offset + count * values.itemsize])
+            if sys.byteorder == "big":
+                values.byteswap()
+            return values
+
+        cities = header["cityNames"]
+        days = column("day").tolist()
+        # Files written before regions were tracked have no region column
+        if "region_codes" in header["columns"]:
+            regions = [header["regionNames"][code] for code in column("region_codes")]
+        else:
+            regions = [None] * len(days)
+        dates = {}
+        records = []
+        for site, city, day, lat, lng, region in zip(header["sites"], column("city_codes"), days,
+                                                     column("lat"), column("lng"), regions):
+            text = dates.get(day)
+            if text is None:
+                text = dates[day] = date.fromordinal(EPOCH_ORDINAL + day).isoformat()
+            record = {"SiteName": site, "CityName": cities[city], "NextFuelingPlan": text,
+                      "lat": lat, "lng": lng}
+            if region is not None:
+                record["RegionName"] = region
+            records.append(record)
+        return cls(header["version"], header["loadedAt"], header["contentHash"], records, days)
+
+    def stats(self, today):
+        """Dashboard KPIs, as main.calculate_stats computes them."""
+        counts = [0] * 5
+        for day in self.days:
+            counts[min(max(day - today, -1), 3) + 1] += 1
+        return {
+            "totalSites": len(self.days),
+            "needFuelToday": counts[1],
+            "tomorrow": counts[2],
+            "afterTomorrow": counts[3],
+            "overdue": counts[0],
+            "lastUpdated": self.loaded_at
+        }
+
+
+class Payload:
+    """A pre-encoded response body, its gzip copy (if worth one) and its ETag."""
+
+    __slots__ = ("body", "gzipped", "etag")
+
+    def __init__(self, obj, etag):
+        self.body = encode_json(obj)
+        self.gzipped = gzip.compress(self.body, 6) if len(self.body) >= GZIP_MIN_BYTES else None
+        self.etag = etag
+
+
+class Payloads:
+    """Encoded endpoint bodies for one SiteData, built on first request."""
+
+    def __init__(self, data):
+        self.data = data
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def get(self, path, today):
+        """Payload for ``path`` (None for unknown paths)."""
+        build = self.BUILDERS.get(path)
+        if build is None:
+            return None
+        daily = path in self.DAILY
+        key = (path, today if daily else None)
+        payload = self._cache.get(key)
+        if payload is None:
+            with self._lock:
+                payload = self._cache.get(key)
+                if payload is None:
+                    etag = self.data.content_hash
+                    if daily:
+                        etag = hashlib.sha256(f"{path}&{etag}&{today}".encode()).hexdigest()[:32]
+                    payload = Payload(build(self, today), etag)
+                    # Drop the previous day's entries
+                    self._cache = {k: v for k, v in self._cache.items() if k[1] in (None, today)}
+                    self._cache[key] = payload
+        return payload
+
+    def sites(self, today):
+        return {"success": True, "data": self.data.records, "version": self.data.version,
+                "lastUpdated": self.data.loaded_at}
+
+    def data_json(self, today):
+        return self.data.records
+
+    def stats(self, today):
+        return {"success": True, "stats": self.data.stats(today)}
+
+    def dashboard(self, today):
+        return {"success": True, "version": self.data.version, "lastUpdated": self.data.loaded_at,
+                "stats": self.data.stats(today), "data": self.data.records}
+
+    def index(self, today):
+        return {"message": "COW Fuel Dashboard API", "endpoints": ENDPOINTS,
+                "status": "running", "version": self.data.version}
+
+    BUILDERS = {
+        "/": index,
+        "/api/fuel/sites": sites,
+        "/api/fuel/stats": stats,
+        "/api/fuel/dashboard": dashboard,
+        "/data.json": data_json,
+    }
+    DAILY = {"/api/fuel/stats", "/api/fuel/dashboard"}
+
+
+def file_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class SnapshotWatcher:
+    """Serves the snapshot file at ``path``, reloading it when it is replaced."""
+
+    def __init__(self, path, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self._key = None
+        self.payloads = Payloads(SiteData.sample())
+        self.check()
+        self._stop = threading.Event()
+
+    def check(self):
+        """Reload the file if it changed since the last check; keep the old data on errors."""
+        key = file_key(self.path)
+        if key is None or key == self._key:
+            return False
+        try:
+            data = SiteData.read(self.path)
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            log.warning("snapshot_unreadable", path=self.path, error=str(e))
+            return False
+        self._key = key
+        self.payloads = Payloads(data)
+        log.info("snapshot_loaded", version=data.version, sites=len(data.records))
+        return True
+
+    def start(self):
+        threading.Thread(target=self._follow, name="snapshot-watcher", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _follow(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+
+def accepts_gzip(header):
+    for part in (header or "").split(","):
+        name, _, params = part.partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
 class FuelDashboardHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FuelDashboardSimple/2.0"
+    # Headers and body go out in separate writes; don't let Nagle hold the body back
+    disable_nagle_algorithm = True
+
     def do_GET(self):
-        parsed = urlparse(self.path)
-        path = parsed.path
-        
-        # Add CORS headers
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.respond(send_body=True)
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_cors_headers()
+        self.send_header('Content-Length', '0')
         self.end_headers()
-        
-        if path == '/api/ping':
-            response = {
+
+    def respond(self, send_body):
+        url = urlsplit(self.path)
+        if url.path == '/api/ping':
+            self.send_json(200, encode_json({
                 "message": "COW Fuel Dashboard Server is running!",
                 "timestamp": datetime.now().isoformat(),
                 "status": "healthy"
-            }
-        elif path == '/api/fuel/sites':
-            response = {
-                "success": True,
-                "data": FUEL_DATA,
-                "lastUpdated": datetime.now().isoformat()
-            }
-        elif path == '/api/fuel/stats':
-            response = {
-                "success": True,
-                "stats": {
-                    "totalSites": len(FUEL_DATA),
-                    "needFuelToday": 0,
-                    "tomorrow": 1,
-                    "afterTomorrow": 1,
-                    "overdue": 1,
-                    "lastUpdated": datetime.now().isoformat()
-                }
-            }
-        elif path == '/data.json':
-            response = FUEL_DATA
+            }), send_body=send_body)
+            return
+        if url.query and url.path == '/api/fuel/sites':
+            self.send_error_json(400, "Filters are not supported by the lightweight server", send_body)
+            return
+        payload = self.server.watcher.payloads.get(url.path, today_day_number())
+        if payload is None:
+            self.send_error_json(404, f"Not found: {url.path}", send_body)
+            return
+
+        etag = f'"{payload.etag}"'
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match and (if_none_match.strip() == '*' or etag in if_none_match):
+            self.send_response(304)
+            self.send_cors_headers()
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
+        if payload.gzipped is not None and accepts_gzip(self.headers.get('Accept-Encoding')):
+            self.send_json(200, payload.gzipped, etag=f'W/{etag}', encoding='gzip',
+                           send_body=send_body)
         else:
-            response = {
-                "message": "COW Fuel Dashboard API",
-                "endpoints": ["/api/ping", "/api/fuel/sites", "/api/fuel/stats", "/data.json"],
-                "status": "running"
-            }
-        
-        self.wfile.write(json.dumps(response, indent=2).encode())
-    
+            self.send_json(200, payload.body, etag=etag, send_body=send_body)
+
+    def send_json(self, status, body, etag=None, encoding=None, send_body=True):
+        self.send_response(status)
+        self.send_cors_headers()
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Vary', 'Accept-Encoding')
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_error_json(self, status, message, send_body=True):
+        self.send_json(status, encode_json({"success": False, "error": message}), send_body=send_body)
+
+    def send_cors_headers(self):
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+
     def log_message(self, format, *args):
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] {format % args}")
+        log.debug("request", client=self.client_address[0], message=format % args)
+
+
+class SimpleServer(ThreadingHTTPServer):
+    """Thread-per-connection server answering from a SnapshotWatcher."""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, watcher):
+        super().__init__(address, FuelDashboardHandler)
+        self.watcher = watcher
+
 
 def run_server():
+    configure_logging()
     port = int(os.environ.get('PORT', 8080))
-    
-    print(f"""
-🚀 Starting COW Fuel Dashboard Simple Server
-📡 Port: {port}
-🌐 URL: http://localhost:{port}
-📊 Endpoints: /api/ping, /api/fuel/sites, /api/fuel/stats
-⏰ Started: {datetime.now().strftime('%H:%M:%S')}
-""")
-    
+    watcher = SnapshotWatcher(SNAPSHOT_PATH, read_setting('SNAPSHOT_POLL', 1) or 1)
+    watcher.start()
     try:
-        server = HTTPServer(('0.0.0.0', port), FuelDashboardHandler)
-        print(f"✅ Server started successfully on port {port}")
-        server.serve_forever()
+        server = SimpleServer(('0.0.0.0', port), watcher)
     except OSError as e:
         if "Address already in use" in str(e):
-            print(f"❌ Error: Port {port} is already in use!")
+            log.error("port_in_use", port=port, hint="set a different PORT environment variable")
         else:
-            print(f"❌ Server error: {e}")
+            log.error("server_error", error=str(e))
+        return
+    log.info("server_starting", mode="simple", port=port, snapshot=SNAPSHOT_PATH,
+             version=watcher.payloads.data.version, routes=ENDPOINTS)
+    try:
+        server.serve_forever()
     except KeyboardInterrupt:
-        print("\n👋 Server stopped")
+        log.info("server_stopped")
+    finally:
+        server.server_close()
+
 
 if __name__ == "__main__":
     run_server()
@@ -0,0 +1,154 @@
+"""
+Per-snapshot lookup indexes over a SiteTable.
+
+``SiteIndex`` keeps every row position sorted by fueling day, both globally
+and grouped by city and by region, so a city / region / date-range /
+status-bucket query is a few binary searches plus a slice of the matching
+rows.
+"""
+import numpy as np
+
+from site_table import site_rows
+
+# Urgency buckets, as day offsets from today (inclusive, None = open ended)
+STATUS_OFFSETS = {
+    "overdue": (None, -1),
+    "today": (0, 0),
+    "tomorrow": (1, 1),
+    "afterTomorrow": (2, 2),
+    "later": (3, None),
+}
+
+SORT_KEYS = ("date", "-date", "site", "-site", "city", "-city")
+
+DAY_MIN = np.iinfo(np.int32).min
+DAY_MAX = np.iinfo(np.int32).max
+
+
+def status_ranges(statuses, today):
+    """Return the sorted, inclusive day ranges covered by the status buckets."""
+    ranges = []
+    for status in dict.fromkeys(statuses):
+        lo, hi = STATUS_OFFSETS[status]
+        ranges.append((DAY_MIN if lo is None else today + lo,
+                       DAY_MAX if hi is None else today + hi))
+    return sorted(ranges)
+
+
+def clip_ranges(ranges, day_from=None, day_to=None):
+    """Intersect day ranges (None = all days) with an optional [day_from, day_to] window."""
+    if ranges is None:
+        ranges = [(DAY_MIN, DAY_MAX)]
+    lo_bound = DAY_MIN if day_from is None else day_from
+    hi_bound = DAY_MAX if day_to is None else day_to
+    clipped = []
+    for lo, hi in ranges:
+        lo, hi = max(lo, lo_bound), min(hi, hi_bound)
+        if lo <= hi:
+            clipped.append((lo, hi))
+    return clipped
+
+
+def group_rows(day, codes, names):
+    """Group row positions by dictionary code, date-sorted within each group.
+
+    Returns (rows, their days, {name: (start, stop) slice of rows}).
+    """
+    rows = np.lexsort((day, codes)).astype(np.int32)
+    bounds = np.searchsorted(codes[rows], np.arange(len(names) + 1))
+    slices = {name: (int(bounds[code]), int(bounds[code + 1])) for code, name in enumerate(names)}
+    return rows, day[rows], slices
+
+
+class SiteIndex:
+    """Date-sorted row index, globally, per city and per region, for one SiteTable."""
+
+    def __init__(self, table):
+        self.table = table
+        self.by_date = np.argsort(table.day, kind="stable").astype(np.int32)
+        self.sorted_days = table.day[self.by_date]
+        self.by_city, self.by_city_days, self.city_slices = group_rows(
+            table.day, table.city_codes, table.city_names)
+        self.by_region, self.by_region_days, self.region_slices = group_rows(
+            table.day, table.region_codes, table.region_names)
+        self._site_order = None
+        self._site_rows = None
+
+    def rows(self, cities=None, ranges=None, regions=None):
+        """Return row positions matching the cities, regions and day ranges, sorted by day.
+
+        ``cities`` and ``regions`` are lists of names (None = all);
+        ``ranges`` is a sorted list of disjoint inclusive (lo, hi) day
+        ranges (None = all).
+        """
+        if ranges is None:
+            ranges = [(DAY_MIN, DAY_MAX)]
+        if cities is None and regions is None:
+            return self._slice(self.by_date, self.sorted_days, 0, len(self.by_date), ranges)
+        if cities is None:
+            return self._groups(self.by_region, self.by_region_days, self.region_slices, regions,
+                                ranges)
+
+        rows = self._groups(self.by_city, self.by_city_days, self.city_slices, cities, ranges)
+        if regions is not None and len(rows):
+            codes = [self.table.region_names.index(r) for r in regions if r in self.region_slices]
+            rows = rows[np.isin(self.table.region_codes[rows], codes)]
+        return rows
+
+    def sort(self, rows, key):
+        """Order day-sorted ``rows`` by one of SORT_KEYS."""
+        if key == "date":
+            return rows
+        if key == "-date":
+            return rows[::-1]
+        if key.lstrip("-") == "site":
+            rank = self.site_rank()[rows]
+        else:
+            names = np.array(["" if name is None else str(name) for name in self.table.city_names],
+                             dtype=object)
+            city_rank = np.argsort(np.argsort(names, kind="stable"))
+            rank = city_rank[self.table.city_codes[rows]]
+        order = np.argsort(rank, kind="stable")
+        return rows[order[::-1]] if key.startswith("-") else rows[order]
+
+    def rows_for_sites(self, names):
+        """Return the row positions of the given SiteNames, every row of a repeated
+        name included (unknown names are skipped)."""
+        if self._site_rows is None:
+            self._site_rows = site_rows(self.table.sites.tolist())
+        return np.array([i for name in names for i in self._site_rows.get(name, ())], dtype=np.int32)
+
+    def site_rank(self):
+        """Rank of every row by site name, computed on first use."""
+        if self._site_order is None:
+            names = ["" if site is None else str(site) for site in self.table.sites.tolist()]
+            order = np.argsort(np.array(names, dtype=object), kind="stable")
+            rank = np.empty(len(order), dtype=np.int32)
+            rank[order] = np.arange(len(order), dtype=np.int32)
+            self._site_order = rank
+        return self._site_order
+
+    def _groups(self, rows, days, slices, names, ranges):
+        parts = []
+        for name in dict.fromkeys(names):
+            bounds = slices.get(name)
+            if bounds is not None:
+                parts.append(self._slice(rows, days, *bounds, ranges))
+        if not parts:
+            return np.empty(0, dtype=np.int32)
+        if len(parts) == 1:
+            return parts[0]
+        rows = np.concatenate(parts)
+        return rows[np.lexsort((rows, self.table.day[rows]))]
+
+    @staticmethod
+    def _slice(rows, days, start, stop, ranges):
+        parts = []
+        for lo, hi in ranges:
+            a = start + int(np.searchsorted(days[start:stop], lo, side="left"))
+            b = start + int(np.searchsorted(days[start:stop], hi, side="right"))
+            if a < b:
+                parts.append(rows[a:b])
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int32)
@@ -0,0 +1,271 @@
+"""
+Columnar, read-only container for one snapshot of fuel sites.
+
+Sites are stored as parallel numpy arrays instead of a list of dicts:
+interned site names, dictionary-encoded city and region names, an int32
+day-number (days since 1970-01-01) fueling date column and float64
+coordinates.
+``to_records`` rebuilds the dashboard's JSON shape when it is needed.
+"""
+import hashlib
+import sys
+
+import numpy as np
+
+EPOCH_DAY = np.datetime64("1970-01-01", "D")
+
+
+def intern_text(value):
+    """Intern strings; map missing values (None/NaN) to None."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if value is None or value != value:
+        return None
+    return value
+
+
+def day_numbers(dates):
+    """Convert "YYYY-MM-DD" strings (or datetime64 values) to int32 day numbers."""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int32)
+
+
+def day_strings(days):
+    """Convert int32 day numbers back to "YYYY-MM-DD" strings."""
+    return np.datetime_as_string(np.asarray(days).astype("datetime64[D]"), unit="D").tolist()
+
+
+def encode_cities(cities):
+    """Dictionary-encode city (or region) names into (names tuple, int32 codes)."""
+    index = {}
+    codes = np.fromiter(
+        (index.setdefault(intern_text(city), len(index)) for city in cities),
+        dtype=np.int32,
+    )
+    return tuple(index), codes
+
+
+def merge_codes(tables, names_attr, codes_attr):
+    """Concatenate dictionary-encoded columns, merging their name dictionaries."""
+    index = {}
+    codes = []
+    for table in tables:
+        remap = np.array([index.setdefault(name, len(index)) for name in getattr(table, names_attr)],
+                         dtype=np.int32)
+        column = getattr(table, codes_attr)
+        codes.append(remap[column] if len(remap) else column)
+    return tuple(index), np.concatenate(codes)
+
+
+def decode(names, codes):
+    """Expand dictionary codes back into an object array of names."""
+    values = np.empty(len(names), dtype=object)
+    values[:] = names
+    return values[codes]
+
+
+def _readonly(array):
+    array.flags.writeable = False
+    return array
+
+
+class SiteTable:
+    """Immutable column store of sites for one data snapshot."""
+
+    __slots__ = ("sites", "city_names", "city_codes", "day", "lat", "lng",
+                 "region_names", "region_codes")
+
+    def __init__(self, sites, city_names, city_codes, day, lat, lng,
+                 region_names=(None,), region_codes=None):
+        self.sites = _readonly(np.asarray(sites, dtype=object))
+        self.city_names = tuple(city_names)
+        self.city_codes = _readonly(np.asarray(city_codes, dtype=np.int32))
+        self.day = _readonly(np.asarray(day, dtype=np.int32))
+        self.lat = _readonly(np.asarray(lat, dtype=np.float64))
+        self.lng = _readonly(np.asarray(lng, dtype=np.float64))
+        # Sites without a region share code 0 of the default (None,) dictionary
+        if region_codes is None:
+            region_codes = np.zeros(len(self.day), dtype=np.int32)
+        self.region_names = tuple(region_names)
+        self.region_codes = _readonly(np.asarray(region_codes, dtype=np.int32))
+
+    @classmethod
+    def from_columns(cls, sites, cities, days, lat, lng, regions=None):
+        """Build a table from per-site columns (any sequences of equal length).
+
+        ``regions`` may be omitted when the source has no region column.
+        """
+        city_names, city_codes = encode_cities(cities)
+        site_array = np.empty(len(city_codes), dtype=object)
+        site_array[:] = [intern_text(site) for site in sites]
+        if regions is None:
+            return cls(site_array, city_names, city_codes, days, lat, lng)
+        region_names, region_codes = encode_cities(regions)
+        return cls(site_array, city_names, city_codes, days, lat, lng, region_names, region_codes)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build a table from the dashboard's list-of-dicts shape."""
+        return cls.from_columns(
+            [r["SiteName"] for r in records],
+            [r["CityName"] for r in records],
+            day_numbers([r["NextFuelingPlan"] for r in records]),
+            [r["lat"] for r in records],
+            [r["lng"] for r in records],
+            [r.get("RegionName") for r in records],
+        )
+
+    @classmethod
+    def coerce(cls, data):
+        """Return ``data`` as a SiteTable, converting a list of site dicts."""
+        return data if isinstance(data, cls) else cls.from_records(list(data))
+
+    @classmethod
+    def concat(cls, tables):
+        """Join several tables, merging their city and region dictionaries."""
+        tables = list(tables)
+        if not tables:
+            return cls.from_columns([], [], [], [], [])
+        return cls(
+            np.concatenate([t.sites for t in tables]),
+            *merge_codes(tables, "city_names", "city_codes"),
+            np.concatenate([t.day for t in tables]),
+            np.concatenate([t.lat for t in tables]),
+            np.concatenate([t.lng for t in tables]),
+            *merge_codes(tables, "region_names", "region_codes"),
+        )
+
+    def __len__(self):
+        return len(self.day)
+
+    @property
+    def cities(self):
+        """City name of every site, as an object array."""
+        return decode(self.city_names, self.city_codes)
+
+    @property
+    def regions(self):
+        """Region name of every site (None where unknown), as an object array."""
+        return decode(self.region_names, self.region_codes)
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the columns and the distinct strings."""
+        strings = set(self.sites.tolist()).union(self.city_names, self.region_names)
+        return (sum(sys.getsizeof(s) for s in strings)
+                + sum(c.nbytes for c in (self.sites, self.city_codes, self.day, self.lat, self.lng,
+                                         self.region_codes)))
+
+    def take(self, index):
+        """Return the sites selected by an index array or boolean mask."""
+        return SiteTable(self.sites[index], self.city_names, self.city_codes[index],
+                         self.day[index], self.lat[index], self.lng[index],
+                         self.region_names, self.region_codes[index])
+
+    def to_records(self):
+        """Return the sites in the dashboard's JSON shape (list of dicts).
+
+        RegionName is only included for sites whose region is known.
+        """
+        records = [
+            {
+                "SiteName": site,
+                "CityName": city,
+                "NextFuelingPlan": date,
+                "lat": lat,
+                "lng": lng
+            }
+            for site, city, date, lat, lng in zip(
+                self.sites.tolist(),
+                self.cities.tolist(),
+                day_strings(self.day),
+                self.lat.tolist(),
+                self.lng.tolist(),
+            )
+        ]
+        if any(name is not None for name in self.region_names):
+            for record, region in zip(records, self.regions.tolist()):
+                if region is not None:
+                    record["RegionName"] = region
+        return records
+
+    def to_frame(self):
+        """Return the sites as a pandas DataFrame with a datetime date column."""
+        import pandas as pd
+        return pd.DataFrame({
+            "SiteName": self.sites,
+            "CityName": self.cities,
+            "NextFuelingPlan": self.day.astype("datetime64[D]").astype("datetime64[s]"),
+            "lat": self.lat,
+            "lng": self.lng,
+            "RegionName": self.regions,
+        })
+
+    def digest(self):
+        """Return a stable hex digest of the table contents."""
+        h = hashlib.sha256()
+        h.update("\x1f".join(map(str, self.sites.tolist())).encode("utf-8"))
+        h.update(b"\x1e")
+        h.update("\x1f".join(map(str, self.city_names)).encode("utf-8"))
+        h.update(b"\x1e")
+        h.update("\x1f".join(map(str, self.region_names)).encode("utf-8"))
+        for column in (self.city_codes, self.day, self.lat, self.lng, self.region_codes):
+            h.update(b"\x1e")
+            h.update(np.ascontiguousarray(column).tobytes())
+        return h.hexdigest()[:32]
+
+
+def site_rows(names):
+    """Map each SiteName to the positions of its rows (a name can label several rows)."""
+    rows = {}
+    for i, site in enumerate(names):
+        rows.setdefault(site, []).append(i)
+    return rows
+
+
+def _group_state(table, rows):
+    """Order-independent contents of some rows, comparable across tables."""
+    return sorted(
+        ((city, region, day, None if lat != lat else lat, None if lng != lng else lng)
+         for city, region, day, lat, lng in zip(
+             table.cities[rows].tolist(), table.regions[rows].tolist(), table.day[rows].tolist(),
+             table.lat[rows].tolist(), table.lng[rows].tolist())),
+        key=repr)
+
+
+def diff_tables(old, new):
+    """Compare two tables keyed on SiteName.
+
+    Returns (upserted, removed): row positions in ``new`` of sites that are
+    new or whose city, region, date or coordinates changed, and the names of sites
+    that are no longer present. The rows sharing a SiteName are compared as a
+    group; when the group changed, all of its rows are upserted, since clients
+    replace every row of an upserted name.
+    """
+    old_rows = site_rows(old.sites.tolist())
+    new_names = new.sites.tolist()
+    new_rows = site_rows(new_names)
+    grouped = {site for site, rows in new_rows.items()
+               if len(rows) > 1 or len(old_rows.get(site, ())) > 1}
+    matches = np.fromiter((old_rows[site][0] if site in old_rows and site not in grouped else -1
+                           for site in new_names), dtype=np.int64, count=len(new_names))
+    single = np.fromiter((site not in grouped for site in new_names), dtype=bool,
+                         count=len(new_names))
+    known = matches >= 0
+    old_idx = matches[known]
+    new_idx = np.flatnonzero(known)
+
+    changed = (
+        (old.cities[old_idx] != new.cities[new_idx])
+        | (old.regions[old_idx] != new.regions[new_idx])
+        | (old.day[old_idx] != new.day[new_idx])
+        | (old.lat[old_idx] != new.lat[new_idx])
+        | (old.lng[old_idx] != new.lng[new_idx])
+    )
+    changed_groups = [i for site in grouped
+                      if site not in old_rows
+                      or _group_state(old, old_rows[site]) != _group_state(new, new_rows[site])
+                      for i in new_rows[site]]
+    upserted = np.sort(np.concatenate([np.flatnonzero(~known & single), new_idx[changed],
+                                       np.array(changed_groups, dtype=np.int64)]))
+    removed = [site for site in old_rows if site not in new_rows]
+    return upserted, removed
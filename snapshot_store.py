@@ -0,0 +1,190 @@
+"""
+On-disk snapshot file shared by the serving processes.
+
+One loader writes each new snapshot to a single file (atomically, via a
+temporary file and ``os.replace``); every worker memory-maps it read-only.
+The numeric columns are used in place from the mapping, so all workers share
+one copy in the page cache; only the site, city and region names are
+decoded per process.
+
+The file doubles as the persisted snapshot a restarted process serves
+until its first load completes.
+
+File layout: an 8-byte magic, a little-endian uint32 header length, a JSON
+header (version, load and refresh times, content hash, site, city and
+region names and the offset of every column), then the 8-byte aligned column data.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from logs import get_logger
+from refresher import Snapshot
+from sheet_fetch import write_atomic
+from site_table import SiteTable, intern_text
+
+log = get_logger("fuel.snapshot_store")
+
+MAGIC = b"FUELSNP1"
+
+# Numeric SiteTable columns stored as raw arrays, with their dtypes
+COLUMNS = (("city_codes", "<i4"), ("day", "<i4"), ("lat", "<f8"), ("lng", "<f8"),
+           ("region_codes", "<i4"))
+
+ALIGN = 8
+
+
+def _pad(n):
+    return -n % ALIGN
+
+
+def encode_snapshot(snapshot, refreshed_at=None):
+    """Return the file contents for ``snapshot`` as bytes."""
+    table = snapshot.table
+    arrays = [np.ascontiguousarray(getattr(table, name), dtype=dtype) for name, dtype in COLUMNS]
+    layout = {}
+    offset = 0
+    for (name, dtype), array in zip(COLUMNS, arrays):
+        layout[name] = [offset, dtype, len(array)]
+        offset += array.nbytes + _pad(array.nbytes)
+    header = json.dumps({
+        "version": snapshot.version,
+        "loadedAt": snapshot.loaded_at.isoformat(),
+        "contentHash": snapshot.content_hash,
+        "refreshedAt": refreshed_at and refreshed_at.isoformat(),
+        "sites": table.sites.tolist(),
+        "cityNames": list(table.city_names),
+        "regionNames": list(table.region_names),
+        "columns": layout,
+    }, separators=(",", ":")).encode("utf-8")
+    prefix = MAGIC + struct.pack("<I", len(header)) + header
+    parts = [prefix, b"\0" * _pad(len(prefix))]
+    for array in arrays:
+        parts += [array.tobytes(), b"\0" * _pad(array.nbytes)]
+    return b"".join(parts)
+
+
+def write_snapshot(path, snapshot, refreshed_at=None):
+    """Atomically replace ``path`` with ``snapshot``.
+
+    ``refreshed_at`` is when the loader last confirmed the data (None for
+    data carried over from an earlier run).
+    """
+    write_atomic(path, encode_snapshot(snapshot, refreshed_at))
+
+
+def read_snapshot(path):
+    """Memory-map the snapshot file at ``path``; return (Snapshot, refreshed_at).
+
+    The numeric columns of the returned table are read-only views of the
+    mapping, which stays open for as long as they are referenced.
+    """
+    snapshot, refreshed_at, _ = read_snapshot_keyed(path)
+    return snapshot, refreshed_at
+
+
+def read_snapshot_keyed(path):
+    """Like read_snapshot, plus the file_key of the very file that was read.
+
+    The key comes from the open file, so a replace racing the read can
+    never pair one file's key with another file's contents.
+    """
+    with open(path, "rb") as f:
+        key = stat_key(os.fstat(f.fileno()))
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapping[:len(MAGIC)] != MAGIC:
+        mapping.close()
+        raise ValueError(f"{path} is not a snapshot file")
+    (header_len,) = struct.unpack_from("<I", mapping, len(MAGIC))
+    start = len(MAGIC) + 4
+    header = json.loads(mapping[start:start + header_len])
+    base = start + header_len
+    base += _pad(base)
+
+    columns = {
+        name: np.frombuffer(mapping, dtype=dtype, count=count, offset=base + offset)
+        for name, (offset, dtype, count) in header["columns"].items()
+    }
+    sites = np.empty(len(header["sites"]), dtype=object)
+    sites[:] = [intern_text(site) for site in header["sites"]]
+    # Files written before regions were tracked have no region column
+    table = SiteTable(sites, header["cityNames"], columns["city_codes"], columns["day"],
+                      columns["lat"], columns["lng"], header.get("regionNames", (None,)),
+                      columns.get("region_codes"))
+    snapshot = Snapshot(header["version"], table, datetime.fromisoformat(header["loadedAt"]),
+                        header["contentHash"])
+    refreshed_at = header.get("refreshedAt")
+    return snapshot, refreshed_at and datetime.fromisoformat(refreshed_at), key
+
+
+def stat_key(st):
+    """file_key of an os.stat_result."""
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def file_key(path):
+    """Identity of the file currently at ``path`` (changes on every replace), or None."""
+    try:
+        return stat_key(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+def wait_for_replace(path, key, timeout):
+    """Poll until the file at ``path`` is no longer ``key``; False after ``timeout`` seconds."""
+    deadline = time.monotonic() + timeout
+    while file_key(path) == key:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+class SnapshotFollower:
+    """Polls a snapshot file and calls ``on_change(snapshot, refreshed_at)`` on every replace.
+
+    ``key`` is the file_key of the snapshot the caller already holds (from
+    read_snapshot_keyed); without it, whatever file is there now counts as
+    seen.
+    """
+
+    def __init__(self, path, on_change, interval=1.0, key=None):
+        self.path = path
+        self._on_change = on_change
+        self._interval = interval
+        self._key = key if key is not None else file_key(path)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """Load the file if it was replaced since the last check. Returns True if it was."""
+        key = file_key(self.path)
+        if key is None or key == self._key:
+            return False
+        snapshot, refreshed_at, self._key = read_snapshot_keyed(self.path)
+        self._on_change(snapshot, refreshed_at)
+        return True
+
+    def start(self):
+        """Follow the file on a daemon thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._follow, name="snapshot-follower",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _follow(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.check()
+            except Exception as e:
+                log.warning("shared_snapshot_unreadable", path=self.path, error=str(e))
@@ -5,18 +5,18 @@ Handles dynamic port configuration for cloud deployments
 """
 import os
 import sys
-from main import app, fuel_data, generate_reports
+from logs import configure_logging, get_logger
+
+# Configure logging before main is imported so its startup events are kept
+configure_logging()
+
+from main import api_routes, app, refresher, start_background_services
+
+log = get_logger("fuel.start")
 
 def main():
-    print("\n🚀 Starting COW Fuel Dashboard Server...")
-    print("Loading Central Fuel Plan database...")
-    
-    # Generate initial reports
-    try:
-        generate_reports(fuel_data)
-        print(f"✅ Loaded {len(fuel_data)} fuel sites")
-    except Exception as e:
-        print(f"⚠️ Warning: Could not generate reports: {e}")
+    # Serve the startup data now; fresh data and reports load in the background
+    start_background_services()
     
     # Get port from environment variable with multiple fallbacks
     port = None
@@ -26,7 +26,6 @@ def main():
         if os.environ.get(port_var):
             try:
                 port = int(os.environ.get(port_var))
-                print(f"📡 Using port {port} from {port_var} environment variable")
                 break
             except ValueError:
                 continue
@@ -34,19 +33,13 @@ def main():
     # If no port found, use default
     if port is None:
         port = 8080
-        print(f"📡 Using default port {port}")
+        port_var = None
     
     # Determine host - use 0.0.0.0 for cloud deployments
     host = '0.0.0.0'
     
-    print(f"🌐 Starting web server at http://{host}:{port}")
-    print("📊 Available endpoints:")
-    print(f"   - GET http://localhost:{port}/              - Main dashboard")
-    print(f"   - GET http://localhost:{port}/api/ping      - Health check")
-    print(f"   - GET http://localhost:{port}/api/fuel/sites - Get fuel sites")
-    print(f"   - GET http://localhost:{port}/api/fuel/stats - Get statistics")
-    print(f"   - GET http://localhost:{port}/api/fuel/refresh - Refresh data")
-    print()
+    log.info("server_starting", host=host, port=port, port_from=port_var or "default",
+             sites=len(refresher.current().table), routes=api_routes())
     
     try:
         # Start the server
@@ -58,17 +51,17 @@ def main():
         )
     except OSError as e:
         if "Address already in use" in str(e):
-            print(f"❌ Error: Port {port} is already in use!")
-            print("Try using a different port or stop the conflicting service.")
+            log.error("port_in_use", port=port,
+                      hint="use a different port or stop the conflicting service")
             sys.exit(1)
         else:
-            print(f"❌ Error starting server: {e}")
+            log.error("server_error", error=str(e))
             sys.exit(1)
     except KeyboardInterrupt:
-        print("\n👋 Server stopped by user")
+        log.info("server_stopped")
         sys.exit(0)
     except Exception as e:
-        print(f"❌ Unexpected error: {e}")
+        log.error("server_error", error=str(e), exc_info=True)
         sys.exit(1)
 
 if __name__ == "__main__":
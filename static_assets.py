@@ -0,0 +1,117 @@
+"""
+In-memory static assets for the dashboard front end.
+
+Only the files listed in ASSETS and PAGES are served; everything else in the
+working directory (sources, CSVs, caches) is not reachable over HTTP. Each
+file is read once at startup and its gzip (and, with the brotli module, br)
+variants are compressed ahead of time.
+
+Assets are published under a content-hash fingerprinted URL
+(``/static/script.<hash>.js``) with an immutable Cache-Control, so browsers
+never ask for them again until their content, and therefore their URL,
+changes. Pages are rewritten to reference those URLs and are served with an
+ETag and ``no-cache``: a repeat visit costs one 304 and no asset bytes.
+"""
+import hashlib
+import os
+import re
+
+from logs import get_logger
+from response_cache import Payload
+
+log = get_logger("fuel.static_assets")
+
+# Files referenced by the pages, served under fingerprinted URLs
+ASSETS = ("script.js", "style.css")
+
+# Entry pages, served at their own name (index.html also at "/")
+PAGES = ("index.html",)
+
+STATIC_PREFIX = "/static/"
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".json": "application/json",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".ico": "image/x-icon",
+}
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+
+def fingerprint(content):
+    """Short content hash used in asset URLs and ETags."""
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def fingerprinted_url(name, digest):
+    stem, ext = os.path.splitext(name)
+    return f"{STATIC_PREFIX}{stem}.{digest}{ext}"
+
+
+class Asset:
+    """One file held in memory: its bytes and compressed variants, type and caching policy."""
+
+    __slots__ = ("name", "url", "content_type", "etag", "payload", "cache_control")
+
+    def __init__(self, name, content, url, cache_control):
+        self.name = name
+        self.url = url
+        self.content_type = CONTENT_TYPES.get(os.path.splitext(name)[1], "application/octet-stream")
+        self.etag = fingerprint(content)
+        self.payload = Payload(content)
+        self.cache_control = cache_control
+
+
+def rewrite_references(html, urls):
+    """Point ``src``/``href`` attributes naming an asset at its fingerprinted URL."""
+    if not urls:
+        return html
+    names = "|".join(re.escape(name) for name in sorted(urls, key=len, reverse=True))
+    pattern = re.compile(r'(\b(?:src|href)\s*=\s*["\'])(?:\./|/)?(' + names + r')(?=["\'?#])')
+    return pattern.sub(lambda m: m.group(1) + urls[m.group(2)], html)
+
+
+class AssetBundle:
+    """The allowlisted assets and pages under ``root``, keyed by request path."""
+
+    def __init__(self, root, assets=ASSETS, pages=PAGES):
+        self.root = root
+        self._by_path = {}
+        # Asset name -> fingerprinted URL
+        self.urls = urls = {}
+        for name in assets:
+            content = self._read(name)
+            if content is None:
+                continue
+            url = fingerprinted_url(name, fingerprint(content))
+            urls[name] = url
+            self._by_path[url] = Asset(name, content, url, IMMUTABLE)
+            # The plain name stays reachable for pages cached before the rewrite
+            self._by_path["/" + name] = Asset(name, content, "/" + name, REVALIDATE)
+        for name in pages:
+            content = self._read(name)
+            if content is None:
+                continue
+            html = rewrite_references(content.decode("utf-8"), urls).encode("utf-8")
+            self._by_path["/" + name] = Asset(name, html, "/" + name, REVALIDATE)
+        if "/index.html" in self._by_path:
+            self._by_path["/"] = self._by_path["/index.html"]
+        log.info("static_assets_loaded", assets=sorted(urls.values()),
+                 bytes=sum(len(a.payload.body) for a in self._by_path.values()))
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.root, name), "rb") as f:
+                return f.read()
+        except OSError as e:
+            log.warning("static_asset_missing", name=name, error=str(e))
+            return None
+
+    def get(self, path):
+        """Return the Asset served at ``path``, or None."""
+        return self._by_path.get(path)
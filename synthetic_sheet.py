@@ -0,0 +1,110 @@
+"""
+Seeded generator of fuel-plan sheets shaped like the published Google Sheet.
+
+The real sheet has ~36 columns (A..AJ) with the site in B, the region in D,
+the city in F, coordinates in L/M and the next fueling date in AJ. Generated
+sheets keep that layout and add the mess the ingest code has to cope with:
+header variants, blank and junk dates, mixed date formats, missing
+coordinates and duplicate site names.
+
+    from synthetic_sheet import generate_sheet
+    csv_bytes = generate_sheet(100_000, seed=7)
+"""
+import string
+
+import numpy as np
+
+# Spreadsheet column letters A..AJ
+LETTERS = list(string.ascii_uppercase) + [f"A{c}" for c in string.ascii_uppercase[:10]]
+
+# Column letter of each field in the real sheet
+FIELD_COLUMNS = {"site": "B", "region": "D", "city": "F", "lat": "L", "lng": "M", "date": "AJ"}
+
+# Header spellings seen for each field; "letters" keeps the bare column letters
+HEADER_STYLES = {
+    "letters": {},
+    "named": {"site": "Site Name", "region": "Region", "city": "City_Name", "lat": "lat",
+              "lng": "lng", "date": "Next Fueling Plan"},
+    "messy": {"site": " SITE-NAME ", "region": "Region ", "city": "city name", "lat": "Latitude",
+              "lng": "Longitude", "date": "next_fueling_plan"},
+}
+
+REGIONS = ["Central", "Central", "Central", "Western", "Eastern", "Northern", "Southern"]
+
+# (city, lat, lng) seeds the coordinates are scattered around
+CITIES = [
+    ("Riyadh", 24.7136, 46.6753), ("Jeddah", 21.4858, 39.1925), ("Buraydah", 26.3320, 43.9736),
+    ("Dammam", 26.4207, 50.0888), ("Medina", 24.5247, 39.5692), ("Mecca", 21.3891, 39.8579),
+    ("Tabuk", 28.3838, 36.5550), ("Abha", 18.2164, 42.5053), ("Hail", 27.5114, 41.7208),
+    ("Al Kharj", 24.1556, 47.3346), ("Unaizah", 26.0840, 43.9939), ("Jazan", 16.8892, 42.5511),
+]
+
+# Share of dates written in each format; the rest are blank or junk
+DATE_FORMATS = [
+    ("%Y-%m-%d", 0.80),
+    ("%d/%m/%Y", 0.06),
+    ("%Y-%m-%d %H:%M:%S", 0.05),
+    ("%m/%d/%Y", 0.03),
+]
+BLANK_DATE_SHARE = 0.04
+JUNK_DATES = ["TBD", "N/A", "-", "pending"]
+
+
+def format_dates(days, rng):
+    """Render int day numbers in a seeded mix of formats, blanks and junk."""
+    dates = days.astype("datetime64[D]").astype(object)
+    shares = [share for _, share in DATE_FORMATS]
+    kinds = rng.choice(len(DATE_FORMATS) + 2, size=len(days),
+                       p=shares + [BLANK_DATE_SHARE, 1 - sum(shares) - BLANK_DATE_SHARE])
+    junk = rng.integers(0, len(JUNK_DATES), size=len(days))
+    out = []
+    for date, kind, j in zip(dates.tolist(), kinds.tolist(), junk.tolist()):
+        if kind < len(DATE_FORMATS):
+            out.append(date.strftime(DATE_FORMATS[kind][0]))
+        elif kind == len(DATE_FORMATS):
+            out.append("")
+        else:
+            out.append(JUNK_DATES[j])
+    return out
+
+
+def generate_columns(rows, seed=0, today=None):
+    """Return {column letter: list of cell strings} for a ``rows``-row sheet."""
+    rng = np.random.default_rng(seed)
+    today = np.datetime64(today or "2025-01-20", "D").astype(np.int64)
+
+    site_ids = rng.integers(1, max(rows, 2) * 1.05, size=rows)
+    city = rng.integers(0, len(CITIES), size=rows)
+    lat = np.array([c[1] for c in CITIES])[city] + rng.normal(0, 0.3, rows)
+    lng = np.array([c[2] for c in CITIES])[city] + rng.normal(0, 0.3, rows)
+    no_coords = rng.random(rows) < 0.02
+    days = today + rng.integers(-10, 30, size=rows)
+
+    columns = {letter: [""] * rows for letter in LETTERS}
+    columns["A"] = [str(i) for i in range(1, rows + 1)]
+    columns["B"] = [f"COW{n:06d}" for n in site_ids.tolist()]
+    columns["C"] = rng.choice(["Active", "Standby", "Moved"], size=rows).tolist()
+    columns["D"] = [REGIONS[r] for r in rng.integers(0, len(REGIONS), size=rows).tolist()]
+    columns["F"] = [CITIES[c][0] for c in city.tolist()]
+    columns["L"] = ["" if missing else f"{v:.4f}" for v, missing in zip(lat.tolist(), no_coords.tolist())]
+    columns["M"] = ["" if missing else f"{v:.4f}" for v, missing in zip(lng.tolist(), no_coords.tolist())]
+    columns["N"] = rng.integers(500, 5000, size=rows).astype(str).tolist()
+    columns["AJ"] = format_dates(days, rng)
+    return columns
+
+
+def generate_sheet(rows, seed=0, header_style="named", today=None):
+    """Return a seeded synthetic sheet of ``rows`` data rows as CSV bytes."""
+    columns = generate_columns(rows, seed, today)
+    names = dict(zip(LETTERS, LETTERS))
+    for field, header in HEADER_STYLES[header_style].items():
+        names[FIELD_COLUMNS[field]] = header
+    if header_style != "letters":
+        # Unused columns carry generic titles in the named sheets
+        for letter in LETTERS:
+            if letter not in FIELD_COLUMNS.values():
+                names[letter] = f"Column {letter}"
+
+    lines = [",".join(names[letter] for letter in LETTERS)]
+    lines.extend(",".join(row) for row in zip(*(columns[letter] for letter in LETTERS)))
+    return ("\n".join(lines) + "\n").encode("utf-8")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests for the synthetic sheet generator and benchmark regression checks
+"""
+import io
+
+import pytest
+
+import main
+from benchmark import compare
+from ingest_plan import PlanStore
+from synthetic_sheet import CITIES, generate_sheet
+
+
+@pytest.fixture(autouse=True)
+def plan_store(tmp_path, monkeypatch):
+    """Keep the ingest plans learned by a test out of the working tree."""
+    monkeypatch.setattr(main, "ingest_plans", PlanStore(str(tmp_path / "ingest_plans.json")))
+
+
+def test_synthetic_sheet_is_seeded_and_ingestible():
+    sheet = generate_sheet(2000, seed=3)
+    assert sheet == generate_sheet(2000, seed=3)
+    assert sheet != generate_sheet(2000, seed=4)
+
+    for style in ("letters", "named", "messy"):
+        table = main.clean_and_filter_stream(io.BytesIO(generate_sheet(500, seed=1, header_style=style)))
+        # Blank and junk dates and non-Central rows (about 4 in 7) are dropped
+        assert 100 < len(table) < 250
+        assert all(str(site).startswith("COW") for site in table.sites.tolist())
+        assert table.region_names == ("Central",)
+        assert set(table.city_names) <= {city for city, _, _ in CITIES}
+
+
+def test_compare_flags_metrics_over_threshold():
+    baseline = {
+        "thresholds": {"default": 0.5, "endpoint": 1.0},
+        "results": {"1000": {"load": {"ms": 10.0}, "endpoint:/x": {"ms": 1.0},
+                             "sites": {"count": 5}}},
+    }
+    report = {"results": {"1000": {"load": {"ms": 14.0}, "endpoint:/x": {"ms": 1.9}}}}
+    assert compare(report, baseline) == []
+    report["results"]["1000"]["load"]["ms"] = 16.0
+    report["results"]["1000"]["endpoint:/x"]["ms"] = 2.5
+    assert len(compare(report, baseline)) == 2
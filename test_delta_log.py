@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-refresh diff history
+"""
+from delta_log import DeltaLog
+
+
+def test_changes_fold_across_refreshes():
+    log = DeltaLog(size=3)
+    log.record(1, 2, ["COW1", "COW2"], ["COW9"])
+    log.record(2, 3, ["COW3"], ["COW2"])
+    log.record(3, 4, ["COW9"], [])
+
+    assert log.changes_since(4, 4) == ([], [])
+    assert log.changes_since(3, 4) == (["COW9"], [])
+    upserted, removed = log.changes_since(1, 4)
+    assert sorted(upserted) == ["COW1", "COW3", "COW9"]
+    assert removed == ["COW2"]
+
+
+def test_evicted_or_unknown_versions_need_a_full_reload():
+    log = DeltaLog(size=2)
+    log.record(1, 2, ["COW1"], [])
+    log.record(2, 3, ["COW2"], [])
+    log.record(3, 4, ["COW3"], [])
+
+    assert log.changes_since(1, 4) is None
+    assert log.changes_since(2, 4) == (["COW2", "COW3"], [])
+    assert log.changes_since(5, 4) is None
+
+
+def test_skipped_versions_need_a_full_reload():
+    log = DeltaLog()
+    log.record(4, 5, ["COW1"], [])
+    log.record(5, 7, ["COW2"], [])
+
+    assert log.changes_since(5, 7) == (["COW2"], [])
+    assert log.changes_since(6, 7) is None
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the depot dispatch planner
+"""
+import numpy as np
+import pytest
+
+from dispatch import DispatchPlan, haversine_km, parse_depots
+from site_table import SiteTable
+
+
+def random_table(n=3000, seed=11):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(16, 32, n)
+    lat[::500] = np.nan
+    return SiteTable.from_columns(
+        [f"COW{i}" for i in range(n)],
+        ["Riyadh"] * n,
+        rng.integers(20000, 20010, n),
+        lat,
+        rng.uniform(34, 55, n),
+    )
+
+
+def test_haversine_matches_a_known_distance():
+    # Riyadh to Jeddah, about 850 km
+    assert haversine_km(24.7136, 46.6753, 21.4858, 39.1925) == pytest.approx(846, abs=5)
+    assert haversine_km(10.0, 20.0, 10.0, 20.0) == 0
+
+
+def test_plan_matches_a_brute_force_search():
+    table = random_table()
+    rng = np.random.default_rng(2)
+    depots = tuple(zip(rng.uniform(16, 32, 12).tolist(), rng.uniform(34, 55, 12).tolist()))
+    rows = np.flatnonzero(table.day < 20004)
+
+    plan = DispatchPlan(table, rows, depots, nearest=25)
+
+    rows = rows[np.isfinite(table.lat[rows])]
+    assert plan.rows.tolist() == rows.tolist()
+    distances = np.array([[haversine_km(lat, lng, table.lat[r], table.lng[r]) for r in rows]
+                          for lat, lng in depots])
+    assert plan.depot.tolist() == distances.argmin(axis=0).tolist()
+    assert np.allclose(plan.nearest_distance, np.sort(distances, axis=1)[:, :25])
+
+    body = plan.body(table, 5)
+    assert body["sites"] == len(rows)
+    assert sum(len(d["assigned"]) for d in body["depots"]) == len(rows)
+    for i, depot in enumerate(body["depots"]):
+        assert [s["distanceKm"] for s in depot["nearest"]] == \
+            np.round(np.sort(distances[i])[:5], 3).tolist()
+        km = [s["distanceKm"] for s in depot["assigned"]]
+        assert km == sorted(km)
+
+
+def test_parse_depots_rejects_bad_coordinates():
+    assert parse_depots(["24.7,46.6", " 21.5, 39.2"]) == ((24.7, 46.6), (21.5, 39.2))
+    for values in ([], ["24.7"], ["north,46.6"], ["95,46.6"]):
+        with pytest.raises(ValueError):
+            parse_depots(values)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for the snapshot event hub and SSE server
+"""
+import socket
+import threading
+
+from werkzeug.serving import make_server
+
+import main
+from event_hub import EventHub, StreamLoop, start_event_server
+
+
+def read_until(sock, marker):
+    data = b""
+    while marker not in data:
+        chunk = sock.recv(4096)
+        assert chunk, data
+        data += chunk
+    return data
+
+
+def test_stream_replays_from_last_event_id():
+    hub = EventHub(history=2)
+    for i in range(3):
+        hub.publish("snapshot", {"version": i})
+
+    stream = hub.stream(last_id=1)
+    assert next(stream).startswith(":")
+    assert next(stream) == 'id: 2\nevent: snapshot\ndata: {"version":1}\n\n'
+    assert next(stream) == 'id: 3\nevent: snapshot\ndata: {"version":2}\n\n'
+
+    stale = hub.stream(last_id=0)
+    next(stale)
+    assert next(stale).startswith("id: 3\nevent: reset")
+
+
+def test_async_server_pushes_to_many_idle_clients():
+    hub = EventHub()
+    thread = start_event_server(hub, host="127.0.0.1", port=0)
+    port = thread.server.sockets[0].getsockname()[1]
+
+    clients = []
+    for _ in range(50):
+        sock = socket.create_connection(("127.0.0.1", port), timeout=5)
+        sock.sendall(b"GET /api/fuel/events HTTP/1.1\r\nHost: test\r\n\r\n")
+        read_until(sock, b": connected")
+        clients.append(sock)
+
+    hub.publish("snapshot", {"version": 7})
+    for sock in clients:
+        assert b'data: {"version":7}' in read_until(sock, b'{"version":7}')
+        sock.close()
+
+    sock = socket.create_connection(("127.0.0.1", port), timeout=5)
+    sock.sendall(b"GET /other HTTP/1.1\r\n\r\n")
+    assert read_until(sock, b"\r\n").startswith(b"HTTP/1.1 404")
+    sock.close()
+
+
+def test_stream_resets_clients_ahead_of_the_hub():
+    # Reconnecting to a restarted process or another worker's hub
+    hub = EventHub()
+    hub.publish("snapshot", {"version": 1})
+
+    stream = hub.stream(last_id=37)
+    next(stream)
+    assert next(stream) == "id: 1\nevent: reset\ndata: {}\n\n"
+    hub.publish("snapshot", {"version": 2})
+    assert next(stream) == 'id: 2\nevent: snapshot\ndata: {"version":2}\n\n'
+
+
+def test_worker_hands_event_streams_to_its_loop():
+    from serve import WorkerRequestHandler
+
+    hub = EventHub()
+    server = make_server("127.0.0.1", 0, main.app, threaded=True,
+                         request_handler=WorkerRequestHandler)
+    server.event_streams = StreamLoop(hub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    try:
+        threads = threading.active_count()
+        clients = []
+        for _ in range(30):
+            sock = socket.create_connection(("127.0.0.1", port), timeout=5)
+            sock.sendall(b"GET /api/fuel/events HTTP/1.1\r\nHost: test\r\n\r\n")
+            assert read_until(sock, b": connected").startswith(b"HTTP/1.1 200 OK")
+            clients.append(sock)
+        # The request threads returned once their streams were handed over
+        assert threading.active_count() <= threads + 2
+
+        hub.publish("snapshot", {"version": 3})
+        for sock in clients:
+            assert b'data: {"version":3}' in read_until(sock, b'{"version":3}')
+            sock.close()
+
+        sock = socket.create_connection(("127.0.0.1", port), timeout=5)
+        sock.sendall(b"GET /api/ping HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+        assert read_until(sock, b"\r\n").startswith(b"HTTP/1.1 200")
+        sock.close()
+    finally:
+        server.shutdown()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-day, per-city workload forecast
+"""
+import numpy as np
+import pytest
+
+from forecast import Forecast
+from site_table import SiteTable
+
+TODAY = 20000
+
+
+def random_table(n=3000, seed=5):
+    rng = np.random.default_rng(seed)
+    return SiteTable.from_columns(
+        [f"COW{i}" for i in range(n)],
+        rng.choice(["Riyadh", "Jeddah", "Dammam", None], n),
+        rng.integers(TODAY - 20, TODAY + 120, n),
+        rng.uniform(16, 32, n),
+        rng.uniform(34, 55, n),
+    )
+
+
+def test_window_matches_a_per_city_count():
+    table = random_table()
+    forecast = Forecast(table, TODAY)
+
+    body = forecast.window(30)
+
+    assert len(body["dates"]) == 30 and body["dates"][0] == "2024-10-04"
+    assert [c["city"] for c in body["cities"]] == [None, "Dammam", "Jeddah", "Riyadh"]
+    cities = table.cities
+    for row in body["cities"]:
+        days = table.day[cities == row["city"]]
+        assert row["overdue"] == int((days < TODAY).sum())
+        assert row["daily"] == [int((days == TODAY + i).sum()) for i in range(30)]
+        assert row["later"] == int((days >= TODAY + 30).sum())
+    total = body["total"]
+    assert total["overdue"] + sum(total["daily"]) + total["later"] == len(table)
+
+
+def test_window_filters_cities_and_checks_days():
+    forecast = Forecast(random_table(), TODAY, horizon=60)
+
+    body = forecast.window(7, ["Jeddah", "Nowhere"])
+
+    assert [c["city"] for c in body["cities"]] == ["Jeddah"]
+    assert body["total"]["daily"] == body["cities"][0]["daily"]
+    with pytest.raises(ValueError):
+        forecast.window(61)
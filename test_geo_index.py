@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tests for the spatial index and cluster pyramid
+"""
+import numpy as np
+
+from geo_index import GeoIndex
+from site_table import SiteTable
+
+
+def random_table(n=2000, seed=3):
+    rng = np.random.default_rng(seed)
+    return SiteTable.from_columns(
+        [f"COW{i}" for i in range(n)],
+        ["Riyadh"] * n,
+        rng.integers(20000, 20010, n),
+        rng.uniform(16, 32, n),
+        rng.uniform(34, 55, n),
+    )
+
+
+def test_within_matches_a_full_scan():
+    table = random_table()
+    geo = GeoIndex(table)
+    west, south, east, north = 40.1, 20.3, 46.77, 25.9
+
+    rows = geo.within(west, south, east, north)
+
+    inside = (table.lat >= south) & (table.lat <= north) & (table.lng >= west) & (table.lng <= east)
+    assert rows.tolist() == np.flatnonzero(inside).tolist()
+
+
+def test_clusters_cover_every_site_with_urgency_counts():
+    table = random_table()
+    geo = GeoIndex(table)
+
+    for zoom in (0, 5, geo.max_zoom):
+        clusters = geo.clusters(zoom, today=20005)
+        assert sum(c["count"] for c in clusters) == len(table)
+        assert sum(c["overdue"] for c in clusters) == int((table.day < 20005).sum())
+        assert all(c["count"] == sum(c[k] for k in ("overdue", "today", "tomorrow",
+                                                    "afterTomorrow", "later")) for c in clusters)
+    assert len(geo.clusters(0, 20005)) < len(geo.clusters(geo.max_zoom, 20005))
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite snapshot history
+"""
+import sqlite3
+from datetime import datetime
+
+from history_store import HistoryStore, day_number
+from refresher import Snapshot
+from site_table import SiteTable
+
+
+def snapshot(version, loaded_at, records):
+    table = SiteTable.from_records(records)
+    return Snapshot(version, table, datetime.fromisoformat(loaded_at), table.digest())
+
+
+def site(name, plan, city="Riyadh"):
+    return {"SiteName": name, "CityName": city, "NextFuelingPlan": plan, "lat": 24.7, "lng": 46.7}
+
+
+def day(value):
+    return day_number(datetime.fromisoformat(value))
+
+
+def test_records_distinct_snapshots_and_site_changes(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"))
+    first = [site("COW1", "2025-01-10"), site("COW2", "2025-01-12")]
+    assert store.record(snapshot(1, "2025-01-09T08:00:00", first))
+    assert not store.record(snapshot(2, "2025-01-09T08:05:00", first))
+    assert store.record(snapshot(3, "2025-01-11T08:00:00",
+                                 [site("COW1", "2025-01-13"), site("COW2", "2025-01-12")]))
+    assert store.record(snapshot(4, "2025-01-12T08:00:00", [site("COW1", "2025-01-13")]))
+
+    timeline = store.site_timeline("COW1")
+    assert [(e["change"], e["NextFuelingPlan"], e["slipDays"]) for e in timeline] == [
+        ("added", "2025-01-10", None), ("changed", "2025-01-13", 3)]
+    assert [e["change"] for e in store.site_timeline("COW2")] == ["added", "removed"]
+    assert store.site_timeline("COW9") == []
+
+    trend = store.overdue_trend(day("2025-01-08"), day("2025-01-13"))
+    assert [(e["date"], e["overdue"], e["dueToday"], e["totalSites"]) for e in trend] == [
+        ("2025-01-09", 0, 0, 2),
+        ("2025-01-10", 0, 1, 2),
+        ("2025-01-11", 0, 0, 2),
+        ("2025-01-12", 0, 0, 1),
+        ("2025-01-13", 0, 1, 1),
+    ]
+    with sqlite3.connect(store.path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM site_changes").fetchone()[0] == 4
+
+    # A new process diffs against the stored state, not the whole history
+    reopened = HistoryStore(store.path)
+    assert reopened.record(snapshot(1, "2025-01-13T08:00:00", [site("COW1", "2025-01-13", "Jeddah")]))
+    assert reopened.site_timeline("COW1")[-1]["CityName"] == "Jeddah"
+
+
+def test_compaction_keeps_the_state_at_the_window_start(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.sqlite3"), retention_days=5)
+    for i in range(1, 9):
+        store.record(snapshot(i, f"2025-01-{i:02d}T08:00:00", [site("COW1", f"2025-01-{i + 1:02d}")]
+                              + ([site("COW2", "2025-01-03")] if i < 3 else [])))
+
+    # The cutoff is 2025-01-03: the 2025-01-02 snapshot is kept as the window start
+    trend = store.overdue_trend(day("2025-01-01"), day("2025-01-08"))
+    assert [e["date"] for e in trend][0] == "2025-01-02"
+    assert trend[1] == {"date": "2025-01-03", "overdue": 0, "dueToday": 0, "totalSites": 1,
+                        "version": 3}
+    timeline = store.site_timeline("COW1")
+    assert timeline[0]["NextFuelingPlan"] == "2025-01-03" and timeline[0]["change"] == "added"
+    assert len(timeline) == 7
+    assert [(e["version"], e["change"]) for e in store.site_timeline("COW2")] == [
+        (2, "added"), (3, "removed")]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for compiled ingest plans and date parsing
+"""
+import io
+
+import numpy as np
+import pandas as pd
+
+import main
+from ingest_plan import PlanStore, compile_plan, detect_date_format, header_fingerprint, parse_dates
+
+SHEET = (
+    b"Site Name,Region,City_Name,lat,lng,Next Fueling Plan\n"
+    b"COW1,Central,Riyadh,24.7,46.6,2025-01-19\n"
+    b"COW2,Central,Riyadh,24.7,46.6,20/01/2025\n"
+    b"COW3,Central,Riyadh,24.7,46.6,2025-01-21 08:30:00\n"
+    b"COW4,Central,Riyadh,24.7,46.6,TBD\n"
+    b"COW5,Central,Riyadh,24.7,46.6,2025-01-22\n"
+    b"COW6,Central,Riyadh,24.7,46.6,2025-01-23\n"
+)
+
+
+def test_mixed_formats_and_junk_are_parsed_per_distinct_value():
+    days = parse_dates(["2025-01-02", "02/01/2025", "13/01/2025", "2025-01-02 10:00:00", "TBD",
+                        "", None, " 2025-01-05 ", "2025-01-02T10:00:00+03:00", "2025-01-02"],
+                       "%Y-%m-%d")
+    assert days.astype(str).tolist() == [
+        "2025-01-02", "2025-02-01", "2025-01-13", "2025-01-02", "NaT",
+        "NaT", "NaT", "2025-01-05", "2025-01-02", "2025-01-02",
+    ]
+    # The plan's format decides ambiguous values; without one, month comes first
+    assert parse_dates(["02/01/2025", "x"], "%d/%m/%Y").astype(str).tolist() == ["2025-01-02", "NaT"]
+    assert parse_dates(np.array(["02/01/2025"], dtype=object)).astype(str).tolist() == ["2025-02-01"]
+
+
+def test_date_format_is_detected_from_the_dominant_one():
+    assert detect_date_format(["20/01/2025", "21/01/2025", "2025-01-22", "TBD"]) == "%d/%m/%Y"
+    assert detect_date_format(["2025-01-20", "20/01/2025", "TBD", "x"]) is None
+    assert detect_date_format(["", None]) is None
+
+
+def test_plans_are_compiled_once_per_header_and_persisted(tmp_path, monkeypatch):
+    path = tmp_path / "plans.json"
+    monkeypatch.setattr(main, "ingest_plans", PlanStore(str(path)))
+    monkeypatch.setattr(main, "INCLUDED_REGIONS", None)
+
+    table = main.clean_and_filter_stream(io.BytesIO(SHEET))
+    assert table.sites.tolist() == ["COW1", "COW2", "COW3", "COW5", "COW6"]
+    assert table.day.astype("datetime64[D]").astype(str).tolist() == \
+        ["2025-01-19", "2025-01-20", "2025-01-21", "2025-01-22", "2025-01-23"]
+
+    # A restarted process reads the stored plan instead of compiling one
+    def no_compile(*args):
+        raise AssertionError("plan recompiled")
+    monkeypatch.setattr(main, "compile_plan", no_compile)
+    monkeypatch.setattr(main, "ingest_plans", PlanStore(str(path)))
+    plan = main.stream_plan(io.BytesIO(SHEET))
+    assert plan.fields == {"site": 0, "region": 1, "city": 2, "date": 5, "lat": 3, "lng": 4}
+    assert plan.date_format == "%Y-%m-%d"
+    assert main.clean_and_filter_stream(io.BytesIO(SHEET)).to_records() == table.to_records()
+
+
+def test_store_keeps_the_most_recent_plans(tmp_path):
+    store = PlanStore(str(tmp_path / "plans.json"), limit=2)
+    for i in range(3):
+        header = f"Site,City,Date,Extra{i}"
+        store.put(compile_plan(header_fingerprint(header), pd.DataFrame(columns=header.split(","))))
+    reloaded = PlanStore(str(tmp_path / "plans.json"))
+    assert reloaded.get(header_fingerprint("Site,City,Date,Extra0")) is None
+    assert reloaded.get(header_fingerprint("Site,City,Date,Extra2")).fields == {"site": 0, "city": 1}
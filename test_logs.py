@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Tests for structured logging
+"""
+import json
+import logging
+
+from logs import JsonFormatter, get_logger
+
+
+def test_events_are_logged_as_json_with_fields(caplog):
+    with caplog.at_level(logging.INFO, logger="fuel.test"):
+        get_logger("fuel.test").info("refresh_installed", job=3, version=12)
+    entry = json.loads(JsonFormatter().format(caplog.records[0]))
+    assert entry["event"] == "refresh_installed"
+    assert (entry["level"], entry["logger"]) == ("info", "fuel.test")
+    assert (entry["job"], entry["version"]) == (3, 12)
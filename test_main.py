@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Tests for the data pipeline in main.py
+"""
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+from history_store import HistoryStore
+from ingest_plan import PlanStore
+from refresher import Refresher, Snapshot
+from site_table import SiteTable, day_strings
+from snapshot_store import write_snapshot
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_SHEET = os.path.join(HERE, "sample_sheet.csv")
+
+NAMED_HEADERS = {
+    "B": "Site Name",
+    "D": "Zone",
+    "F": "City_Name",
+    "L": "lat",
+    "M": "lng",
+    "AJ": "Next Fueling Plan",
+}
+
+
+def legacy_records(df, site_col, city_col, date_col):
+    """Row-by-row reference output of the original clean_and_filter loop."""
+    df = df.copy()
+    df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
+    df = df.dropna(subset=[date_col])
+    data = []
+    for _, row in df.iterrows():
+        data.append({
+            "SiteName": row[site_col],
+            "CityName": row[city_col],
+            "NextFuelingPlan": row[date_col].strftime("%Y-%m-%d"),
+            "lat": getattr(row, 'lat', 24.7136),
+            "lng": getattr(row, 'lng', 46.6753)
+        })
+    return data
+
+
+@pytest.fixture(autouse=True)
+def plan_store(tmp_path, monkeypatch):
+    """Keep the ingest plans learned by a test out of the working tree."""
+    monkeypatch.setattr(main, "ingest_plans", PlanStore(str(tmp_path / "ingest_plans.json")))
+
+
+def test_clean_and_filter_matches_legacy_output():
+    df = pd.read_csv(SAMPLE_SHEET).rename(columns=NAMED_HEADERS)
+    expected = legacy_records(
+        df.rename(columns={"Site Name": "sitename", "City_Name": "cityname",
+                           "Next Fueling Plan": "nextfuelingplan"}),
+        "sitename", "cityname", "nextfuelingplan",
+    )
+
+    assert main.clean_and_filter(df).to_records() == expected
+
+
+def test_clean_and_filter_reads_sheet_column_letters():
+    data = main.clean_and_filter(pd.read_csv(SAMPLE_SHEET)).to_records()
+
+    assert [site["SiteName"] for site in data] == ["COW552", "COW910", "COW777", "COW123"]
+    assert data[1] == {
+        "SiteName": "COW910",
+        "RegionName": "Central",
+        "CityName": "Jeddah",
+        "NextFuelingPlan": "2025-11-23",
+        "lat": 21.4858,
+        "lng": 39.1925,
+    }
+
+
+def test_clean_and_filter_defaults_only_missing_coordinates():
+    df = pd.DataFrame({
+        "SiteName": ["COW1", "COW2", "COW3"],
+        "CityName": ["Jeddah", "Riyadh", "Dammam"],
+        "NextFuelingPlan": ["2025-01-01", "not a date", "2025-01-03"],
+        "lat": [21.5, 24.0, None],
+    })
+
+    data = main.clean_and_filter(df).to_records()
+
+    assert [site["SiteName"] for site in data] == ["COW1", "COW3"]
+    assert [site["lat"] for site in data] == [21.5, main.DEFAULT_LAT]
+    assert [site["lng"] for site in data] == [main.DEFAULT_LNG, main.DEFAULT_LNG]
+
+
+REGION_SHEET = (
+    b"Site Name,Region,City_Name,lat,lng,Next Fueling Plan\n"
+    b"COW1,Central,Riyadh,24.7,46.6,2025-01-19\n"
+    b"COW2,Western,Jeddah,21.5,39.2,2025-01-20\n"
+    b"COW3, central ,Al Kharj,24.1,47.3,2025-01-21\n"
+    b"COW4,,Riyadh,24.7,46.6,2025-01-22\n"
+)
+
+
+def test_ingest_filters_regions_without_mistaking_region_for_city(monkeypatch):
+    table = main.clean_and_filter_stream(io.BytesIO(REGION_SHEET))
+    assert table.sites.tolist() == ["COW1", "COW3"]
+    assert table.cities.tolist() == ["Riyadh", "Al Kharj"]
+    assert table.regions.tolist() == ["Central", "central"]
+
+    # Blank regions take the source's label; "*" keeps every region
+    monkeypatch.setattr(main, "INCLUDED_REGIONS", None)
+    table = main.clean_and_filter_stream(io.BytesIO(REGION_SHEET), region="Western")
+    assert table.regions.tolist() == ["Central", "Western", "central", "Western"]
+
+    # A tab without a region column is labelled (and filtered) by its source
+    monkeypatch.setattr(main, "INCLUDED_REGIONS", {"central"})
+    assert len(main.clean_and_filter(pd.read_csv(io.BytesIO(REGION_SHEET)).drop(columns="Region"),
+                                     region="Western")) == 0
+
+
+def test_sites_query_filters_by_region(monkeypatch):
+    monkeypatch.setattr(main.refresher, "_on_install", None)
+    sites = [dict(site, RegionName="Western" if site["CityName"] in ("Jeddah", "Medina") else "Central")
+             for site in main.MOCK_DATA]
+    main.refresher.install(sites)
+    client = main.app.test_client()
+
+    western = client.get("/api/fuel/sites?region=Western").get_json()
+    assert [s["SiteName"] for s in western["data"]] == ["COW678", "COW910"]
+    assert western["data"][0]["RegionName"] == "Western"
+    both = client.get("/api/fuel/sites?region=Central&city=Riyadh,Jeddah").get_json()
+    assert [s["SiteName"] for s in both["data"]] == ["COW123", "COW552"]
+    assert client.get("/api/fuel/sites?region=Eastern").get_json()["total"] == 0
+
+
+def test_calculate_stats_buckets_by_day_offset(monkeypatch):
+    data = SiteTable.from_records(main.MOCK_DATA)
+    today = int(pd.Timestamp("2025-01-19").value // 86_400_000_000_000)
+    monkeypatch.setattr(main, "today_day_number", lambda: today)
+
+    stats = main.calculate_stats(data)
+
+    assert stats["totalSites"] == 6
+    assert stats["needFuelToday"] == 1
+    assert stats["tomorrow"] == 1
+    assert stats["afterTomorrow"] == 1
+    assert stats["overdue"] == 2
+    assert main.calculate_stats(data) is stats
+
+    monkeypatch.setattr(main, "today_day_number", lambda: today + 1)
+    assert main.calculate_stats(data)["overdue"] == 3
+
+
+def test_refresh_endpoint_returns_job_without_blocking(monkeypatch):
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        return list(main.MOCK_DATA[:2])
+
+    monkeypatch.setattr(main.refresher, "_load", fetch)
+    monkeypatch.setattr(main.refresher, "_on_install", None)
+    version = main.refresher.current().version
+    client = main.app.test_client()
+
+    response = client.get("/api/fuel/refresh")
+    assert response.status_code == 202
+    job_id = response.get_json()["jobId"]
+    assert client.get("/api/fuel/refresh").get_json()["jobId"] == job_id
+    assert client.get("/api/fuel/refresh/status").get_json()["runningJob"] == job_id
+
+    release.set()
+    assert main.refresher.wait(5)
+    assert main.refresher.current().version == version + 1
+    assert len(client.get("/api/fuel/sites").get_json()["data"]) == 2
+
+
+def test_sites_answer_conditional_requests():
+    client = main.app.test_client()
+    response = client.get("/api/fuel/sites")
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+    snapshot = main.refresher.current()
+
+    assert etag == f'"{snapshot.content_hash}"'
+    assert response.get_json()["lastUpdated"] == snapshot.loaded_at.isoformat()
+
+    cached = client.get("/api/fuel/sites", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.data == b""
+    assert client.get("/data.json", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/data.json", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_payloads_are_rendered_once_and_compressed(monkeypatch):
+    monkeypatch.setattr(main.refresher, "_on_install", None)
+    sites = [dict(site, SiteName=f"COW{i}") for i, site in enumerate(main.MOCK_DATA * 20)]
+    main.refresher.install(sites)
+    client = main.app.test_client()
+    misses = main.response_cache.misses
+
+    plain = client.get("/api/fuel/sites")
+    zipped = client.get("/api/fuel/sites", headers={"Accept-Encoding": "gzip"})
+
+    assert main.response_cache.misses == misses + 1
+    assert zipped.headers["Content-Encoding"] == "gzip"
+    assert zipped.headers["ETag"].startswith("W/")
+    assert gzip.decompress(zipped.data) == plain.data
+    assert plain.get_json()["data"] == sites
+    revalidated = client.get("/api/fuel/sites", headers={"If-None-Match": zipped.headers["ETag"],
+                                                         "Accept-Encoding": "gzip"})
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == zipped.headers["ETag"]
+    assert client.get("/api/fuel/sites", headers={"If-None-Match": zipped.headers["ETag"]}).status_code == 304
+    assert client.get("/api/cache/stats").get_json()["cache"]["hits"] >= 1
+
+
+def test_streaming_ingest_matches_whole_frame_cleaning():
+    expected = main.clean_and_filter(pd.read_csv(SAMPLE_SHEET)).to_records()
+
+    with open(SAMPLE_SHEET, "rb") as f:
+        assert main.clean_and_filter_stream(f, chunksize=3).to_records() == expected
+    assert main.clean_and_filter_stream(SAMPLE_SHEET, chunksize=1).to_records() == expected
+
+
+def test_site_table_round_trips_json_shape():
+    table = SiteTable.from_records(main.MOCK_DATA)
+
+    assert table.to_records() == main.MOCK_DATA
+    assert table.city_names == ("Riyadh", "Jeddah", "Buraydah", "Dammam", "Medina")
+    assert table.day.dtype == "int32"
+    assert SiteTable.concat([table.take([0, 1]), table.take([2, 3, 4, 5])]).to_records() == main.MOCK_DATA
+    assert table.digest() == SiteTable.from_records(main.MOCK_DATA).digest()
+
+
+def test_sites_query_filters_sorts_and_pages(monkeypatch):
+    monkeypatch.setattr(main.refresher, "_on_install", None)
+    main.refresher.install(main.MOCK_DATA)
+    monkeypatch.setattr(main, "today_day_number", lambda: int(np.datetime64("2025-01-19", "D").astype(int)))
+    client = main.app.test_client()
+
+    riyadh = client.get("/api/fuel/sites?city=Riyadh").get_json()
+    assert [s["SiteName"] for s in riyadh["data"]] == ["COW123", "COW552"]
+
+    overdue = client.get("/api/fuel/sites?status=overdue,today&sort=-date").get_json()
+    assert [s["SiteName"] for s in overdue["data"]] == ["COW552", "COW123", "COW678"]
+
+    first = client.get("/api/fuel/sites?from=2025-01-18&to=2025-01-21&limit=2&sort=site")
+    page = first.get_json()
+    assert [s["SiteName"] for s in page["data"]] == ["COW123", "COW552"]
+    assert page["total"] == 4
+    second = client.get(f"/api/fuel/sites?from=2025-01-18&to=2025-01-21&limit=2&sort=site"
+                        f"&cursor={page['nextCursor']}").get_json()
+    assert [s["SiteName"] for s in second["data"]] == ["COW777", "COW910"]
+    assert second["nextCursor"] is None
+
+    cached = client.get("/api/fuel/sites?from=2025-01-18&to=2025-01-21&limit=2&sort=site",
+                        headers={"If-None-Match": first.headers["ETag"]})
+    assert cached.status_code == 304
+    assert client.get("/api/fuel/sites?status=soon").status_code == 400
+    assert client.get("/api/fuel/sites?cursor=0.2").status_code == 400
+
+
+def test_forecast_endpoint_counts_sites_per_day_and_city(monkeypatch):
+    monkeypatch.setattr(main.refresher, "_on_install", None)
+    main.refresher.install(main.MOCK_DATA)
+    monkeypatch.setattr(main, "today_day_number", lambda: int(np.datetime64("2025-01-19", "D").astype(int)))
+    client = main.app.test_client()
+
+    response = client.get("/api/fuel/forecast?days=3")
+    body = response.get_json()
+    stats = main.calculate_stats(main.refresher.current().table)
+    assert body["dates"] == ["2025-01-19", "2025-01-20", "2025-01-21"]
+    assert body["total"]["overdue"] == stats["overdue"]
+    assert body["total"]["daily"] == [stats["needFuelToday"], stats["tomorrow"], stats["afterTomorrow"]]
+    assert sum(c["overdue"] + sum(c["daily"]) + c["later"] for c in body["cities"]) == stats["totalSites"]
+    cached = client.get("/api/fuel/forecast?days=3", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+
+    riyadh = client.get("/api/fuel/forecast?days=3&city=Riyadh").get_json()
+    assert [c["city"] for c in riyadh["cities"]] == ["Riyadh"]
+    assert client.get("/api/fuel/forecast?days=0").status_code == 400
+    assert client.get("/api/fuel/forecast?days=soon").status_code == 400
+
+
+def test_dispatch_endpoint_groups_urgent_sites_by_depot(monkeypatch):
+    monkeypatch.setattr(main.refresher, "_on_install", None)
+    main.refresher.install(main.MOCK_DATA)
+    monkeypatch.setattr(main, "today_day_number", lambda: int(np.datetime64("2025-01-19", "D").astype(int)))
+    client = main.app.test_client()
+
+    response = client.get("/api/fuel/dispatch?depot=24.7,46.7;24.5,39.6&k=1")
+    body = response.get_json()
+    assert body["sites"] == 3
+    riyadh, medina = body["depots"]
+    assert [s["SiteName"] for s in riyadh["assigned"]] == ["COW123", "COW552"]
+    assert [s["SiteName"] for s in medina["assigned"]] == ["COW678"]
+    assert len(riyadh["nearest"]) == 1 and riyadh["nearest"][0]["distanceKm"] < 5
+    cached = client.get("/api/fuel/dispatch?depot=24.7,46.7;24.5,39.6&k=1",
+                        headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+
+    later = client.get("/api/fuel/dispatch?depot=21.5,39.2&status=later").get_json()
+    assert [s["SiteName"] for s in later["depots"][0]["nearest"]] == ["COW445"]
+    assert client.get("/api/fuel/dispatch").status_code == 400
+    assert client.get("/api/fuel/dispatch?depot=24.7,46.7&k=0").status_code == 400
+    assert client.get("/api/fuel/dispatch?depot=24.7,46.7&status=soon").status_code == 400
+
+    # A different table swapped in under the same version gets its own plan
+    table = SiteTable.from_records(main.MOCK_DATA[:2])
+    monkeypatch.setattr(main, "refresher", Refresher(lambda: None, Snapshot(
+        body["version"], table, main.refresher.current().loaded_at, table.digest())))
+    replaced = client.get("/api/fuel/dispatch?depot=24.7,46.7;24.5,39.6&k=1").get_json()
+    assert replaced["version"] == body["version"] and replaced["sites"] == 1
+
+
+def test_history_endpoints_answer_from_the_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "history", HistoryStore(str(tmp_path / "history.sqlite3")))
+    monkeypatch.setattr(main, "process_role", "single")
+    monkeypatch.setattr(main, "SNAPSHOT_PATH", str(tmp_path / "snapshot.bin"))
+    monkeypatch.setattr(main, "generate_reports", lambda table: None)
+    main.refresher.install(main.MOCK_DATA)
+    moved = [dict(site, NextFuelingPlan="2025-01-25") if site["SiteName"] == "COW552" else site
+             for site in main.MOCK_DATA]
+    main.refresher.install(moved)
+    client = main.app.test_client()
+
+    timeline = client.get("/api/fuel/history/sites/COW552").get_json()["timeline"]
+    assert [(e["change"], e["NextFuelingPlan"]) for e in timeline][-1] == ("changed", "2025-01-25")
+    assert timeline[-1]["slipDays"] == 6
+    assert client.get("/api/fuel/history/sites/COW000").status_code == 404
+
+    today = day_strings([main.today_day_number()])[0]
+    days = client.get(f"/api/fuel/history/overdue?from={today}&to={today}").get_json()["days"]
+    assert days == [{"date": today, "overdue": 6, "dueToday": 0, "totalSites": 6,
+                     "version": main.refresher.current().version}]
+    assert client.get("/api/fuel/history/overdue?from=2025-02-01&to=2025-01-01").status_code == 400
+    assert client.get("/api/fuel/history/overdue?from=2020-01-01").status_code == 400
+
+
+def test_map_endpoint_returns_clusters_or_sites(monkeypatch):
+    monkeypatch.setattr(main.refresher, "_on_install", None)
+    main.refresher.install(main.MOCK_DATA)
+    client = main.app.test_client()
+
+    clustered = client.get("/api/fuel/map?zoom=3").get_json()
+    assert clustered["clustered"]
+    assert sum(c["count"] for c in clustered["clusters"]) == len(main.MOCK_DATA)
+    assert any(c["count"] == 2 for c in clustered["clusters"])
+
+    detailed = client.get("/api/fuel/map?zoom=12&bbox=39,21,40,25").get_json()
+    assert not detailed["clustered"]
+    assert sorted(s["SiteName"] for s in detailed["data"]) == ["COW678", "COW910"]
+    assert client.get("/api/fuel/map?bbox=1,2,3").status_code == 400
+
+
+def test_new_snapshot_publishes_row_delta(monkeypatch):
+    monkeypatch.setattr(main, "generate_reports", lambda table: None)
+    main.refresher.install(main.MOCK_DATA)
+    last_id = main.event_hub.last_id
+
+    sites = [dict(site) for site in main.MOCK_DATA[1:]]
+    sites[0]["NextFuelingPlan"] = "2025-02-01"
+    sites.append(dict(main.MOCK_DATA[0], SiteName="COW999"))
+    main.refresher.install(sites)
+
+    [(_, name, data)] = main.event_hub.since(last_id)
+    event = json.loads(data)
+    assert name == "snapshot"
+    assert event["removed"] == ["COW552"]
+    assert [s["SiteName"] for s in event["upserted"]] == ["COW910", "COW999"]
+    assert event["stats"]["totalSites"] == 6
+    assert event["version"] == main.refresher.current().version
+
+
+def test_sites_since_returns_delta_or_full_list(monkeypatch):
+    monkeypatch.setattr(main, "generate_reports", lambda table: None)
+    main.refresher.install(main.MOCK_DATA)
+    base = main.refresher.current().version
+    main.refresher.install([dict(s, lat=1.0) if s["SiteName"] == "COW777" else s
+                            for s in main.MOCK_DATA[:-1]])
+    client = main.app.test_client()
+
+    delta = client.get(f"/api/fuel/sites?since={base}").get_json()
+    assert delta["delta"] is True
+    assert delta["version"] == base + 1
+    assert [s["SiteName"] for s in delta["upserted"]] == ["COW777"]
+    assert delta["removed"] == ["COW678"]
+
+    full = client.get("/api/fuel/sites?since=0").get_json()
+    assert "delta" not in full
+    assert len(full["data"]) == 5
+    assert client.get("/api/fuel/sites?since=abc").status_code == 400
+
+
+def test_sites_since_sends_every_row_of_a_repeated_site_name(monkeypatch):
+    monkeypatch.setattr(main, "generate_reports", lambda table: None)
+    twice = [dict(main.MOCK_DATA[0], NextFuelingPlan="2025-01-01"),
+             dict(main.MOCK_DATA[0], NextFuelingPlan="2025-01-02")]
+    main.refresher.install(twice + main.MOCK_DATA[1:])
+    base = main.refresher.current().version
+    client = main.app.test_client()
+    held = client.get("/api/fuel/sites").get_json()["data"]
+
+    # An unchanged repeated name is not reported; a changed one brings all its rows
+    main.refresher.install(twice[::-1] + main.MOCK_DATA[1:])
+    assert client.get(f"/api/fuel/sites?since={base}").get_json()["upserted"] == []
+    main.refresher.install([twice[0], dict(twice[1], NextFuelingPlan="2025-01-03")]
+                           + main.MOCK_DATA[1:])
+    delta = client.get(f"/api/fuel/sites?since={base}").get_json()
+    assert [(s["SiteName"], s["NextFuelingPlan"]) for s in delta["upserted"]] == \
+        [("COW552", "2025-01-01"), ("COW552", "2025-01-03")]
+
+    # Applied like script.js applyDelta, the delta rebuilds the full list
+    upserted = {s["SiteName"] for s in delta["upserted"]}
+    patched = [s for s in held if s["SiteName"] not in upserted] + delta["upserted"]
+    full = client.get("/api/fuel/sites").get_json()["data"]
+    key = lambda s: (s["SiteName"], s["NextFuelingPlan"])
+    assert sorted(patched, key=key) == sorted(full, key=key)
+
+
+def test_dashboard_serves_sites_and_stats_from_one_snapshot(monkeypatch):
+    monkeypatch.setattr(main, "generate_reports", lambda table: None)
+    main.refresher.install(main.MOCK_DATA)
+    base = main.refresher.current().version
+    client = main.app.test_client()
+
+    first = client.get("/api/fuel/dashboard")
+    body = first.get_json()
+    assert body["version"] == base
+    assert len(body["data"]) == body["stats"]["totalSites"] == len(main.MOCK_DATA)
+    assert client.get("/api/fuel/dashboard",
+                      headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+    main.refresher.install(main.MOCK_DATA[:-1])
+    delta = client.get(f"/api/fuel/dashboard?since={base}").get_json()
+    assert delta["delta"] is True
+    assert delta["removed"] == ["COW678"]
+    assert delta["stats"]["totalSites"] == len(main.MOCK_DATA) - 1
+    assert client.get("/api/fuel/dashboard?since=x").status_code == 400
+
+
+def test_import_does_not_fetch_or_load_pandas():
+    code = "import sys, main; print('pandas' in sys.modules, main.refresher.refreshed_at)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True,
+                            text=True, timeout=60,
+                            env=dict(os.environ, SNAPSHOT_PATH=os.path.join(HERE, "missing.bin")))
+    assert result.stdout.split()[-2:] == ["False", "None"]
+    assert "Loading sheet" not in result.stdout
+
+
+def test_startup_serves_persisted_snapshot_until_ready(monkeypatch, tmp_path):
+    path = tmp_path / "snapshot.bin"
+    monkeypatch.setattr(main, "SNAPSHOT_PATH", str(path))
+    assert main.load_startup_data().to_records() == main.MOCK_DATA
+
+    persisted = Refresher(lambda: [], main.MOCK_DATA[:2]).current()
+    write_snapshot(path, persisted)
+    assert main.load_startup_data().content_hash == persisted.content_hash
+
+    monkeypatch.setattr(main, "refresher", Refresher(lambda: main.MOCK_DATA, persisted))
+    client = main.app.test_client()
+    assert client.get("/api/ping").status_code == 200
+    assert client.get("/api/ready").status_code == 503
+    main.refresher.trigger()
+    assert main.refresher.wait(5)
+    ready = client.get("/api/ready").get_json()
+    assert ready["ready"] is True
+    assert ready["count"] == len(main.MOCK_DATA)
+
+
+def test_metrics_endpoint_exposes_stages_routes_and_drops():
+    sheet = b"Site Name,City,Next Fueling Plan\nCOW1,Riyadh,2025-01-19\nCOW2,Jeddah,TBD\n"
+    table = main.clean_and_filter_stream(io.BytesIO(sheet))
+    assert len(table) == 1
+    client = main.app.test_client()
+    client.get("/api/fuel/stats")
+    main.response_cache.invalidate('sites')
+    client.get("/api/fuel/sites")
+
+    body = client.get("/api/metrics").get_data(as_text=True)
+    assert 'fuel_ingest_rows_total{outcome="dropped"}' in body
+    for stage in ("dates", "clean", "render", "compress"):
+        assert f'fuel_stage_duration_seconds_count{{stage="{stage}"}}' in body
+    assert ('fuel_http_request_duration_seconds_count'
+            '{route="/api/fuel/stats",method="GET",status="200"}') in body
+    assert "fuel_snapshot_sites " in body
+    assert "fuel_snapshot_bytes " in body
+    assert 'fuel_response_cache_requests_total{result="hit"}' in body
+
+
+def test_event_streams_are_capped(monkeypatch):
+    monkeypatch.setattr(main, "EVENTS_MAX_STREAMS", 1)
+    client = main.app.test_client()
+
+    first = client.get("/api/fuel/events", buffered=False)
+    assert first.status_code == 200
+    refused = client.get("/api/fuel/events", buffered=False)
+    assert refused.status_code == 503
+    assert refused.headers["Retry-After"] == "300"
+
+    first.close()
+    again = client.get("/api/fuel/events", buffered=False)
+    assert again.status_code == 200
+    again.close()
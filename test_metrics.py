@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus metrics registry
+"""
+from metrics import Registry
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    registry.counter("fuel_fetch_total", "Fetches", source="cache")
+    registry.counter("fuel_fetch_total", "Fetches", 2, source="cache")
+    registry.gauge("fuel_sites", "Sites", 7)
+    for value in (0.002, 0.02, 3):
+        registry.observe("fuel_latency_seconds", "Latency", value, buckets=(0.01, 1), route="/a")
+    registry.add_collector(lambda: [("fuel_ratio", "gauge", "Ratio", {"k": 'a"b'}, 0.5)])
+
+    lines = registry.render().splitlines()
+    assert "# TYPE fuel_fetch_total counter" in lines
+    assert 'fuel_fetch_total{source="cache"} 3' in lines
+    assert "fuel_sites 7" in lines
+    assert 'fuel_latency_seconds_bucket{route="/a",le="0.01"} 1' in lines
+    assert 'fuel_latency_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'fuel_latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'fuel_latency_seconds_count{route="/a"} 3' in lines
+    assert 'fuel_ratio{k="a\\"b"} 0.5' in lines
+    assert registry.value("fuel_fetch_total", source="cache") == 3
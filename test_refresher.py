@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests for the background snapshot refresher
+"""
+import threading
+
+from refresher import Refresher
+
+SITE = {"SiteName": "COW1", "CityName": "Riyadh", "NextFuelingPlan": "2025-01-19",
+        "lat": 24.7136, "lng": 46.6753}
+
+
+def test_concurrent_triggers_share_one_load():
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return [SITE]
+
+    refresher = Refresher(load, [])
+    job_ids = {refresher.trigger() for _ in range(5)}
+    release.set()
+    assert refresher.wait(5)
+
+    assert job_ids == {1}
+    assert calls == [1]
+    assert refresher.current().version == 2
+    assert refresher.current().table.to_records() == [SITE]
+
+
+def test_failed_load_keeps_previous_snapshot():
+    def load():
+        raise RuntimeError("sheet unavailable")
+
+    refresher = Refresher(load, [SITE])
+    before = refresher.current()
+    refresher.trigger()
+    assert refresher.wait(5)
+
+    assert refresher.current() is before
+    assert refresher.status()["lastError"] == "sheet unavailable"
+
+
+def test_unchanged_content_keeps_snapshot():
+    refresher = Refresher(lambda: [SITE], [SITE])
+    before = refresher.current()
+    refresher.trigger()
+    assert refresher.wait(5)
+
+    assert refresher.current() is before
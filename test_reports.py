@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for snapshot report generation
+"""
+import csv
+import json
+
+import numpy as np
+import pytest
+
+from reports import ReportWriter, split_buckets
+from site_table import SiteTable, day_numbers
+
+SITES = [
+    {"SiteName": f"COW{i}", "CityName": "Riyadh", "NextFuelingPlan": date,
+     "lat": 24.7136, "lng": 46.6753}
+    for i, date in enumerate(["2025-01-17", "2025-01-20", "2025-01-18", "2025-01-20",
+                              "2025-01-21", "2025-02-01"])
+]
+TODAY = int(day_numbers(["2025-01-20"])[0])
+
+
+def test_split_buckets_classifies_every_site_once():
+    table = SiteTable.from_records(SITES)
+    parts = split_buckets(table, TODAY)
+    assert [p.tolist() for p in parts] == [[0, 2], [1, 3], [4], [], [5]]
+    assert np.array_equal(np.sort(np.concatenate(parts)), np.arange(len(SITES)))
+
+
+def test_reports_are_written_once_per_content(tmp_path):
+    writer = ReportWriter(tmp_path)
+    table = SiteTable.from_records(SITES)
+
+    results = writer.write(table, TODAY)
+    assert results["fuel_today"] == (2, ["fuel_today.csv"])
+    assert results["fuel_pending"] == (2, ["fuel_pending.csv"])
+    assert results["data"] == (6, ["data.json"])
+    with open(tmp_path / "fuel_today.csv", newline="") as f:
+        assert [row["SiteName"] for row in csv.DictReader(f)] == ["COW1", "COW3"]
+    assert json.loads((tmp_path / "data.json").read_text()) == SITES
+
+    # Same rows: nothing is rewritten, even by a fresh writer after a restart
+    assert ReportWriter(tmp_path).write(table, TODAY)["fuel_today"] == (2, [])
+    assert writer.write(table, TODAY)["data"] == (6, [])
+
+    # A new day moves sites between reports
+    results = writer.write(table, TODAY + 1)
+    assert results["fuel_today"] == (1, ["fuel_today.csv"])
+    assert results["fuel_pending"] == (4, ["fuel_pending.csv"])
+    assert results["data"] == (6, [])
+    assert sorted(p.name for p in tmp_path.iterdir()) == \
+        ["data.json", "fuel_pending.csv", "fuel_today.csv"]
+
+
+def test_unknown_report_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ReportWriter(tmp_path, ["xlsx"])
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-rendered payload cache
+"""
+import threading
+
+from response_cache import ResponseCache
+
+
+def test_misses_on_one_key_share_a_render_and_hits_do_not_wait():
+    cache = ResponseCache()
+    cache.get("other", 1, lambda: b"ready")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_render():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b"x" * 1000
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("big", 1, slow_render)))
+               for _ in range(4)]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+
+    # The slow render holds no lock: another key is served meanwhile
+    assert cache.get("other", 1, lambda: b"unused").body == b"ready"
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert len(results) == 4 and all(r is results[0] for r in results)
+    assert "gzip" in results[0].encodings
+
+
+def test_failed_render_is_retried_and_limit_drops_oldest():
+    cache = ResponseCache(limit=2)
+
+    def broken():
+        raise ValueError("boom")
+
+    try:
+        cache.get("a", 1, broken)
+    except ValueError:
+        pass
+    assert cache.get("a", 1, lambda: b"a").body == b"a"
+    cache.get("b", 1, lambda: b"b")
+    cache.get("c", 1, lambda: b"c")
+    assert cache.stats()["entries"] == ["b", "c"]
+    assert cache.get("c", 2, lambda: b"c2").body == b"c2"
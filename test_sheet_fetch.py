@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for the sheet fetch layer against a local stand-in for Google Sheets
+"""
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from sheet_fetch import SheetFetcher, SheetSource, SheetSources, digest_bytes, parse_sources
+
+CSV = b"B,D,F,L,M,AJ\nCOW552,Central,Riyadh,24.7136,46.6753,2025-11-24\n"
+
+
+class FakeSheet(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    content = CSV
+    requests = []
+
+    def do_GET(self):
+        FakeSheet.requests.append((self.path, dict(self.headers), self.client_address))
+        if self.path.startswith("/slow"):
+            time.sleep(1)
+        if self.path.startswith("/pub"):
+            self.send_response(307)
+            self.send_header("Location", "/export.csv")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        etag = '"%s"' % digest_bytes(FakeSheet.content)[:16]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        body = gzip.compress(FakeSheet.content)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def sheet_server():
+    FakeSheet.content = CSV
+    FakeSheet.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeSheet)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def read(result):
+    with result.open() as f:
+        return f.read()
+
+
+def sheet_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/pub?output=csv"
+
+
+def test_fetch_follows_redirect_and_persists_cache(sheet_server, tmp_path):
+    cache = tmp_path / "sheet_cache.csv"
+    fetcher = SheetFetcher(sheet_url(sheet_server), str(cache), timeout=2)
+
+    result = fetcher.fetch()
+
+    assert result.source == "network"
+    assert read(result) == CSV
+    assert cache.read_bytes() == CSV
+
+
+def test_unchanged_sheet_is_revalidated_on_one_connection(sheet_server, tmp_path):
+    fetcher = SheetFetcher(sheet_url(sheet_server), str(tmp_path / "cache.csv"), timeout=2)
+    first = fetcher.fetch()
+    second = fetcher.fetch()
+
+    assert second.source == "not-modified"
+    assert second.digest == first.digest
+    assert "If-None-Match" in FakeSheet.requests[-1][1]
+    assert len({client for _, _, client in FakeSheet.requests}) == 1
+
+    FakeSheet.content = CSV + b"COW910,Central,Jeddah,21.4858,39.1925,2025-11-23\n"
+    third = fetcher.fetch()
+    assert third.source == "network"
+    assert third.digest != first.digest
+    assert [p.name for p in tmp_path.iterdir()] == ["cache.csv"]
+
+
+def test_unreachable_sheet_falls_back_to_cache_file(tmp_path):
+    cache = tmp_path / "sheet_cache.csv"
+    cache.write_bytes(CSV)
+    fetcher = SheetFetcher("http://127.0.0.1:9/pub?output=csv", str(cache), timeout=0.5)
+
+    result = fetcher.fetch()
+
+    assert result.source == "cache"
+    assert read(result) == CSV
+
+
+def test_unreachable_sheet_without_cache_raises(tmp_path):
+    fetcher = SheetFetcher("http://127.0.0.1:9/pub", str(tmp_path / "missing.csv"), timeout=0.5)
+
+    with pytest.raises(OSError):
+        fetcher.fetch()
+
+
+def test_sources_are_fetched_concurrently_with_a_deadline(sheet_server, tmp_path):
+    base = f"http://127.0.0.1:{sheet_server.server_address[1]}"
+    sources = parse_sources(f"Central={base}/pub?output=csv, Western={base}/slow.csv")
+    assert sources == [SheetSource("Central", f"{base}/pub?output=csv"),
+                       SheetSource("Western", f"{base}/slow.csv")]
+    (tmp_path / "cache-western.csv").write_bytes(b"cached")
+    sheets = SheetSources(sources, str(tmp_path / "cache.csv"), timeout=2, deadline=0.3)
+
+    start = time.monotonic()
+    central, western = sheets.fetch()
+
+    assert time.monotonic() - start < 0.9
+    assert (central.source, read(central)) == ("network", CSV)
+    assert (western.source, read(western)) == ("cache", b"cached")
+    assert (tmp_path / "cache-central.csv").read_bytes() == CSV
+
+    (tmp_path / "cache-western.csv").unlink()
+    sheets = SheetSources(sources[1:] * 2, str(tmp_path / "cache.csv"), timeout=2, deadline=0.3)
+    with pytest.raises(TimeoutError):
+        sheets.fetch()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the standard-library-only server in simple.py
+"""
+import gzip
+import http.client
+import json
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from refresher import Refresher
+from simple import SimpleServer, SnapshotWatcher
+from snapshot_store import write_snapshot
+
+SITES = [
+    {"SiteName": f"COW{i:03d}", "CityName": "Riyadh", "NextFuelingPlan": f"2025-01-{10 + i % 20:02d}",
+     "lat": 24.7136, "lng": 46.6753, "RegionName": "Central"}
+    for i in range(40)
+]
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    write_snapshot(path, Refresher(lambda: [], SITES).current())
+    server = SimpleServer(("127.0.0.1", 0), SnapshotWatcher(path))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(conn, path, headers=None):
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    return response, response.read()
+
+
+def test_serves_the_persisted_snapshot_over_one_connection(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+
+    response, body = get(conn, "/api/fuel/sites")
+    sock = conn.sock
+    assert response.status == 200
+    assert json.loads(body)["data"] == SITES
+    assert b": " not in body
+
+    response, body = get(conn, "/api/fuel/dashboard", {"Accept-Encoding": "gzip"})
+    assert response.getheader("Content-Encoding") == "gzip"
+    dashboard = json.loads(gzip.decompress(body))
+    assert dashboard["stats"]["totalSites"] == len(SITES)
+    assert dashboard["version"] == 1
+
+    response, body = get(conn, "/api/fuel/nope")
+    assert response.status == 404
+    assert json.loads(body) == {"success": False, "error": "Not found: /api/fuel/nope"}
+    assert get(conn, "/api/fuel/sites?city=Riyadh")[0].status == 400
+
+    etag = get(conn, "/data.json")[0].getheader("ETag")
+    assert get(conn, "/data.json", {"If-None-Match": etag})[0].status == 304
+    assert conn.sock is sock
+
+
+def test_new_snapshot_versions_are_picked_up(server):
+    watcher = server.watcher
+    sites = SITES[:3]
+    write_snapshot(watcher.path, Refresher(lambda: [], sites).current())
+    assert watcher.check()
+    assert not watcher.check()
+
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    assert json.loads(get(conn, "/data.json")[1]) == sites
+
+
+def test_runs_without_numpy_pandas_or_flask():
+    code = ("import sys\n"
+            "for name in ('numpy', 'pandas', 'flask', 'flask_cors'):\n"
+            "    sys.modules[name] = None\n"
+            "import simple\n"
+            "print(simple.SiteData.sample().stats(0)['totalSites'])\n")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "3"
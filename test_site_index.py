@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-snapshot site indexes
+"""
+import numpy as np
+
+from site_index import SiteIndex, clip_ranges, status_ranges
+from site_table import SiteTable
+
+
+def random_table(n=500, seed=7):
+    rng = np.random.default_rng(seed)
+    cities = ["Riyadh", "Jeddah", "Dammam", "Medina"]
+    return SiteTable.from_columns(
+        [f"COW{i:04d}" for i in rng.permutation(n)],
+        [cities[i] for i in rng.integers(0, len(cities), n)],
+        rng.integers(20000, 20040, n),
+        rng.uniform(20, 28, n),
+        rng.uniform(38, 50, n),
+        [["Central", "Western", None][i] for i in rng.integers(0, 3, n)],
+    )
+
+
+def test_rows_match_a_full_scan():
+    table = random_table()
+    index = SiteIndex(table)
+    today = 20020
+    ranges = clip_ranges(status_ranges(["today", "overdue", "later"], today), 20010, 20030)
+    wanted = {"Jeddah", "Medina"}
+
+    rows = index.rows(["Jeddah", "Medina"], ranges)
+
+    cities = table.cities
+    expected = [
+        i for i in range(len(table))
+        if cities[i] in wanted and 20010 <= table.day[i] <= 20030 and table.day[i] not in (20021, 20022)
+    ]
+    assert sorted(rows.tolist()) == expected
+    assert list(table.day[rows]) == sorted(table.day[rows])
+
+
+def test_region_rows_match_a_full_scan():
+    table = random_table()
+    index = SiteIndex(table)
+    ranges = [(20005, 20025)]
+    regions = table.regions
+
+    rows = index.rows(ranges=ranges, regions=["Western"])
+    assert sorted(rows.tolist()) == [
+        i for i in range(len(table)) if regions[i] == "Western" and 20005 <= table.day[i] <= 20025
+    ]
+    assert list(table.day[rows]) == sorted(table.day[rows])
+
+    rows = index.rows(["Riyadh"], regions=["Central", "Northern"])
+    assert sorted(rows.tolist()) == [
+        i for i in range(len(table)) if regions[i] == "Central" and table.cities[i] == "Riyadh"
+    ]
+
+
+def test_sort_keys():
+    table = random_table(50)
+    index = SiteIndex(table)
+    rows = index.rows()
+
+    assert [table.sites[i] for i in index.sort(rows, "site")] == sorted(table.sites)
+    assert [table.sites[i] for i in index.sort(rows, "-site")] == sorted(table.sites, reverse=True)
+    assert list(table.cities[index.sort(rows, "city")]) == sorted(table.cities)
+    assert index.rows(["Nowhere"]).size == 0
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared snapshot file used by serve.py workers
+"""
+from datetime import datetime
+
+from refresher import Refresher
+from snapshot_store import SnapshotFollower, read_snapshot, read_snapshot_keyed, write_snapshot
+
+SITES = [
+    {"SiteName": "COW1", "CityName": "Riyadh", "NextFuelingPlan": "2025-01-19",
+     "lat": 24.7136, "lng": 46.6753},
+    {"SiteName": "COW2", "CityName": None, "NextFuelingPlan": "2025-01-21",
+     "lat": 21.4858, "lng": 39.1925},
+]
+
+
+def test_snapshot_file_round_trips_memory_mapped(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    snapshot = Refresher(lambda: [], SITES).current()
+    write_snapshot(path, snapshot)
+
+    loaded, refreshed_at = read_snapshot(path)
+    assert refreshed_at is None
+    assert (loaded.version, loaded.loaded_at, loaded.content_hash) == \
+        (snapshot.version, snapshot.loaded_at, snapshot.content_hash)
+    assert loaded.table.to_records() == SITES
+    assert loaded.table.digest() == snapshot.content_hash
+    assert not loaded.table.day.flags.owndata
+    assert not loaded.table.lat.flags.writeable
+    assert [p.name for p in tmp_path.iterdir()] == ["snapshot.bin"]
+
+
+def test_worker_adopts_loader_versions(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    loader = Refresher(lambda: [], SITES)
+    write_snapshot(path, loader.current())
+    worker = Refresher(lambda: [], read_snapshot(path)[0])
+    follower = SnapshotFollower(
+        path, lambda snapshot, refreshed_at: worker.install(snapshot, refreshed_at=refreshed_at))
+    assert not follower.check()
+
+    loaded_at = datetime(2025, 1, 19, 6, 0)
+    loader.install(SITES[:1], refreshed_at=loaded_at)
+    write_snapshot(path, loader.current(), loader.refreshed_at)
+    assert follower.check()
+    assert worker.current().version == loader.current().version == 2
+    assert worker.refreshed_at == loaded_at
+    assert worker.current().table.to_records() == SITES[:1]
+
+
+def test_follower_catches_a_replace_made_right_after_the_initial_read(tmp_path):
+    path = tmp_path / "snapshot.bin"
+    loader = Refresher(lambda: [], SITES)
+    write_snapshot(path, loader.current())
+    snapshot, _, key = read_snapshot_keyed(path)
+
+    loader.install(SITES[:1])
+    write_snapshot(path, loader.current())
+    seen = []
+    follower = SnapshotFollower(path, lambda snapshot, refreshed_at: seen.append(snapshot.version),
+                                key=key)
+    assert snapshot.version == 1
+    assert follower.check()
+    assert seen == [2]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-memory static asset layer
+"""
+import gzip
+import os
+
+import main
+from static_assets import IMMUTABLE, AssetBundle, rewrite_references
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_pages_reference_fingerprinted_assets(tmp_path):
+    (tmp_path / "index.html").write_text(
+        '<link rel="stylesheet" href="style.css">\n'
+        '<script src="/script.js?v=2"></script>\n'
+        '<a href="/script.json">x</a>\n')
+    (tmp_path / "script.js").write_text("console.log('hi');\n")
+    (tmp_path / "style.css").write_text("body { margin: 0 }\n")
+    bundle = AssetBundle(str(tmp_path))
+
+    script, style = bundle.urls["script.js"], bundle.urls["style.css"]
+    assert script.startswith("/static/script.") and script.endswith(".js")
+    html = bundle.get("/").payload.body.decode()
+    assert f'href="{style}"' in html
+    assert f'src="{script}?v=2"' in html
+    assert 'href="/script.json"' in html
+    assert bundle.get(script).cache_control == IMMUTABLE
+    assert bundle.get("/script.js").cache_control == "no-cache"
+
+    # Changing a file changes its URL
+    (tmp_path / "script.js").write_text("console.log('bye');\n")
+    assert AssetBundle(str(tmp_path)).urls["script.js"] != script
+    assert rewrite_references('<img src="logo.png">', {}) == '<img src="logo.png">'
+
+
+def test_only_allowlisted_files_are_served():
+    client = main.app.test_client()
+
+    for path in ("/main.py", "/sample_sheet.csv", "/requirements.txt", "/./main.py", "/static/x.js"):
+        assert client.get(path).status_code == 404, path
+
+    url = main.static_assets.urls["script.js"]
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == IMMUTABLE
+    assert response.headers["Content-Type"].startswith("text/javascript")
+    with open(os.path.join(HERE, "script.js"), "rb") as f:
+        assert gzip.decompress(response.data) == f.read()
+
+    page = client.get("/")
+    assert page.headers["Cache-Control"] == "no-cache"
+    assert client.get("/", headers={"If-None-Match": page.headers["ETag"]}).status_code == 304